@@ -74,11 +74,83 @@ parser.add_argument('--max_ppn', type=int, nargs='?',
 parser.add_argument('--num_initial_points', type=int, nargs='?', default=3,
                         help = '''The number of training points to collect in the first iteration. 
                         Increase for fewer algorithms, reduce for many algorithms. Default = 3''')
+parser.add_argument('--initial_design', type=str, nargs='?', default='grid', choices=['grid', 'lhs', 'maximin'],
+                        help = '''How the initial training points are spread over the feature space. grid = evenly spaced
+                        indices, lhs = Latin hypercube over the log-scaled feature space, maximin = each point farthest
+                        from the previous ones. Default = grid''')
+parser.add_argument('--initial_budget', type=float, nargs='?', default=0,
+                        help = '''The predicted benchmark seconds the lhs and maximin initial designs may spend,
+                        using a prior cost estimate of every point. 0 = unbounded. Default = 0''')
 parser.add_argument('--convergence_threshold', type=float, nargs='?', default=0.0000000001,
                         help = '''The threshold for maximum convergence value over four consecutive 
                         active learning iterations to successfully exit the active learning process. Default = .001.
                         Higher values will exit sooner with potentially less-accurate tuning. Lower values will take longer 
                         to exit but provide more accurate results.''')
+parser.add_argument('--convergence_mode', type=str, nargs='?', default='variance', choices=['variance', 'selection'],
+                        help = '''The criterion that ends active learning. variance exits once the jackknife variance
+                        meets --convergence_threshold. selection exits once the predicted best algorithm of every point
+                        has not changed for --stability_iterations iterations. Both criteria are reported. Default = variance.''')
+parser.add_argument('--stability_iterations', type=int, nargs='?', default=5,
+                        help = '''The number of consecutive iterations the best-algorithm map must be stable for
+                        with --convergence_mode selection. Default = 5.''')
+parser.add_argument('--stability_tolerance', type=float, nargs='?', default=0.01,
+                        help = '''The largest change of the best-algorithm map between iterations that still counts as
+                        stable with --convergence_mode selection. Default = 0.01.''')
+parser.add_argument('--stability_weighting', type=str, nargs='?', default='gain', choices=['none', 'gain'],
+                        help = '''How changes of the best-algorithm map are measured. none counts the fraction of points
+                        that changed. gain weights each change by the latency the previous choice loses, relative to
+                        the total gain over the default algorithm. Default = gain.''')
+parser.add_argument('--variance_estimate', type=str, nargs='?', default='full', choices=['full', 'subsample'],
+                        help = '''How the jackknife variance used by the convergence check is computed. full averages it
+                        over the whole feature space. subsample estimates it from a stratified sample with a confidence
+                        bound, and only computes the full-space variances when point selection needs them. Default = full.''')
+parser.add_argument('--variance_sample_size', type=int, nargs='?', default=2048,
+                        help = '''The number of feature space rows sampled with --variance_estimate subsample. Default = 2048.''')
+parser.add_argument('--variance_strata', type=int, nargs='?', default=2,
+                        help = '''The number of regions n, ppn and msg_size are each split into to form the strata of
+                        the sample with --variance_estimate subsample. Default = 2.''')
+parser.add_argument('--variance_confidence', type=float, nargs='?', default=0.95,
+                        help = '''The confidence level of the bound reported for the sampled convergence value. Default = 0.95.''')
+parser.add_argument('--algorithm_pruning', type=str, nargs='?', default='none', choices=['none', 'dominated'],
+                        help = '''none = benchmark every selected point with all algorithms. dominated = stop benchmarking
+                        algorithms whose predicted latency is clearly worse than the best algorithm in a region of the
+                        feature space. Default = none.''')
+parser.add_argument('--pruning_regions', type=int, nargs='?', default=2,
+                        help = '''The number of regions n, ppn and msg_size are each split into for --algorithm_pruning
+                        dominated. Default = 2.''')
+parser.add_argument('--pruning_confidence', type=float, nargs='?', default=0.99,
+                        help = '''The one-sided confidence of the bounds that decide whether an algorithm is dominated. Default = 0.99.''')
+parser.add_argument('--racing', type=str, nargs='?', default='none', choices=['none', 'successive_halving'],
+                        help = '''none = benchmark every algorithm of a point with the OSU default iteration counts.
+                        successive_halving = race the algorithms of a point with short runs and rerun the faster half with
+                        more iterations until one is left. Default = none.''')
+parser.add_argument('--racing_iterations', type=int, nargs='?', default=50,
+                        help = '''The number of measured OSU iterations of the first racing round. Default = 50.''')
+parser.add_argument('--racing_tolerance', type=float, nargs='?', default=0.05,
+                        help = '''Algorithms within this fraction of the fastest latency of a racing round are never dropped. Default = 0.05.''')
+parser.add_argument('--benchmark_driver', type=str, nargs='?', default='runner', choices=['runner', 'persistent', 'fake'],
+                        help = '''runner = launch the OSU microbenchmarks for every benchmark. persistent = launch the persistent
+                        benchmark driver once per (n, ppn, nodefile) and select the algorithms through MPI_T (build it with
+                        make persistent_driver), not supported on aurora_xpu. fake = a stand-in driver with synthetic latencies for testing.
+                        Default = runner.''')
+parser.add_argument('--msg_sweep', type=str, nargs='?', default='none', choices=['none', 'range'],
+                        help = '''none = every benchmark launch measures one message size. range = every launch measures
+                        the message sizes within --msg_sweep_width doublings of the requested one, the others are cached
+                        and added to the training data once all algorithms of a point were measured. Default = none.''')
+parser.add_argument('--msg_sweep_width', type=int, nargs='?', default=2,
+                        help = '''The number of message size doublings measured below and above the requested message
+                        size with --msg_sweep range. Default = 2.''')
+parser.add_argument('--osu_iterations', type=str, nargs='?', default='default', choices=['default', 'adaptive'],
+                        help = '''default = OSU chooses its default measured and warmup iterations. adaptive = choose them per
+                        benchmark from the message size and the observed measurement noise. Default = default.''')
+parser.add_argument('--benchmark_time_budget', type=float, nargs='?', default=0.5,
+                        help = '''The maximum number of seconds of measured and warmup iterations of one benchmark with
+                        --osu_iterations adaptive. Default = 0.5.''')
+parser.add_argument('--target_relative_error', type=float, nargs='?', default=0.02,
+                        help = '''The relative error of the average latency that --osu_iterations adaptive aims for. Default = 0.02.''')
+parser.add_argument('--timing_file', type=str, nargs='?', default='',
+                        help = '''A file that the time of every phase of every active learning iteration is appended to as
+                        JSON lines. Default = none.''')
 parser.add_argument('--timeout', type=int, nargs='?', default=30,
                         help = '''The maximum amount of time in MINUTES before the training process should terminate,
                         even if it has not yet met the convergence criteria. Default = 30''')
@@ -86,10 +158,58 @@ parser.add_argument('--launcher_path', type=str,
                         help = 'The path to the process launcher (if not ${mpich_path}/mpiexec)')
 parser.add_argument('--test_fail_retries', type=int, default=3,
                         help = 'How many times to retry microbenchmark tests if they fail spuriously')
+parser.add_argument('--batch_size', type=str, default='1',
+                        help = '''The number of points to select per active learning iteration. Use "auto" to size the batch
+                        so every rack/chassis in the allocation runs a microbenchmark concurrently. Default = 1''')
+parser.add_argument('--training_mode', type=str, choices = ['full', 'incremental'], default='full',
+                        help = '''How the model is fit each active learning iteration. "full" refits a new forest on all data,
+                        "incremental" reuses the previous forest and replaces its oldest trees. Default = full''')
+parser.add_argument('--incremental_trees', type=int, default=10,
+                        help = 'The number of trees replaced per iteration when training_mode = incremental. Default = 10')
+parser.add_argument('--refit_interval', type=int, default=10,
+                        help = 'The number of iterations between full refits when training_mode = incremental. Default = 10')
+parser.add_argument('--surrogate', type=str, choices = ['random_forest', 'extra_trees', 'quantile_gbm'], default='random_forest',
+                        help = '''The model fit to the benchmark data. "random_forest" and "extra_trees" use the variance between
+                        their trees as the uncertainty, "quantile_gbm" fits gradient-boosted quantile models and uses the width
+                        of their interval. Default = random_forest''')
+parser.add_argument('--forest_size', type=int, default=100,
+                        help = 'The number of trees in the random forest. Default = 100')
+parser.add_argument('--variance_estimator', type=str, choices = ['jackknife', 'infinitesimal_jackknife'], default='jackknife',
+                        help = '''The estimator of the model uncertainty used for point selection and convergence. "jackknife" treats
+                        the trees as jackknife replicates, "infinitesimal_jackknife" uses the bootstrap samples of the trees and
+                        stays stable with smaller forests. Default = jackknife''')
+parser.add_argument('--model_workers', type=str, default='1',
+                        help = '''The number of cores used to fit the model and compute its uncertainty. Use "auto" for all cores
+                        of the node running ACCLAiM. Default = 1''')
+parser.add_argument('--measured_point_weight', type=float, default=0.0,
+                        help = '''The factor applied to the uncertainty of points that were already benchmarked during point selection.
+                        0 never selects a measured point again. Default = 0''')
+parser.add_argument('--acquisition', type=str, choices = ['variance', 'cost_aware'], default='variance',
+                        help = '''How points are ranked for selection. "variance" selects the most uncertain points, "cost_aware"
+                        selects the most uncertain points per predicted second of benchmark time. Default = variance''')
+parser.add_argument('--pipeline', type=str, choices = ['sync', 'async'], default='sync',
+                        help = '''How benchmarks are scheduled. "sync" benchmarks each batch of points and then refits the model,
+                        "async" keeps benchmarks running on free nodes while the model is refit on the points that finished. Default = sync''')
+parser.add_argument('--pipeline_depth', type=float, default=2,
+                        help = '''With pipeline = async, the number of benchmarks kept queued or running as a multiple of the number of
+                        benchmarks that can run concurrently. Default = 2''')
+parser.add_argument('--checkpoint_interval', type=int, default=5,
+                        help = 'The number of active learning iterations between checkpoints of the learner state. Default = 5')
+parser.add_argument('--store_max_age_days', type=float, default=30,
+                        help = '''The number of days a measurement in the persistent measurement store is reused by later
+                        tuning runs. Default = 30''')
+parser.add_argument('--disable_measurement_store', action='store_true',
+                        help = 'Do not reuse microbenchmark measurements across tuning runs')
+parser.add_argument('--prior_weight', type=float, default=0.5,
+                        help = 'The sample weight of prior data from a related tuning run relative to new measurements. Default = 0.5')
 
 args = parser.parse_args()
 mpich_path = args.mpich_path[0]
 
+# The persistent driver benchmarks host buffers, the aurora_xpu runners benchmark device buffers
+if args.benchmark_driver == 'persistent' and args.system == 'aurora_xpu':
+    parser.error("--benchmark_driver persistent is not supported on aurora_xpu")
+
 # Set Max PPN if necessary based on arguments
 if not args.max_ppn:
     if args.system == 'polaris':
@@ -156,6 +276,7 @@ else:
 # Set the system-specific runner script if necessary
 runner = os.path.join(os.getcwd(), "src/mb_runner/generic_runner.sh")
 ch4_runner = os.path.join(os.getcwd(), "src/mb_runner/generic_runner_ch4.sh")
+persistent_driver_path = os.path.join(os.getcwd(), "src/mb_runner/persistent_driver/persistent_driver")
 if args.system == 'aurora_xpu':
     runner = os.path.join(os.getcwd(), "src/mb_runner/aurora_xpu_runner.sh")
     ch4_runner = os.path.join(os.getcwd(), "src/mb_runner/aurora_xpu_runner_ch4.sh")
@@ -182,13 +303,54 @@ config['settings'] = {
     'osu_path': os.path.join(os.getcwd(), "osu_microbenchmarks/build/libexec/osu-micro-benchmarks/mpi/collective"),
     'runner': runner,
     'ch4_runner': ch4_runner,
+    'benchmark_driver': args.benchmark_driver,
+    'persistent_driver_path': persistent_driver_path,
     'system': args.system,
     'max_ppn': max_ppn,
     'convergence_threshold': args.convergence_threshold,
+    'convergence_mode': args.convergence_mode,
+    'stability_iterations': args.stability_iterations,
+    'stability_tolerance': args.stability_tolerance,
+    'stability_weighting': args.stability_weighting,
+    'variance_estimate': args.variance_estimate,
+    'variance_sample_size': args.variance_sample_size,
+    'variance_strata': args.variance_strata,
+    'variance_confidence': args.variance_confidence,
+    'algorithm_pruning': args.algorithm_pruning,
+    'pruning_regions': args.pruning_regions,
+    'pruning_confidence': args.pruning_confidence,
+    'racing': args.racing,
+    'racing_iterations': args.racing_iterations,
+    'racing_tolerance': args.racing_tolerance,
+    'msg_sweep': args.msg_sweep,
+    'msg_sweep_width': args.msg_sweep_width,
+    'osu_iterations': args.osu_iterations,
+    'benchmark_time_budget': args.benchmark_time_budget,
+    'target_relative_error': args.target_relative_error,
+    'timing_file': args.timing_file,
     'num_initial_points': args.num_initial_points,
+    'initial_design': args.initial_design,
+    'initial_budget': args.initial_budget,
     'timeout': args.timeout,
     'test_fail_retries': args.test_fail_retries,
     'algs_json': algs_json,
+    'batch_size': args.batch_size,
+    'training_mode': args.training_mode,
+    'incremental_trees': args.incremental_trees,
+    'surrogate': args.surrogate,
+    'forest_size': args.forest_size,
+    'variance_estimator': args.variance_estimator,
+    'refit_interval': args.refit_interval,
+    'model_workers': args.model_workers,
+    'measured_point_weight': args.measured_point_weight,
+    'acquisition': args.acquisition,
+    'pipeline': args.pipeline,
+    'pipeline_depth': args.pipeline_depth,
+    'checkpoint_dir': os.path.join(os.getcwd(), "_checkpoints"),
+    'checkpoint_interval': args.checkpoint_interval,
+    'measurement_store': "" if args.disable_measurement_store else os.path.join(os.getcwd(), "_measurements.sqlite"),
+    'store_max_age_days': args.store_max_age_days,
+    'prior_weight': args.prior_weight,
 }
 
 print("Writing the config.ini file...")
@@ -1,46 +1,111 @@
 # This file performs active learning using jackknife variance
 
 import numpy as np # type: ignore
-from sklearn.ensemble import RandomForestRegressor # type: ignore
+import math
 import time
 from datetime import datetime
 
-from src.active_learner.utils import preprocess_features, unprocess_features
+from src.active_learner.utils import preprocess_features, unprocess_features, compact_features
 from src.active_learner.initialization import create_feature_space, get_initial_points
 from src.active_learner.algs import read_algs, add_algs, get_all_algs
-from src.active_learner.point_selection import point_selection_single
-from src.active_learner.data_collect import collect_point_batch
+from src.active_learner.point_selection import point_selection_single, point_selection_batch, get_batch_size
+from src.active_learner.data_collect import collect_point_batch, result_iterations, harvested_points, cached_rows
 from src.active_learner.normalizations import normalize_output, undo_normalize_output, undo_preprocess_input
-from src.active_learner.jackknife import jackknife
-from src.active_learner.convergence import convergence_criteria
+from src.active_learner.jackknife import jackknife_variances, get_variance_sample, full_variances
+from src.active_learner.convergence import SelectionStability, convergence_statistic, check_convergence, report_convergence
+from src.active_learner.model_training import fit_model
+from src.active_learner.measured_index import MeasuredIndex
+from src.active_learner.prior import load_prior, unmeasured_prior
+from src.active_learner.cost_model import CostModel, acquisition_scores
+from src.active_learner.async_pipeline import AsyncCollector, get_pipeline, get_pipeline_lookahead
+from src.active_learner.checkpoint import get_checkpoint_paths, clear_checkpoint, append_journal, save_checkpoint, restore_state
+from src.active_learner.instrumentation import Instrumentation
+from src.active_learner.pruning import get_algorithm_pruner
+from src.active_learner.measurement_store import get_measurement_store
+from src.active_learner.msg_sweep import feature_msg_bounds
 from src.user_config.config_manager import ConfigManager
 
-def train_model(n, ppn, msg_size, collective, min_reps=5, dump_data=False, data_file=None, X_train_precollect=None, y_train_precollect=None):
-  print(f"train_model: n={n}, ppn={ppn}, msg_size={msg_size}, collective={collective}, min_reps={min_reps}")
+def train_model(n, ppn, msg_size, collective, min_reps=5, dump_data=False, data_file=None, X_train_precollect=None, y_train_precollect=None, resume=False, prior_file=None, scheduler=None):
+  print(f"train_model: n={n}, ppn={ppn}, msg_size={msg_size}, collective={collective}, min_reps={min_reps}, resume={resume}, prior_file={prior_file}")
 
   #Preprocess the input values and generate the feature space
   new_n, new_ppn, new_msg_size = preprocess_features(n, ppn, msg_size)
   feature_space = create_feature_space(new_n, new_ppn, new_msg_size, collective)
+  msg_bounds = feature_msg_bounds(feature_space)
 
   #read algs into a dictionary, initialize X and Y arrays
   algs = read_algs(collective)
   X = add_algs(feature_space, algs)
-  X_train = X_train_precollect
+  X_train = compact_features(X_train_precollect) if X_train_precollect is not None else None
   y_train = y_train_precollect
   y_train_nf = None
 
+  #load the prior from a related tuning run to warm start the model
+  X_prior, y_prior = load_prior(prior_file, collective, feature_space, algs)
+
   #initialize variables
   first = True
   converged = False
+  timed_out = False
+  exhausted = False
   convergence_vals = []
   y = None
   rf = None
+  variances = None
+  predictions = None
+  iteration = 0
+  fit_times = []
+  measured = MeasuredIndex(X_train)
+  cost_model = CostModel()
+  selection_stability = SelectionStability(len(algs.keys()))
+  launches_at = {'variance': None}
+  #rows that were launched, rows served from the caches or pruned have no runtime
+  num_launches = 0
+  variance_sample = get_variance_sample(X)
+  instrumentation = Instrumentation(collective, n, ppn, msg_size)
+  pruner = get_algorithm_pruner(X, len(algs.keys()))
     
-  #initialize topology
-  num_processes=n*ConfigManager.get_instance().get_value('settings', 'max_ppn')
-  dummy_topo_instance = ConfigManager.get_instance().get_topology()
-  topo_file = dummy_topo_instance.gen_topology_file(num_processes)
-  topo = dummy_topo_instance.get_topology(topo_file)
+  #initialize topology, or use the topology of a scheduler shared with other collectives
+  if scheduler is None:
+    num_processes=n*ConfigManager.get_instance().get_value('settings', 'max_ppn')
+    dummy_topo_instance = ConfigManager.get_instance().get_topology()
+    topo_file = dummy_topo_instance.gen_topology_file(num_processes)
+    topo = dummy_topo_instance.get_topology(topo_file)
+  else:
+    topo = scheduler.topo
+
+  #determine how many points to benchmark per iteration, or how many benchmarks to keep queued with the async pipeline
+  #(a shared scheduler always uses the async pipeline)
+  pipeline = 'async' if scheduler is not None else get_pipeline()
+  if pipeline == 'async':
+    lookahead = get_pipeline_lookahead(topo, scheduler.num_learners if scheduler is not None else 1)
+    print("Keeping ", lookahead, " benchmark(s) queued or running")
+  else:
+    batch_size = get_batch_size(topo, len(algs.keys()))
+    print("Selecting ", batch_size, " point(s) per iteration")
+
+  #setup the measurement journal and checkpoints, restore a preempted run if requested
+  journal_path, checkpoint_path = get_checkpoint_paths(collective, n, ppn, msg_size)
+  checkpoint_interval = int(ConfigManager.get_instance().get_value('settings', 'checkpoint_interval', '5'))
+  if X_train_precollect is None:
+    state = restore_state(journal_path, checkpoint_path, len(algs.keys())) if resume else None
+    if state is not None:
+      X_train = state['X_train']
+      y_train_nf = state['y_train_nf']
+      y_train, _ = normalize_output(y_train_nf, len(algs.keys()), norm_type="alg")
+      convergence_vals = state['convergence_vals']
+      iteration = state['iteration']
+      converged = state['converged']
+      measured.add(X_train)
+      if pruner is not None:
+        pruner.add_measured(X_train, y_train_nf)
+      rf, fit_time = fit_model(None, X_train, y_train, iteration, *unmeasured_prior(X_prior, y_prior, measured))
+      fit_times.append(fit_time)
+      variances = jackknife_variances(rf, X)
+      first = False
+      print("Resumed from checkpoint with ", X_train.shape[0], " training points after ", iteration, " iterations")
+    else:
+      clear_checkpoint(journal_path, checkpoint_path)
 
   #setup the timeout timer
   start_time = time.time()  # Record the start time
@@ -55,7 +120,133 @@ def train_model(n, ppn, msg_size, collective, min_reps=5, dump_data=False, data_
   # TRAINING MODEL W/ ACTIVE LEARNING
   #
   ######################################################
-  if X_train is None:
+  if X_train_precollect is None and pipeline == 'async':
+    collector = AsyncCollector(collective, algs, topo, scheduler, msg_bounds)
+
+    #Queue the initial points, benchmarks start as soon as they fit on the allocation
+    if(first):
+      initial_points = get_initial_points(feature_space, len(algs.keys()))
+      initial_x = add_algs(initial_points, algs)
+      measured.add(initial_x)
+      collector.submit(initial_x)
+      print("Done initializing")
+      first = False
+
+    while not converged:
+
+      #
+      # STEP 1: KEEP THE PIPELINE FULL AND COLLECT FINISHED POINTS
+      #
+
+      #Select enough points to refill the queue, so freed nodes are reused while the model is refit
+      num_points = math.ceil((lookahead - collector.num_pending()) / len(algs.keys()))
+      if rf is not None and num_points > 0:
+        if variances is None:
+          with instrumentation.phase('variance'):
+            variances = full_variances(rf, X, variance_sample)
+        if pruner is not None:
+          with instrumentation.phase('pruning'):
+            pruner.update(predictions if predictions is not None else rf.predict(X), variances)
+        with instrumentation.phase('point_selection'):
+          scores = acquisition_scores(variances, X, cost_model)
+          new_point_x, new_point_index = point_selection_batch(rf, X_train, X, num_points, scores, measured)
+          new_points_x = add_algs(new_point_x[:,:-1], algs)
+          measured.add(new_points_x)
+          pruned = pruner.prune(new_points_x) if pruner is not None else None
+          collector.submit(new_points_x, pruned)
+          if pruner is not None:
+            pruner.add_saved(pruned & ~cached_rows(collective, algs, new_points_x))
+
+      #Wait for at least one point to finish all of its algorithms
+      with instrumentation.phase('benchmark'):
+        new_points_x, new_points_y, runtimes = collector.collect()
+      if new_points_x is None:
+        print("No points left to benchmark, exiting!")
+        exhausted = True
+        break
+      num_launches += np.count_nonzero(np.isfinite(runtimes))
+      instrumentation.add_benchmarks(new_points_x, new_points_y, runtimes, *result_iterations(collective, algs, new_points_x))
+      cost_model.update(new_points_x, runtimes)
+
+      #Add the points that message-size sweeps measured around the collected ones
+      harvested_x, harvested_y = harvested_points(collective, algs, X, measured)
+      if harvested_x is not None:
+        measured.add(harvested_x)
+        instrumentation.add_harvested(harvested_x, harvested_y, *result_iterations(collective, algs, harvested_x))
+        new_points_x = np.vstack([new_points_x, harvested_x])
+        new_points_y = np.append(new_points_y, harvested_y)
+
+      if pruner is not None:
+        pruner.add_measured(new_points_x, new_points_y)
+      append_journal(journal_path, new_points_x, new_points_y)
+
+      #Process the results, append to X_train/y_train/y_train_nf
+      new_y_train, new_y_train_nf = normalize_output(new_points_y, len(algs.keys()), norm_type="alg")
+      if X_train is None:
+        X_train, y_train, y_train_nf = new_points_x, new_y_train, new_y_train_nf
+      else:
+        X_train = np.vstack([X_train, new_points_x])
+        y_train = np.append(y_train, new_y_train)
+        y_train_nf = np.append(y_train_nf, new_y_train_nf)
+
+      #
+      # STEP 2: TRAIN THE MODEL (benchmarks keep running in the background)
+      #
+
+      with instrumentation.phase('fit'):
+        rf, fit_time = fit_model(rf, X_train, y_train, iteration, *unmeasured_prior(X_prior, y_prior, measured))
+      fit_times.append(fit_time)
+      iteration += 1
+      print("Iteration ", iteration, " trained on ", X_train.shape[0], " rows, fit time (seconds): ", fit_time)
+
+      #
+      # STEP 3: CHECK FOR EXIT CONDITIONS
+      #
+
+      with instrumentation.phase('variance'):
+        variances, predictions = convergence_statistic(rf, X, variance_sample, convergence_vals)
+
+      if iteration % checkpoint_interval == 0:
+        with instrumentation.phase('checkpoint'):
+          save_checkpoint(checkpoint_path, iteration, convergence_vals, X_train, y_train_nf)
+
+      with instrumentation.phase('convergence'):
+        converged = check_convergence(convergence_vals, min_reps, selection_stability, predictions, launches_at, num_launches)
+      if converged:
+        print("Active Learning reached convergence, exiting!")
+      instrumentation.end_iteration(iteration, X_train.shape[0])
+
+      elapsed_time = time.time() - start_time
+      if not converged and elapsed_time > timeout_seconds:
+        print("Timeout reached, exiting!")
+        converged = True
+        timed_out = True
+
+    #Wait for the running benchmarks and keep their results, queued benchmarks are dropped
+    new_points_x, new_points_y, runtimes = collector.close()
+    if new_points_x is not None:
+      num_launches += np.count_nonzero(np.isfinite(runtimes))
+      append_journal(journal_path, new_points_x, new_points_y)
+      new_y_train, new_y_train_nf = normalize_output(new_points_y, len(algs.keys()), norm_type="alg")
+      if X_train is None:
+        X_train, y_train, y_train_nf = new_points_x, new_y_train, new_y_train_nf
+      else:
+        X_train = np.vstack([X_train, new_points_x])
+        y_train = np.append(y_train, new_y_train)
+        y_train_nf = np.append(y_train_nf, new_y_train_nf)
+      rf, fit_time = fit_model(rf, X_train, y_train, iteration, *unmeasured_prior(X_prior, y_prior, measured))
+      fit_times.append(fit_time)
+    #a run that ran out of points to benchmark did not converge, resuming it may benchmark the rest
+    if X_train is not None:
+      save_checkpoint(checkpoint_path, iteration, convergence_vals, X_train, y_train_nf, converged=not (timed_out or exhausted))
+    report_convergence(launches_at, num_launches)
+    if variance_sample is not None:
+      variance_sample.report()
+    if pruner is not None:
+      pruner.report()
+
+  elif X_train_precollect is None:
+    store = get_measurement_store(topo)
     while not converged:
 
       #
@@ -65,15 +256,34 @@ def train_model(n, ppn, msg_size, collective, min_reps=5, dump_data=False, data_
       #If it is the first iteration, train for default initial points
       if(first):
         #Select inital training points
-        initial_points = get_initial_points(feature_space)
+        with instrumentation.phase('point_selection'):
+          initial_points = get_initial_points(feature_space, len(algs.keys()))
 
-        #Add all algorithms
-        X_train = add_algs(initial_points, algs)
+          #Add all algorithms
+          X_train = add_algs(initial_points, algs)
+          measured.add(X_train)
         
         print("Done initializing")
 
         #Collect the data
-        new_points_y = collect_point_batch(collective, algs, X_train, topo)
+        with instrumentation.phase('benchmark'):
+          new_points_y, runtimes = collect_point_batch(collective, algs, X_train, topo, return_runtimes=True, store=store, msg_bounds=msg_bounds)
+        num_launches += np.count_nonzero(np.isfinite(runtimes))
+        instrumentation.add_benchmarks(X_train, new_points_y, runtimes, *result_iterations(collective, algs, X_train))
+        cost_model.update(X_train, runtimes)
+
+        #Add the points that message-size sweeps measured around the collected ones
+        harvested_x, harvested_y = harvested_points(collective, algs, X, measured)
+        if harvested_x is not None:
+          measured.add(harvested_x)
+          instrumentation.add_harvested(harvested_x, harvested_y, *result_iterations(collective, algs, harvested_x))
+          X_train = np.vstack([X_train, harvested_x])
+          new_points_y = np.append(new_points_y, harvested_y)
+
+        if pruner is not None:
+          pruner.add_measured(X_train, new_points_y)
+
+        append_journal(journal_path, X_train, new_points_y)
 
         print("Done collecting first data")
 
@@ -85,18 +295,52 @@ def train_model(n, ppn, msg_size, collective, min_reps=5, dump_data=False, data_
 
       #Otherwise, use uncertainty calculations to determine the next point  
       else:
-        #Calculate uncertainty and select a point
-        new_point_x, new_point_index = point_selection_single(rf, X_train, X)
-        
-        #Retrieve all algorithm versions of the point (all other inputs/features are the same)
-        new_points_x = get_all_algs(new_point_x, algs)
+        #Select point(s) using the uncertainty computed for the current model in the previous iteration
+        #(per predicted second of benchmark time with acquisition = cost_aware),
+        #then retrieve all algorithm versions of each point (all other inputs/features are the same)
+        if variances is None:
+          with instrumentation.phase('variance'):
+            variances = full_variances(rf, X, variance_sample)
+        if pruner is not None:
+          with instrumentation.phase('pruning'):
+            pruner.update(predictions if predictions is not None else rf.predict(X), variances)
+        with instrumentation.phase('point_selection'):
+          scores = acquisition_scores(variances, X, cost_model)
+          if batch_size > 1:
+            new_point_x, new_point_index = point_selection_batch(rf, X_train, X, batch_size, scores, measured)
+            new_points_x = add_algs(new_point_x[:,:-1], algs)
+          else:
+            new_point_x, new_point_index = point_selection_single(rf, X_train, X, scores, measured)
+            new_points_x = get_all_algs(new_point_x, algs)
 
-        #Append to X_train
-        X_train = np.vstack([X_train, new_points_x])
+          #Append to X_train and the measured point index
+          X_train = np.vstack([X_train, new_points_x])
+          measured.add(new_points_x)
 
         #Collect the data
-        new_points_y = collect_point_batch(collective, algs, new_points_x, topo)
-      
+        #Algorithms pruned in the region of a point are not benchmarked
+        pruned = pruner.prune(new_points_x) if pruner is not None else None
+        with instrumentation.phase('benchmark'):
+          new_points_y, runtimes = collect_point_batch(collective, algs, new_points_x, topo, return_runtimes=True, pruned=pruned, store=store, msg_bounds=msg_bounds)
+        num_launches += np.count_nonzero(np.isfinite(runtimes))
+        if pruner is not None:
+          pruner.add_saved(pruned & ~cached_rows(collective, algs, new_points_x))
+        instrumentation.add_benchmarks(new_points_x, new_points_y, runtimes, *result_iterations(collective, algs, new_points_x))
+        cost_model.update(new_points_x, runtimes)
+
+        #Add the points that message-size sweeps measured around the collected ones
+        harvested_x, harvested_y = harvested_points(collective, algs, X, measured)
+        if harvested_x is not None:
+          measured.add(harvested_x)
+          instrumentation.add_harvested(harvested_x, harvested_y, *result_iterations(collective, algs, harvested_x))
+          X_train = np.vstack([X_train, harvested_x])
+          new_points_x = np.vstack([new_points_x, harvested_x])
+          new_points_y = np.append(new_points_y, harvested_y)
+
+        if pruner is not None:
+          pruner.add_measured(new_points_x, new_points_y)
+        append_journal(journal_path, new_points_x, new_points_y)
+
         #Process the results, append to y_train/y_train_nf
         new_y_train, new_y_train_nf = normalize_output(new_points_y, len(algs.keys()), norm_type="alg")
         y_train = np.append(y_train, new_y_train)
@@ -106,23 +350,32 @@ def train_model(n, ppn, msg_size, collective, min_reps=5, dump_data=False, data_
       # STEP 2: TRAIN THE MODEL
       #
       
-      #create moodel and fit it to the data
-      rf = RandomForestRegressor()
-      rf = rf.fit(X_train, y_train)
+      #create or update the model and fit it to the data, prior points that were benchmarked are superseded
+      with instrumentation.phase('fit'):
+        rf, fit_time = fit_model(rf, X_train, y_train, iteration, *unmeasured_prior(X_prior, y_prior, measured))
+      fit_times.append(fit_time)
+      iteration += 1
+      print("Iteration ", iteration, " fit time (seconds): ", fit_time)
 
       #
       # STEP 3: CHECK FOR EXIT CONDITIONS
       #
 
-      #collect convergence data
-      convergence_vals.append(jackknife(rf, X))
+      #collect convergence data, the uncertainty over the feature space is shared with point selection
+      with instrumentation.phase('variance'):
+        variances, predictions = convergence_statistic(rf, X, variance_sample, convergence_vals)
+
+      #periodically checkpoint the learner state
+      if iteration % checkpoint_interval == 0:
+        with instrumentation.phase('checkpoint'):
+          save_checkpoint(checkpoint_path, iteration, convergence_vals, X_train, y_train_nf)
 
-      #check for convergence if we have completed >min_reps
+      #check for convergence if we have completed >min_reps (both criteria are tracked for the report)
+      with instrumentation.phase('convergence'):
+        converged = check_convergence(convergence_vals, min_reps, selection_stability, predictions, launches_at, num_launches)
+      instrumentation.end_iteration(iteration, X_train.shape[0])
       if(len(convergence_vals) < int(min_reps)):
         continue
-      else:
-        if(convergence_criteria(convergence_vals)):
-          converged = True
 
       if(converged):
         print("Active Learning reached convergence, exiting!")
@@ -134,18 +387,33 @@ def train_model(n, ppn, msg_size, collective, min_reps=5, dump_data=False, data_
       if elapsed_time > timeout_seconds:
         print("Timeout reached, exiting!")
         converged = True
+        timed_out = True
+
+    if store is not None:
+      store.close()
+
+    #mark a converged run as finished so resuming it again does not collect more data
+    save_checkpoint(checkpoint_path, iteration, convergence_vals, X_train, y_train_nf, converged=not timed_out)
+    report_convergence(launches_at, num_launches)
+    if variance_sample is not None:
+      variance_sample.report()
+    if pruner is not None:
+      pruner.report()
       
   else:
-    rf = RandomForestRegressor()
-    rf = rf.fit(X_train, y_train)
-    elapsed_time = time.time() - start_time
+    rf, fit_time = fit_model(None, X_train, y_train, iteration, *unmeasured_prior(X_prior, y_prior, measured))
+    fit_times.append(fit_time)
   
   #print end time + elapsed time
+  elapsed_time = time.time() - start_time
   now = datetime.now()
   formatted_date_time = now.strftime("%Y-%m-%d %H:%M:%S")
   print("Ending training at: ", formatted_date_time, ", Elapsed Time (Seconds): ", elapsed_time)
+  print("Model fit times per iteration (seconds): ", fit_times)
+  instrumentation.close()
   if dump_data:
-      to_print = np.hstack((X_train, y_train[:, np.newaxis]))
+      benchmarked = np.isfinite(y_train)
+      to_print = np.hstack((X_train[benchmarked], y_train[benchmarked, np.newaxis]))
       np.savetxt(data_file, to_print, delimiter=',')
   
   return feature_space, rf
@@ -24,42 +24,35 @@ def read_algs(collective, algs_path=None):
     Warning("Warning: Collective Not Found!")
   return algs_dict
 
-#This function takes a 2D array of input args for the ML model and adds algorithms as another feature
+#This function returns the dtype of a feature array with algorithms added: compact feature spaces stay compact
+def _alg_space_dtype(features):
+  return features.dtype if np.issubdtype(features.dtype, np.integer) else float
+
+#This function takes a 2D array of input args for the ML model and adds algorithms as another feature.
+#Each row of the feature space is repeated once per algorithm, with the algorithm index as the last column.
 def add_algs(feature_space, algs):
   num_algs = len(list(algs.keys()))
-  if(np.squeeze(feature_space).ndim == 1):
-    alg_space = np.zeros((num_algs, feature_space.size + 1))
-    for j in range(num_algs):
-      index = j
-      alg_space[index,:-1] = feature_space
-      alg_space[index,-1] = j
+  feature_space = np.atleast_2d(np.squeeze(np.asarray(feature_space)))
+  num_points = feature_space.shape[0]
 
-  else:
-    alg_space = np.zeros((feature_space.shape[0]*num_algs, feature_space.shape[1]+1))
-    for i in range(feature_space.shape[0]):
-      for j in range(num_algs):
-        index = i*num_algs + j
-        alg_space[index,:-1] = feature_space[i,:]
-        alg_space[index,-1] = j
-  
+  alg_space = np.empty((num_points * num_algs, feature_space.shape[1] + 1), dtype=_alg_space_dtype(feature_space))
+  alg_space[:,:-1] = np.repeat(feature_space, num_algs, axis=0)
+  alg_space[:,-1] = np.tile(np.arange(num_algs), num_points)
   return alg_space
 
+#This function lazily adds algorithms to a feature space, yielding the rows of add_algs in chunks of
+#at most chunk_size points so the full algorithm-expanded matrix never has to be stored
+def add_algs_chunks(feature_space, algs, chunk_size=4096):
+  feature_space = np.atleast_2d(np.squeeze(np.asarray(feature_space)))
+  for start in range(0, feature_space.shape[0], chunk_size):
+    yield add_algs(feature_space[start:start + chunk_size], algs)
+
 
 #This function takes a set of input args and returns all possible algorithms for that input
 def get_all_algs(x, algs):
-  num_algs = len(list(algs.keys()))
-  new_points_x = np.zeros((num_algs, x.shape[0]))
-
-  i = 0
-  for key in algs.keys():
-    new_points_x[i,:-1] = x[:-1]
-    new_points_x[i,-1] = key
-    i+=1
-
+  x = np.asarray(x)
+  keys = np.fromiter(algs.keys(), dtype=int)
+  new_points_x = np.empty((keys.size, x.shape[0]), dtype=_alg_space_dtype(x))
+  new_points_x[:,:-1] = x[:-1]
+  new_points_x[:,-1] = keys
   return new_points_x
-
-
-
-
-
-
@@ -0,0 +1,314 @@
+# This file implements the asynchronous benchmark pipeline used with pipeline = async
+#
+# With pipeline = sync, every active learning iteration blocks until all benchmarks of the selected points
+# finish, so the allocation is idle while the model is refit. With pipeline = async, an AsyncCollector keeps
+# a queue of selected points and dispatches a benchmark as soon as the topology has room for it. A finished
+# benchmark frees its nodes and the next queued benchmark is dispatched right away, also while the learner
+# is refitting the model. The learner refits whenever a point has finished all of its algorithms and tops
+# up the queue to pipeline_depth times the capacity of the topology, so freed nodes never wait for the model.
+#
+# The benchmarks are dispatched by a BenchmarkScheduler, which can be shared by the AsyncCollectors of
+# several collectives that are tuned concurrently in one allocation (see multi_collective.py).
+#
+# With racing = successive_halving (see racing.py), the algorithms of a point are raced as one benchmark job
+# on the nodes of the point.
+
+import os
+import math
+import queue
+import shutil
+import threading
+import multiprocessing
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.measurement_store import get_measurement_store
+from src.active_learner.utils import pack_points
+from src.active_learner.racing import get_racing, last_round_rows
+from src.active_learner.persistent_driver import uses_driver, AlgorithmSelectionError
+from src.active_learner.data_collect import (FAILED_LATENCY, _result_cache, _result_iterations, _cache_key, _store_key,
+                                             _lookup_store, _harvest_sweep, _launch_iterations, _observe_runs,
+                                             collect_point_timed, row_benchmark_function, race_point, drive_point, with_nodefile,
+                                             create_unique_directory)
+
+# This function returns the benchmark pipeline ("sync" or "async")
+def get_pipeline():
+  return ConfigManager.get_instance().get_value('settings', 'pipeline', 'sync')
+
+# This function returns how many benchmark rows each learner keeps queued or running with pipeline = async,
+# the capacity of the topology is split between the learners that share it
+def get_pipeline_lookahead(topo, num_learners=1):
+  pipeline_depth = float(ConfigManager.get_instance().get_value('settings', 'pipeline_depth', '2'))
+  return max(1, math.ceil(pipeline_depth * topo.get_capacity() / num_learners))
+
+# This function splits the rows of a feature array into points (rows that only differ by algorithm), in order
+def split_points(points_x):
+  _, first, point_ids = np.unique(pack_points(points_x), return_index=True, return_inverse=True)
+  point_ids = point_ids.reshape(-1)
+  return [np.flatnonzero(point_ids == point_id) for point_id in np.argsort(first, kind='stable')]
+
+class BenchmarkScheduler:
+  def __init__(self, topo, num_learners=1):
+    self.topo = topo
+    self.num_learners = num_learners
+    self.lock = threading.Condition(threading.RLock())
+    self.queued = []
+    self.in_flight = {}
+    self.next_job_id = 0
+    self.head_skips = 0
+    # Benchmarks behind a waiting benchmark may start first if they fit (backfill), but only this many times
+    # in a row so large benchmarks are not starved by a stream of small ones
+    self.backfill_limit = max(1, topo.get_capacity())
+    self.nodefile_dir_path = create_unique_directory(ConfigManager.get_instance().get_value('settings', 'acclaim_root'))
+    self.pool = multiprocessing.Pool(processes=max(1, topo.get_capacity()))
+
+  # Queues a benchmark of a collector, on_finished(output) is called with the lock held when it finishes.
+  # The benchmark runs benchmark_function(*args) with the nodefile inserted (see with_nodefile) and covers
+  # num_rows benchmark rows.
+  def submit(self, owner, num_nodes, args, on_finished, benchmark_function=collect_point_timed, num_rows=1):
+    with self.lock:
+      self.queued.append((owner, num_nodes, args, on_finished, benchmark_function, num_rows))
+      self._dispatch()
+
+  # Returns the number of benchmark rows of a collector that are queued or running
+  def num_pending(self, owner):
+    with self.lock:
+      return (sum(job[5] for job in self.queued if job[0] is owner) +
+              sum(job[4] for job in self.in_flight.values() if job[0] is owner))
+
+  # Drops the queued benchmarks of a collector and waits for its running benchmarks to finish
+  def cancel(self, owner):
+    with self.lock:
+      self.queued = [job for job in self.queued if job[0] is not owner]
+      self.head_skips = 0
+      while any(job[0] is owner for job in self.in_flight.values()):
+        self.lock.wait()
+
+  # Frees the nodes of a failed fit attempt, keeping the nodes of the running benchmarks in use
+  def _rebuild_occupancy(self):
+    self.topo.reset_fit()
+    for _, nodes, _, _, _ in self.in_flight.values():
+      self.topo.reserve_nodes(nodes)
+
+  # Starts queued benchmarks that fit on the free nodes (the lock must be held)
+  def _dispatch(self):
+    index = 0
+    while index < len(self.queued):
+      owner, num_nodes, args, on_finished, benchmark_function, num_rows = self.queued[index]
+      nodes = self.topo.fit_point(num_nodes)
+      if not nodes:
+        self._rebuild_occupancy()
+        if index == 0 and len(self.in_flight) == 0:
+          # Nothing is running, so the benchmark can never fit
+          self.queued.pop(0)
+          owner.fail(RuntimeError(f"The point {args[2]} does not fit in the allocation"))
+          continue
+        if index == 0 and self.head_skips >= self.backfill_limit:
+          return
+        index += 1
+        continue
+
+      job_id = self.next_job_id
+      self.next_job_id += 1
+      nodefile_path = self.topo.create_nodefile(nodes, os.path.join(self.nodefile_dir_path, f"nodefile{job_id}"))
+      self.in_flight[job_id] = (owner, nodes, nodefile_path, on_finished, num_rows)
+      self.queued.pop(index)
+      self.head_skips = self.head_skips + 1 if index > 0 else 0
+      self.pool.apply_async(benchmark_function, with_nodefile(args, nodefile_path),
+                            callback=lambda output, job_id=job_id: self._finished(job_id, output),
+                            error_callback=lambda error, job_id=job_id: self._failed(job_id, error))
+
+  # Records a finished benchmark, frees its nodes and dispatches the next queued benchmarks (runs in the pool's result thread)
+  def _finished(self, job_id, output):
+    with self.lock:
+      _, nodes, nodefile_path, on_finished, _ = self.in_flight.pop(job_id)
+      self.topo.release_nodes(nodes)
+      if nodefile_path and os.path.exists(nodefile_path):
+        os.remove(nodefile_path)
+      on_finished(output)
+      self.lock.notify_all()
+      try:
+        self._dispatch()
+      except ValueError:
+        # The pool is closing, queued benchmarks are dropped
+        self.queued = []
+
+  # Records a benchmark that raised as failed, an algorithm the driver cannot select is also reported to its collector
+  def _failed(self, job_id, error):
+    with self.lock:
+      owner = self.in_flight[job_id][0]
+      self._finished(job_id, (FAILED_LATENCY, np.nan, np.nan, np.nan))
+      if isinstance(error, AlgorithmSelectionError):
+        owner.fail(error)
+
+  # Drops all queued benchmarks, waits for the running ones and frees the allocation
+  def close(self):
+    with self.lock:
+      self.queued = []
+    self.pool.close()
+    self.pool.join()
+    self.topo.reset_fit()
+    if os.path.isdir(self.nodefile_dir_path):
+      shutil.rmtree(self.nodefile_dir_path)
+
+class AsyncCollector:
+  def __init__(self, name, algs, topo, scheduler=None, msg_bounds=None):
+    self.name = name
+    self.algs = algs
+    self.msg_bounds = msg_bounds
+    self.owns_scheduler = scheduler is None
+    self.scheduler = BenchmarkScheduler(topo) if scheduler is None else scheduler
+    self.lock = self.scheduler.lock
+    self.points = {}
+    self.completed = queue.Queue()
+    self.next_point_id = 0
+    self.error = None
+    self.store = get_measurement_store(topo)
+
+  # Returns the number of benchmark rows that are queued or running
+  def num_pending(self):
+    return self.scheduler.num_pending(self)
+
+  # Queues the rows of one or more points, rows that were already collected are served from the result cache
+  # or the measurement store. Points are returned by collect() once all of their rows have finished.
+  # Rows marked in pruned (see pruning.py) are not launched and get a NaN latency.
+  def submit(self, points_x, pruned=None):
+    points_x = np.atleast_2d(points_x)
+    keys = [_cache_key(self.name, self.algs, row) for row in points_x]
+    skipped = np.zeros(len(keys), dtype=bool) if pruned is None else np.asarray(pruned, dtype=bool)
+    # Pruned rows are looked up too, so they only count as saved launches if they are not stored (see cached_rows)
+    stored = {}
+    missing = [i for i, key in enumerate(keys) if key not in _result_cache]
+    if self.store is not None and len(missing) > 0:
+      stored = _lookup_store(self.store, self.name, [keys[i] for i in missing], points_x[missing])
+
+    with self.lock:
+      _result_cache.update(stored)
+      for rows in split_points(points_x):
+        point_id = self.next_point_id
+        self.next_point_id += 1
+        point = {'X': points_x[rows], 'y': np.zeros(rows.size), 'runtimes': np.full(rows.size, np.nan),
+                 'iterations': np.full(rows.size, np.nan), 'warmup': np.full(rows.size, np.nan),
+                 'finished': np.ones(rows.size, dtype=bool), 'runs': [], 'sweeps': [], 'remaining': 0}
+        self.points[point_id] = point
+        launches = []
+        for i, row in enumerate(rows):
+          if skipped[row]:
+            point['y'][i] = np.nan
+          elif keys[row] in _result_cache:
+            point['y'][i] = _result_cache[keys[row]]
+          else:
+            launches.append(i)
+        point['remaining'] = len(launches)
+        if point['remaining'] == 0:
+          self.completed.put(point_id)
+        num_nodes = 2 ** (int(point['X'][0,0]) - 1)
+        iterations, warmup = _launch_iterations(self.name, point['X'])
+        if get_racing() == 'successive_halving' and len(launches) > 0:
+          launches = np.asarray(launches)
+          self.scheduler.submit(self, num_nodes, (self.name, self.algs, point['X'][launches], iterations[launches[0]], warmup[launches[0]]),
+                                lambda output, point_id=point_id, i=launches: self._finished(point_id, i, output),
+                                benchmark_function=race_point, num_rows=launches.size)
+          continue
+        benchmark_function = row_benchmark_function(self.msg_bounds)
+        if uses_driver(self.name) and len(launches) > 0:
+          # All rows of the point share one launch of the persistent driver
+          launches = np.asarray(launches)
+          self.scheduler.submit(self, num_nodes, (self.name, self.algs, point['X'][launches], [iterations[i] for i in launches],
+                                                  [warmup[i] for i in launches], benchmark_function),
+                                lambda output, point_id=point_id, i=launches: self._finished(point_id, i, output),
+                                benchmark_function=drive_point, num_rows=launches.size)
+          continue
+        for i in launches:
+          self.scheduler.submit(self, num_nodes, (self.name, self.algs, point['X'][i], iterations[i], warmup[i]),
+                                lambda output, point_id=point_id, i=i: self._finished(point_id, i, output),
+                                benchmark_function=benchmark_function)
+
+  # Records a finished benchmark of a point (called by the scheduler with the lock held), a race finishes
+  # the rows i of the point at once and also returns all of its runs, a sweep also returns its other message sizes.
+  # A job of the persistent driver returns the outputs of the rows i as a list.
+  def _finished(self, point_id, i, output):
+    if isinstance(output, list):
+      for row, row_output in zip(np.atleast_1d(i), output):
+        self._finished(point_id, row, row_output)
+      return
+    point = self.points[point_id]
+    point['y'][i], point['runtimes'][i], point['iterations'][i], point['warmup'][i] = output[:4]
+    if np.ndim(output[2]) > 0:
+      point['finished'][i] = last_round_rows(output[2])
+    if len(output) > 4:
+      point['runs'].extend((np.atleast_1d(i)[int(row)], latency, count) for row, latency, count in output[4])
+    else:
+      point['runs'].append((i, output[0], output[2]))
+    if len(output) > 5:
+      point['sweeps'].append((i, output[5]))
+    point['remaining'] -= np.size(i)
+    if point['remaining'] == 0:
+      self.completed.put(point_id)
+
+  # Reports an error to the learner, it is raised by the next call to collect()
+  def fail(self, error):
+    self.error = error
+    self.completed.put(None)
+
+  # Returns the points that finished all of their rows as (X, y, runtimes), or (None, None, None) if there are none.
+  # With block, waits until at least one point has finished if any benchmark is still pending.
+  def collect(self, block=True):
+    point_ids = []
+    try:
+      if block and self.num_pending() > 0 and self.completed.empty():
+        point_ids.append(self.completed.get())
+      while True:
+        point_ids.append(self.completed.get_nowait())
+    except queue.Empty:
+      pass
+    if self.error is not None:
+      error, self.error = self.error, None
+      raise error
+    if len(point_ids) == 0:
+      return None, None, None
+
+    with self.lock:
+      points = [self.points.pop(point_id) for point_id in point_ids]
+    X = np.vstack([point['X'] for point in points])
+    y = np.concatenate([point['y'] for point in points])
+    runtimes = np.concatenate([point['runtimes'] for point in points])
+
+    iterations = np.concatenate([point['iterations'] for point in points])
+    warmup = np.concatenate([point['warmup'] for point in points])
+    finished = np.concatenate([point['finished'] for point in points])
+    for point in points:
+      if len(point['runs']) > 0:
+        rows, latencies, counts = zip(*point['runs'])
+        _observe_runs(self.name, point['X'][list(rows)], latencies, counts)
+
+    # Cache the new results, failures are not cached so the point is retried if it is requested again.
+    # Algorithms dropped early by a race were measured with fewer iterations, their latencies are not reused.
+    new_results = {}
+    new_iterations = {}
+    for row, latency, runtime, count, warmup_count, last_round in zip(X, y, runtimes, iterations, warmup, finished):
+      if np.isfinite(runtime) and latency != FAILED_LATENCY:
+        key = _cache_key(self.name, self.algs, row)
+        _result_iterations[key] = (int(count), int(warmup_count))
+        if last_round:
+          new_results[key] = latency
+          new_iterations[key] = _result_iterations[key]
+    _result_cache.update(new_results)
+    for point in points:
+      for i, sweep in point['sweeps']:
+        for key in _harvest_sweep(self.name, self.algs, point['X'][i], sweep):
+          new_results[key], new_iterations[key] = _result_cache[key], _result_iterations[key]
+    if self.store is not None and len(new_results) > 0:
+      self.store.insert_many({_store_key(key): latency for key, latency in new_results.items()},
+                             {_store_key(key): counts for key, counts in new_iterations.items()})
+    return X, y, runtimes
+
+  # Drops the queued benchmarks, waits for the running ones and returns the points they completed
+  def close(self):
+    if self.owns_scheduler:
+      self.scheduler.close()
+    else:
+      self.scheduler.cancel(self)
+    X, y, runtimes = self.collect(block=False)
+    if self.store is not None:
+      self.store.close()
+    return X, y, runtimes
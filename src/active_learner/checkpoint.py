@@ -0,0 +1,101 @@
+# This file saves the active learning state during training so a preempted run can be resumed in a new allocation
+#
+# Every batch of collected points is appended to a measurement journal (CSV rows of preprocessed features
+# followed by the raw latency), so no benchmark data is lost if the job is killed. The learner state
+# (iteration, convergence values and training data) is checkpointed every checkpoint_interval iterations.
+# On resume, the journal is the source of the training data and the checkpoint restores the rest.
+
+import os
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.utils import compact_features
+
+# This function returns whether the user requested to resume from a checkpoint (make ... RESUME=1)
+def resume_requested():
+  return os.environ.get('ACCLAIM_RESUME', '0') == '1'
+
+# This function returns the journal and checkpoint paths for a tuning run
+def get_checkpoint_paths(collective, n, ppn, msg_size):
+  root_path = ConfigManager.get_instance().get_value('settings', 'acclaim_root')
+  checkpoint_dir = ConfigManager.get_instance().get_value('settings', 'checkpoint_dir', os.path.join(root_path, "_checkpoints"))
+  os.makedirs(checkpoint_dir, exist_ok=True)
+  base_path = os.path.join(checkpoint_dir, f"{collective}_{n}_{ppn}_{msg_size}")
+  return base_path + ".journal.csv", base_path + ".checkpoint.npz"
+
+# This function removes the journal and checkpoint of a previous run
+def clear_checkpoint(journal_path, checkpoint_path):
+  for path in [journal_path, checkpoint_path]:
+    if os.path.exists(path):
+      os.remove(path)
+
+# This function appends collected points to the journal and forces them to disk
+def append_journal(journal_path, X, y_nf):
+  rows = np.hstack((np.atleast_2d(X), np.reshape(y_nf, (-1,1))))
+  with open(journal_path, 'a') as journal_file:
+    np.savetxt(journal_file, rows, delimiter=',')
+    journal_file.flush()
+    os.fsync(journal_file.fileno())
+
+# This function reads the journal, returns (X_train, y_train_nf) or (None, None) if there is no data
+def read_journal(journal_path, num_algs):
+  if not os.path.exists(journal_path) or os.path.getsize(journal_path) == 0:
+    return None, None
+
+  rows = []
+  with open(journal_path) as journal_file:
+    for line in journal_file:
+      values = line.strip().split(',')
+      # Skip a line that was only partially written when the job was killed
+      try:
+        rows.append([float(value) for value in values])
+      except ValueError:
+        continue
+  rows = [row for row in rows if len(row) == 5]
+
+  # Each point needs all of its algorithms to be normalized, drop an incomplete trailing point
+  num_rows = len(rows) - len(rows) % num_algs
+  if num_rows == 0:
+    return None, None
+  data = np.asarray(rows[:num_rows])
+  return compact_features(data[:,:-1]), data[:,-1]
+
+# This function atomically writes a checkpoint of the learner state
+def save_checkpoint(checkpoint_path, iteration, convergence_vals, X_train, y_train_nf, converged=False):
+  tmp_path = checkpoint_path + ".tmp.npz"
+  np.savez(tmp_path,
+           iteration=iteration,
+           convergence_vals=np.asarray(convergence_vals, dtype=float),
+           X_train=X_train,
+           y_train_nf=y_train_nf,
+           converged=converged)
+  os.replace(tmp_path, checkpoint_path)
+
+# This function loads a checkpoint, returns None if it does not exist
+def load_checkpoint(checkpoint_path):
+  if not os.path.exists(checkpoint_path):
+    return None
+  with np.load(checkpoint_path) as data:
+    return {
+      'iteration': int(data['iteration']),
+      'convergence_vals': data['convergence_vals'].tolist(),
+      'X_train': compact_features(data['X_train']),
+      'y_train_nf': data['y_train_nf'],
+      'converged': bool(data['converged']),
+    }
+
+# This function restores the learner state from the journal and checkpoint, returns None if there is nothing to restore
+def restore_state(journal_path, checkpoint_path, num_algs):
+  state = load_checkpoint(checkpoint_path)
+  X_journal, y_journal = read_journal(journal_path, num_algs)
+  if state is None and X_journal is None:
+    return None
+  if state is None:
+    state = {'iteration': 0, 'convergence_vals': [], 'converged': False}
+
+  # The journal also contains the points collected after the last checkpoint
+  if X_journal is not None and ('X_train' not in state or X_journal.shape[0] > state['X_train'].shape[0]):
+    state['X_train'] = X_journal
+    state['y_train_nf'] = y_journal
+    state['converged'] = False
+
+  return state
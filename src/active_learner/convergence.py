@@ -1,9 +1,18 @@
 # This file contains all functions to deal with model convergence
+#
+# convergence_mode = variance: training stops once the mean jackknife variance changed by less than
+#   convergence_threshold over the last four iterations (the default). The mean is estimated from a stratified
+#   sample of the feature space with variance_estimate = subsample (see jackknife.py).
+# convergence_mode = selection: training stops once the predicted best-algorithm map over the feature space,
+#   which is what the tuning file is generated from, has not changed for stability_iterations iterations.
+#   With stability_weighting = gain, each change is weighted by how much latency the previous choice loses
+#   at that point, so flips between nearly identical algorithms do not delay convergence.
 
 import os
 import csv
 import numpy as np
 from src.user_config.config_manager import ConfigManager
+from src.active_learner.jackknife import jackknife, jackknife_variances
 
 #This function checks whether a model has converged
 def convergence_criteria(convergence_vals):
@@ -20,4 +29,85 @@ def convergence_criteria(convergence_vals):
   return True
 
 
+# This function returns the convergence criterion that ends training ("variance" or "selection")
+def get_convergence_mode():
+  return ConfigManager.get_instance().get_value('settings', 'convergence_mode', 'variance')
 
+# This class tracks how much the predicted best-algorithm map changes between iterations
+class SelectionStability:
+  def __init__(self, num_algs):
+    config = ConfigManager.get_instance()
+    self.num_algs = num_algs
+    self.iterations = int(config.get_value('settings', 'stability_iterations', '5'))
+    self.tolerance = float(config.get_value('settings', 'stability_tolerance', '0.01'))
+    self.weighting = config.get_value('settings', 'stability_weighting', 'gain')
+    self.best_algs = None
+    self.changes = []
+
+  # Returns the fraction of the map that changed between the previous and the current best algorithms.
+  # y_pred are normalized predictions (log10 of the latency relative to algorithm 0), num_algs per point.
+  def map_change(self, previous_best_algs, best_algs, y_pred):
+    changed = previous_best_algs != best_algs
+    if self.weighting != 'gain':
+      return np.count_nonzero(changed) / changed.size
+    # Latency lost by shipping the previous choice, relative to the total gain over the default algorithm
+    points = np.arange(best_algs.size)
+    regret = y_pred[points, previous_best_algs] - y_pred[points, best_algs]
+    gain = np.sum(y_pred[:,0] - y_pred[points, best_algs])
+    return np.sum(regret[changed]) / gain if gain > 0 else float(np.any(changed))
+
+  # Adds the predictions of the current model over the feature space, returns the change of the map
+  def update(self, y_pred):
+    y_pred = np.reshape(y_pred, (-1, self.num_algs))
+    best_algs = np.argmin(y_pred, axis=1)
+    if self.best_algs is not None:
+      self.changes.append(self.map_change(self.best_algs, best_algs, y_pred))
+    self.best_algs = best_algs
+    return self.changes[-1] if len(self.changes) > 0 else None
+
+  # Returns whether the map has not changed (within stability_tolerance) for stability_iterations iterations
+  def is_stable(self):
+    if len(self.changes) < self.iterations:
+      return False
+    return all(change <= self.tolerance for change in self.changes[-self.iterations:])
+
+# This function reports when each tracked convergence criterion was first met, in benchmark launches
+def report_convergence(launches_at, num_launches):
+  met = {mode: launches for mode, launches in launches_at.items() if launches is not None}
+  for mode in launches_at:
+    if mode in met:
+      print("The ", mode, " convergence criterion was met after ", met[mode], " benchmark launches")
+    else:
+      print("The ", mode, " convergence criterion was not met within ", num_launches, " benchmark launches")
+  if len(met) == 2:
+    saved = met['variance'] - met['selection']
+    if saved >= 0:
+      print("The selection criterion saves ", saved, " benchmark launches compared with the variance criterion")
+    else:
+      print("The selection criterion needs ", -saved, " more benchmark launches than the variance criterion")
+
+# This function evaluates the convergence criteria after an iteration and records when each was first met
+# (in benchmark launches). The selection criterion is only tracked while predictions over the feature space
+# (y_pred) are available. Returns whether the configured criterion is met after at least min_reps iterations.
+def check_convergence(convergence_vals, min_reps, selection_stability, y_pred, launches_at, num_launches):
+  if y_pred is not None:
+    selection_stability.update(y_pred)
+    if launches_at.setdefault('selection', None) is None and selection_stability.is_stable():
+      launches_at['selection'] = num_launches
+  if len(convergence_vals) < int(min_reps):
+    return False
+  if launches_at.get('variance') is None and convergence_criteria(convergence_vals):
+    launches_at['variance'] = num_launches
+  return launches_at.get(get_convergence_mode()) is not None
+
+# This function computes the convergence statistic of a model and appends it to convergence_vals. Returns the
+# variances and predictions over the feature space X, the variances are None if the statistic was estimated from
+# a sample and the predictions are then only computed if convergence_mode = selection needs them.
+def convergence_statistic(regressor, X, variance_sample, convergence_vals):
+  if variance_sample is None:
+    variances, predictions = jackknife_variances(regressor, X, return_predictions=True)
+    convergence_vals.append(jackknife(regressor, X, variances))
+    return variances, predictions
+  convergence_vals.append(variance_sample.estimate(regressor, X))
+  predictions = regressor.predict(X) if get_convergence_mode() == 'selection' else None
+  return None, predictions
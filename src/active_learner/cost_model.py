@@ -0,0 +1,99 @@
+# This file predicts the wall time of benchmarking a point so point selection can weigh uncertainty against cost
+#
+# The cost model is learned online from the observed runtimes of microbenchmark launches. The log2 runtime
+# of a launch is fit with a ridge regression on a quadratic basis of the preprocessed features
+# (n, ppn, msg_size are log2 exponents), which captures both the fixed launch overhead of small messages
+# and the growth of the runtime with message size and scale.
+#
+# acquisition = variance: points are ranked by jackknife variance (the default)
+# acquisition = cost_aware: points are ranked by jackknife variance per predicted second of benchmark time,
+#   where the cost of a point is the predicted runtime of all of its algorithms
+#
+# Before any runtime is observed (e.g., to bound the cost of the initial design), prior_point_costs() gives a
+# rough analytic estimate: a launch overhead growing with the node count plus the OSU iterations of a
+# bandwidth-bound collective.
+
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.utils import pack_points
+from src.active_learner.instrumentation import measured_seconds
+
+# Ridge penalty of the least squares fit, keeps the fit stable while few runtimes are observed
+COST_REGULARIZATION = 1e-3
+
+# How far (in log2 seconds) predictions may extrapolate beyond the slowest observed launch
+COST_EXTRAPOLATION_LOG2 = 4
+
+# Prior runtime of a launch: a fixed overhead plus an overhead per doubling of the node count, and the time of the
+# OSU iterations at the given bandwidth (bytes per second) for every doubling of the number of processes
+PRIOR_LAUNCH_SECONDS = 1.0
+PRIOR_SECONDS_PER_NODE_DOUBLING = 0.5
+PRIOR_BANDWIDTH = 1e9
+
+# This function returns the acquisition mode used for point selection
+def get_acquisition():
+  return ConfigManager.get_instance().get_value('settings', 'acquisition', 'variance')
+
+# This function expands feature rows (n, ppn, msg_size, alg) into the quadratic basis of the cost model
+def cost_basis(X):
+  X = np.atleast_2d(np.asarray(X, dtype=float))
+  n, ppn, msg_size = X[:,0], X[:,1], X[:,2]
+  return np.column_stack((np.ones(X.shape[0]), n, ppn, msg_size,
+                          n * n, ppn * ppn, msg_size * msg_size,
+                          n * ppn, n * msg_size, ppn * msg_size))
+
+class CostModel:
+  def __init__(self, regularization=COST_REGULARIZATION):
+    num_basis = cost_basis(np.zeros((1,4))).shape[1]
+    self.regularization = regularization
+    self.gram = np.zeros((num_basis, num_basis))
+    self.moment = np.zeros(num_basis)
+    self.count = 0
+    self.min_log_runtime = np.inf
+    self.max_log_runtime = -np.inf
+    self.coefficients = None
+
+  # Adds observed runtimes in seconds, rows without a runtime (NaN, e.g. served from a cache) are ignored
+  def update(self, X, runtimes):
+    runtimes = np.asarray(runtimes, dtype=float).reshape(-1)
+    observed = np.isfinite(runtimes) & (runtimes > 0)
+    if not np.any(observed):
+      return
+    basis = cost_basis(X)[observed]
+    log_runtimes = np.log2(runtimes[observed])
+    self.gram += basis.T @ basis
+    self.moment += basis.T @ log_runtimes
+    self.count += log_runtimes.size
+    self.min_log_runtime = min(self.min_log_runtime, np.min(log_runtimes))
+    self.max_log_runtime = max(self.max_log_runtime, np.max(log_runtimes))
+    self.coefficients = np.linalg.solve(self.gram + self.regularization * np.eye(self.gram.shape[0]), self.moment)
+
+  # Predicts the runtime in seconds of every row, all rows cost 1 second until a runtime was observed
+  def predict(self, X):
+    if self.coefficients is None:
+      return np.ones(np.atleast_2d(X).shape[0])
+    log_runtimes = cost_basis(X) @ self.coefficients
+    log_runtimes = np.clip(log_runtimes, self.min_log_runtime, self.max_log_runtime + COST_EXTRAPOLATION_LOG2)
+    return np.exp2(log_runtimes)
+
+  # Predicts the cost of every row as the runtime of benchmarking all algorithms of its point
+  def point_costs(self, X):
+    X = np.atleast_2d(X)
+    _, point_ids = np.unique(pack_points(X), return_inverse=True)
+    point_ids = point_ids.reshape(-1)
+    return np.bincount(point_ids, weights=self.predict(X))[point_ids]
+
+# This function estimates the cost in seconds of benchmarking all algorithms of every point of a feature space
+# (n, ppn, msg_size) before any runtime was observed
+def prior_point_costs(feature_space, num_algs):
+  feature_space = np.atleast_2d(np.asarray(feature_space, dtype=float))
+  n, ppn, msg_size = feature_space[:,0] - 1, feature_space[:,1] - 1, feature_space[:,2] - 1
+  launch_seconds = PRIOR_LAUNCH_SECONDS + PRIOR_SECONDS_PER_NODE_DOUBLING * n
+  latencies = 2 ** msg_size * (n + ppn + 1) / PRIOR_BANDWIDTH * 1e6
+  return num_algs * (launch_seconds + measured_seconds(latencies, feature_space[:,2]))
+
+# This function returns the scores used to rank points for selection
+def acquisition_scores(variances, X, cost_model=None):
+  if cost_model is None or get_acquisition() != 'cost_aware':
+    return variances
+  return np.asarray(variances, dtype=float) / cost_model.point_costs(X)
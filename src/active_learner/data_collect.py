@@ -6,8 +6,11 @@
 #   $3 = Number of nodes
 #   $4 = Number of points per node
 #   $5 = Message size
+#   $6, $7 (optional) = Number of measured and warmup iterations, the OSU defaults if not given
+#   $8 (optional) = Largest message size, all message sizes from $5 to $8 are measured in one launch
 
 import itertools
+import functools
 import numpy as np #type: ignore
 import subprocess
 import multiprocessing
@@ -16,11 +19,29 @@ import os
 import glob
 import uuid
 import shutil
+import time
 from datetime import datetime
 from src.user_config.config_manager import ConfigManager
+from src.active_learner.measurement_store import get_measurement_store
+from src.active_learner.utils import pack_points
+from src.active_learner.instrumentation import osu_default_iterations
+from src.active_learner.racing import RACING_GROWTH, get_racing, get_racing_parameters, race_survivors, round_iterations, last_round_rows
+from src.active_learner.iteration_policy import get_iteration_policy
+from src.active_learner.msg_sweep import get_sweep_width, sweep_sizes
+from src.active_learner.persistent_driver import uses_driver, get_driver, close_drivers, AlgorithmSelectionError
+
+# Latency reported for a point whose microbenchmark failed on every retry
+FAILED_LATENCY = 2000000
+
+# In-memory cache of collected latencies keyed by (collective, algorithm, n, ppn, msg_size) in preprocessed form,
+# duplicate requests are served from here instead of relaunching the microbenchmark
+_result_cache = {}
+
+# The (measured, warmup) OSU iteration counts of the cached results that were collected in this process
+_result_iterations = {}
 
 # This function uses a Python subprocess to run the microbenchmark script 
-def run_mb_runner(name, alg, n, ppn, msg_size, nodefile_path=None):
+def run_mb_runner(name, alg, n, ppn, msg_size, nodefile_path=None, iterations=None, warmup=None, max_msg_size=None):
     n = int(n)
     ppn = int(ppn)
     msg_size = int(msg_size)
@@ -31,6 +52,12 @@ def run_mb_runner(name, alg, n, ppn, msg_size, nodefile_path=None):
     else:
         runner = ConfigManager.get_instance().get_value('settings', 'runner')
 
+    # The iteration counts are only passed if they are set, so older runner scripts keep working
+    iteration_args = [] if iterations is None else [str(int(iterations)), str(int(warmup)) if warmup is not None else ""]
+    # The largest message size of a sweep follows the (possibly empty) iteration counts
+    if max_msg_size is not None:
+        iteration_args = (iteration_args if iteration_args else ["", ""]) + [str(int(max_msg_size))]
+
     try:
         result = subprocess.run([runner,
                                  ConfigManager.get_instance().get_value('settings', 'mpich_path'),
@@ -41,7 +68,7 @@ def run_mb_runner(name, alg, n, ppn, msg_size, nodefile_path=None):
                                  str(n),
                                  str(ppn),
                                  str(msg_size),
-                                 nodefile_path if nodefile_path else ""],
+                                 nodefile_path if nodefile_path else ""] + iteration_args,
                                 check=True, capture_output=True, text=True)
         return result.stdout, result.stderr
     except subprocess.CalledProcessError as e:
@@ -80,34 +107,177 @@ def parse_runner_output(output, stderr, name, alg, n, ppn, msg_size, nodefile_pa
         print("STDERR:", stderr)
         raise ValueError
 
-# This function runs the mb_runner and parses the output, combining the previous two functions
-def collect_point_runner(name, alg, n, ppn, msg_size, nodefile_path=None):
-  stdout, stderr = run_mb_runner(name, alg, n, ppn, msg_size, nodefile_path)
+# This function parses the latencies of every message size in the output from the runner script,
+# returns a dictionary of message size -> latency
+def parse_sweep_output(output):
+    totals = {}
+    for line in output.splitlines():
+        # Skip comment lines and empty lines
+        if line.startswith('#') or not line.strip():
+            continue
+        parts = line.split()
+        try:
+            msg_size, latency = int(parts[0]), float(parts[1])
+        except (IndexError, ValueError):
+            continue
+        total, count = totals.get(msg_size, (0.0, 0))
+        totals[msg_size] = (total + latency, count + 1)
+    return {msg_size: total / count for msg_size, (total, count) in totals.items()}
+
+# This function runs the mb_runner and parses the output, combining the previous two functions.
+# With a persistent benchmark driver (see persistent_driver.py), the benchmark runs on the driver instead.
+def collect_point_runner(name, alg, n, ppn, msg_size, nodefile_path=None, iterations=None, warmup=None):
+  if uses_driver(name):
+    return get_driver(n, ppn, nodefile_path).measure(name, alg, msg_size, iterations, warmup)
+  stdout, stderr = run_mb_runner(name, alg, n, ppn, msg_size, nodefile_path, iterations, warmup)
   parsed_result = parse_runner_output(stdout, stderr, name, alg, n, ppn, msg_size, nodefile_path)
   return parsed_result
 
+# This function runs the mb_runner once over the message sizes min_msg_size to max_msg_size and parses all of them,
+# returns a dictionary of message size -> latency that contains msg_size
+def collect_sweep_runner(name, alg, n, ppn, msg_size, min_msg_size, max_msg_size, nodefile_path=None, iterations=None, warmup=None):
+  if uses_driver(name):
+    driver = get_driver(n, ppn, nodefile_path)
+    sizes = [min_msg_size * 2 ** i for i in range(int(np.log2(max_msg_size / min_msg_size)) + 1)]
+    return {size: driver.measure(name, alg, size, iterations, warmup) for size in sizes}
+  stdout, stderr = run_mb_runner(name, alg, n, ppn, min_msg_size, nodefile_path, iterations, warmup, max_msg_size)
+  latencies = parse_sweep_output(stdout)
+  if int(msg_size) not in latencies:
+    # Reports the output and raises a ValueError
+    parse_runner_output(stdout, stderr, name, alg, n, ppn, msg_size, nodefile_path)
+  return latencies
+
 
 # This function is a wrapper for collect_point_runner that breaks a feature set into parts,
-# looking up the alg name, and undoing the preprocessing
-def collect_point_single(name, algs, point, nodefile=None):
-  alg = algs[point[3]]
-  n = 2 ** (point[0] - 1)
-  ppn =  2 ** (point[1] - 1)
-  msg_size = 2 ** (point[2] - 1)
-
-  # Try num_retries - 1 with exception protection, then one last time if these all fail
+# looking up the alg name, and undoing the preprocessing. The OSU iteration counts can be overridden.
+def collect_point_single(name, algs, point, nodefile=None, iterations=None, warmup=None):
+  alg = algs[int(point[3])]
+  n = 2 ** (int(point[0]) - 1)
+  ppn =  2 ** (int(point[1]) - 1)
+  msg_size = 2 ** (int(point[2]) - 1)
+
+  # Try num_retries - 1 with exception protection, then one last time if these all fail.
+  # An algorithm the driver cannot select fails the same way every time, so it is raised.
   for _ in range(int(ConfigManager.get_instance().get_value('settings', 'test_fail_retries')) - 1):
     try:
-      latency = collect_point_runner(name, alg, n, ppn, msg_size, nodefile)
+      latency = collect_point_runner(name, alg, n, ppn, msg_size, nodefile, iterations, warmup)
       return latency
+    except AlgorithmSelectionError:
+      raise
     except:
         continue
 
   # TEMPORARY WORKAROUND - Just return a huge number if you cannot get it to work so training can proceed
-  return 2000000
+  return FAILED_LATENCY
 
   ## return collect_point_runner(name, alg, n, ppn, msg_size, nodefile)
 
+# This function is the counterpart of collect_point_single for message-size sweeps (see msg_sweep.py). The sweep
+# stays within the smallest and largest message size of the feature space (msg_bounds). Returns the latency of the
+# point and the rows (message size in preprocessed form, latency) of all message sizes of the sweep.
+def collect_point_sweep(name, algs, point, nodefile=None, iterations=None, warmup=None, msg_bounds=None):
+  alg = algs[int(point[3])]
+  n = 2 ** (int(point[0]) - 1)
+  ppn =  2 ** (int(point[1]) - 1)
+  msg_size = 2 ** (int(point[2]) - 1)
+  min_msg_size, max_msg_size = sweep_sizes(point[2], get_sweep_width(), msg_bounds)
+
+  for _ in range(int(ConfigManager.get_instance().get_value('settings', 'test_fail_retries')) - 1):
+    try:
+      latencies = collect_sweep_runner(name, alg, n, ppn, msg_size, 2 ** (min_msg_size - 1), 2 ** (max_msg_size - 1),
+                                       nodefile, iterations, warmup)
+    except AlgorithmSelectionError:
+      raise
+    except:
+      continue
+    # Only power-of-two message sizes are part of the feature space
+    sweep = [(np.log2(size) + 1, latency) for size, latency in latencies.items() if size > 0 and size & (size - 1) == 0]
+    return latencies[msg_size], np.asarray(sweep, dtype=float).reshape(-1, 2)
+
+  return FAILED_LATENCY, np.zeros((0, 2))
+
+# This function is a wrapper for collect_point_single that also returns the wall time of the launch in seconds
+# and the measured and warmup iterations it ran (the OSU defaults if they are not given)
+def collect_point_timed(name, algs, point, nodefile=None, iterations=None, warmup=None):
+  start_time = time.time()
+  options = {} if iterations is None else {'iterations': iterations, 'warmup': warmup}
+  if nodefile is None:
+    latency = collect_point_single(name, algs, point, **options)
+  else:
+    latency = collect_point_single(name, algs, point, nodefile, **options)
+  runtime = time.time() - start_time
+  default_iterations, default_warmup = osu_default_iterations(point[2])
+  return (latency, runtime, int(default_iterations if iterations is None else iterations),
+          int(default_warmup if warmup is None else warmup))
+
+# This function is the counterpart of collect_point_timed for message-size sweeps. It returns the outputs of
+# collect_point_timed, the run of the point as a race of one row (see race_point) and the rows (message size in
+# preprocessed form, latency, measured iterations, warmup iterations) of all message sizes of the sweep.
+def sweep_point_timed(name, algs, point, nodefile=None, iterations=None, warmup=None, msg_bounds=None):
+  start_time = time.time()
+  latency, sweep = collect_point_sweep(name, algs, point, nodefile, iterations, warmup, msg_bounds)
+  runtime = time.time() - start_time
+  # OSU applies its defaults per message size, given counts to all message sizes
+  default_iterations, default_warmup = osu_default_iterations(np.append(sweep[:,0], point[2]))
+  if iterations is not None:
+    default_iterations, default_warmup = np.full(default_iterations.size, iterations), np.full(default_warmup.size, warmup)
+  sweep = np.column_stack((sweep, default_iterations[:-1], default_warmup[:-1]))
+  return (latency, runtime, int(default_iterations[-1]), int(default_warmup[-1]),
+          np.array([[0, latency, default_iterations[-1]]], dtype=float), sweep)
+
+# This function returns the function that benchmarks a single row: sweep_point_timed within the message sizes
+# msg_bounds of the feature space if message sizes are swept, collect_point_timed otherwise
+def row_benchmark_function(msg_bounds=None):
+  if get_sweep_width() > 0:
+    return functools.partial(sweep_point_timed, msg_bounds=msg_bounds)
+  return collect_point_timed
+
+# This function benchmarks the rows of one point with benchmark_function (collect_point_timed or sweep_point_timed)
+# in one job, so all of them share the launch of a persistent driver on the nodefile (see persistent_driver.py).
+# iterations and warmup are given per row. Returns the outputs of every row.
+def drive_point(name, algs, rows, nodefile=None, iterations=None, warmup=None, benchmark_function=collect_point_timed):
+  rows = np.atleast_2d(rows)
+  iterations = [None] * rows.shape[0] if iterations is None else iterations
+  warmup = [None] * rows.shape[0] if warmup is None else warmup
+  try:
+    return [benchmark_function(name, algs, row, nodefile, iterations[i], warmup[i]) for i, row in enumerate(rows)]
+  finally:
+    if nodefile:
+      close_drivers(nodefile)
+
+# This function races the algorithms of one point (rows that only differ by algorithm) with successive halving
+# on the same nodes (see racing.py), the last round runs the given iteration counts (the OSU defaults if not given).
+# Returns the latency of the longest run of every row, the wall time of all of its launches, the iteration
+# counts of its longest run and all runs of the race as rows of (row index, latency, measured iterations).
+def race_point(name, algs, rows, nodefile=None, iterations=None, warmup=None):
+  rows = np.atleast_2d(rows)
+  initial_iterations, tolerance = get_racing_parameters()
+  default_iterations, default_warmup = (int(value) for value in osu_default_iterations(rows[0,2]))
+  final_iterations = default_iterations if iterations is None else int(iterations)
+  final_warmup = default_warmup if warmup is None else int(warmup)
+  latencies = np.zeros(rows.shape[0])
+  runtimes = np.zeros(rows.shape[0])
+  row_iterations = np.zeros(rows.shape[0], dtype=int)
+  row_warmup = np.zeros(rows.shape[0], dtype=int)
+  runs = []
+  survivors = np.arange(rows.shape[0])
+  round_count = initial_iterations if rows.shape[0] > 1 else final_iterations
+
+  while True:
+    round_count, round_warmup = round_iterations(round_count, final_iterations, final_warmup)
+    for i in survivors:
+      latencies[i], runtime, row_iterations[i], row_warmup[i] = collect_point_timed(name, algs, rows[i], nodefile, round_count, round_warmup)
+      runtimes[i] += runtime
+      runs.append((i, latencies[i], round_count))
+    if round_count >= final_iterations:
+      break
+    survivors = survivors[race_survivors(latencies[survivors], tolerance)]
+    round_count = final_iterations if survivors.size == 1 else round_count * RACING_GROWTH
+  print("Raced ", rows.shape[0], " algorithm(s) of ", rows[0,:3], ", ", survivors.size, " measured with ", round_count, " iterations")
+  if nodefile:
+    close_drivers(nodefile)
+  return latencies, runtimes, row_iterations, row_warmup, np.asarray(runs, dtype=float)
+
 
 # This function generates a unique directory path so concurrent ACCLAiM do not interfere with each other
 def create_unique_directory(root_path):
@@ -124,39 +294,234 @@ def create_unique_directory(root_path):
     
     return unique_dir_path
 
-# This function is a wrapper for collect_point_single that collects multiple points in one call
-def collect_point_batch(name, algs, points, topo=None):
+# This function returns the result cache key of a point
+def _cache_key(name, algs, point):
+  return (name, algs[int(point[3])], int(point[0]), int(point[1]), int(point[2]))
+
+# Empties the in-memory result cache
+def clear_result_cache():
+  _result_cache.clear()
+  _result_iterations.clear()
+
+# This function returns the measured and warmup iterations of the cached results of the rows of points,
+# NaN for rows whose counts are unknown (not collected or served from the measurement store)
+def result_iterations(name, algs, points):
+  counts = [_result_iterations.get(_cache_key(name, algs, row), (np.nan, np.nan)) for row in np.atleast_2d(points)]
+  counts = np.asarray(counts, dtype=float).reshape(-1, 2)
+  return counts[:,0], counts[:,1]
+
+# This function caches the latencies of the other message sizes of the sweep of a point (see sweep_point_timed),
+# returns the keys of the new results
+def _harvest_sweep(name, algs, point, sweep):
+  harvested = []
+  for msg_size, latency, iterations, warmup in sweep:
+    key = _cache_key(name, algs, (point[0], point[1], msg_size, point[3]))
+    if int(msg_size) == int(point[2]) or key in _result_cache:
+      continue
+    _result_cache[key] = latency
+    _result_iterations[key] = (int(iterations), int(warmup))
+    harvested.append(key)
+  return harvested
+
+# This function returns the rows of the points of X (num_algs rows per point, see add_algs) that were not measured
+# yet but whose algorithms are all in the result cache, e.g., from message-size sweeps, with their latencies.
+# Returns (None, None) if there are none or if message sizes are not swept.
+def harvested_points(name, algs, X, measured):
+  if get_sweep_width() == 0:
+    return None, None
+  X = X[~measured.contains(X)]
+  keys = [_cache_key(name, algs, row) for row in X]
+  complete = np.all(np.reshape([key in _result_cache for key in keys], (-1, len(algs))), axis=1)
+  rows = np.repeat(complete, len(algs))
+  if not np.any(rows):
+    return None, None
+  print("Harvested ", np.count_nonzero(complete), " point(s) from message-size sweeps")
+  return X[rows], np.array([_result_cache[key] for key, row in zip(keys, rows) if row])
+
+# This function passes the runs of benchmarks of a collective to the iteration policy, failed runs are left out
+def _observe_runs(name, X, latencies, iterations):
+  policy = get_iteration_policy()
+  if policy is None:
+    return
+  latencies = np.asarray(latencies, dtype=float).reshape(-1)
+  succeeded = latencies != FAILED_LATENCY
+  policy.observe(name, np.atleast_2d(X)[succeeded], latencies[succeeded], np.asarray(iterations, dtype=float).reshape(-1)[succeeded])
+
+# This function returns the iteration counts to launch the rows of points of a collective with, None if OSU
+# chooses its defaults
+def _launch_iterations(name, points):
+  policy = get_iteration_policy()
+  if policy is None:
+    return [None] * points.shape[0], [None] * points.shape[0]
+  iterations, warmup = policy.choose(name, points)
+  return [int(count) for count in iterations], [int(count) for count in warmup]
+
+# This function groups the rows of points by point, returns the row indices of every point
+def point_rows(points):
+  _, point_ids = np.unique(pack_points(points), return_inverse=True)
+  point_ids = point_ids.reshape(-1)
+  return [np.flatnonzero(point_ids == point_id) for point_id in range(np.max(point_ids) + 1)]
+
+# This function inserts the nodefile of a benchmark into its input tuple (name, algs, point, iterations, warmup)
+def with_nodefile(benchmark_input, nodefile_path=None):
+  return benchmark_input[:3] + (nodefile_path if nodefile_path else None,) + benchmark_input[3:]
+
+# This function returns which rows of points have a result in the result cache
+def cached_rows(name, algs, points):
+  return np.array([_cache_key(name, algs, row) in _result_cache for row in np.atleast_2d(points)], dtype=bool)
+
+# This function converts a result cache key to a measurement store key (with the features in their original units)
+def _store_key(key):
+  name, alg, n, ppn, msg_size = key
+  return (name, alg, 2 ** (n - 1), 2 ** (ppn - 1), 2 ** (msg_size - 1))
+
+# This function looks up the rows of points (with their cache keys) in the measurement store, returns the latencies
+# of the keys found. Measurements with fewer measured iterations than the rows would be launched with are not served.
+def _lookup_store(store, name, keys, points):
+  points = np.atleast_2d(points)
+  iterations, _ = _launch_iterations(name, points)
+  default_iterations, _ = osu_default_iterations(points[:,2])
+  required = {_store_key(key): int(default if count is None else count)
+              for key, count, default in zip(keys, iterations, default_iterations)}
+  stored = store.lookup_many(list(required.keys()), required)
+  return {key: stored[_store_key(key)] for key in keys if _store_key(key) in stored}
+
+# This function is a wrapper for collect_point_single that collects multiple points in one call.
+# Points that were already collected (or that appear more than once) are only benchmarked once, and
+# the persistent measurement store is consulted before launching any microbenchmark. The store is opened
+# for the call unless an open store is given. Message-size sweeps stay within msg_bounds (see msg_sweep.py).
+# With return_runtimes, the wall time of each launch is also returned (NaN for rows that were not launched).
+# Rows marked in pruned (algorithms pruned at their point, see pruning.py) are skipped and get a NaN latency.
+def collect_point_batch(name, algs, points, topo=None, return_runtimes=False, pruned=None, store=None, msg_bounds=None):
   print("Attempting to collect: ", points)
-  num_results = points.shape[0]
+  points = np.asarray(points)
+  keys = [_cache_key(name, algs, row) for row in points]
+  skipped = np.zeros(len(keys), dtype=bool) if pruned is None else np.asarray(pruned, dtype=bool)
+  if np.any(skipped):
+    print("Skipping ", np.count_nonzero(skipped), " pruned algorithm(s)")
+  own_store = store is None
+  if own_store:
+    store = get_measurement_store(topo)
+
+  # Fill the result cache from the measurement store, also for the pruned rows so they only count as saved
+  # launches if they are not stored (see cached_rows)
+  if store is not None:
+    missing = [i for i, key in enumerate(keys) if key not in _result_cache]
+    stored = _lookup_store(store, name, [keys[i] for i in missing], points[missing]) if len(missing) > 0 else {}
+    _result_cache.update(stored)
+    if len(stored) > 0:
+      print("Found ", len(stored), " result(s) in the measurement store")
+
+  pending = []
+  pending_keys = set()
+  for i, key in enumerate(keys):
+    if not skipped[i] and key not in _result_cache and key not in pending_keys:
+      pending.append(i)
+      pending_keys.add(key)
+  if len(pending) < len(keys) - np.count_nonzero(skipped):
+    print("Serving ", len(keys) - np.count_nonzero(skipped) - len(pending), " result(s) from the result cache")
+
+  new_results = {}
+  reusable = set()
+  runtimes = np.full(len(keys), np.nan)
+  if len(pending) > 0:
+    outputs, pending_runtimes, pending_iterations, pending_warmup, finished, harvested = _collect_point_batch_uncached(name, algs, points[pending], topo, msg_bounds)
+    new_results.update({key: _result_cache[key] for key in harvested})
+    reusable.update(harvested)
+    runtimes[pending] = pending_runtimes
+    for i, output, iterations, warmup, last_round in zip(pending, outputs, pending_iterations, pending_warmup, finished):
+      new_results[keys[i]] = output
+      # Failures are not cached so the point is retried if it is requested again
+      if output != FAILED_LATENCY:
+        _result_iterations[keys[i]] = (int(iterations), int(warmup))
+        # Algorithms dropped early by a race were measured with fewer iterations, their latencies are not reused
+        if last_round:
+          _result_cache[keys[i]] = output
+          reusable.add(keys[i])
+
+  if store is not None:
+    store.insert_many({_store_key(key): new_results[key] for key in reusable},
+                      {_store_key(key): _result_iterations[key] for key in reusable})
+    if own_store:
+      store.close()
+
+  results = [np.nan if skip else new_results[key] if key in new_results else _result_cache[key]
+             for key, skip in zip(keys, skipped)]
+  if return_runtimes:
+    return np.asarray(results), runtimes
+  return np.asarray(results)
+
+# This function launches the microbenchmarks for a batch of points, in parallel if a topology is provided.
+# Returns the latencies, the wall time of each launch, the measured and warmup iterations of each result, which
+# results were measured in the last round of their race (all without racing) and the cache keys of the other
+# message sizes measured by sweeps. With racing, the algorithms of each point are raced
+# (without sweeping the message sizes). With a persistent driver and a topology, each point is one job.
+def _collect_point_batch_uncached(name, algs, points, topo=None, msg_bounds=None):
+  iterations, warmup = _launch_iterations(name, points)
+  if get_racing() == 'successive_halving':
+    rows_of_points = point_rows(points)
+    outputs = _run_benchmarks(race_point, [(name, algs, points[rows], iterations[rows[0]], warmup[rows[0]])
+                                           for rows in rows_of_points], topo)
+    results = np.zeros((points.shape[0], 4))
+    finished = np.zeros(points.shape[0], dtype=bool)
+    for rows, (point_latencies, point_runtimes, point_iterations, point_warmup, runs) in zip(rows_of_points, outputs):
+      results[rows] = np.column_stack((point_latencies, point_runtimes, point_iterations, point_warmup))
+      finished[rows] = last_round_rows(point_iterations)
+      _observe_runs(name, points[rows][runs[:,0].astype(int)], runs[:,1], runs[:,2])
+    return results[:,0], results[:,1], results[:,2], results[:,3], finished, []
+
+  sweep = get_sweep_width() > 0
+  benchmark_function = row_benchmark_function(msg_bounds)
+  if uses_driver(name) and topo is not None:
+    rows_of_points = point_rows(points)
+    outputs = _run_benchmarks(drive_point, [(name, algs, points[rows], [iterations[i] for i in rows], [warmup[i] for i in rows],
+                                             benchmark_function) for rows in rows_of_points], topo)
+    results = [None] * points.shape[0]
+    for rows, point_outputs in zip(rows_of_points, outputs):
+      for i, output in zip(rows, point_outputs):
+        results[i] = output
+  else:
+    results = _run_benchmarks(benchmark_function, [(name, algs, row, iterations[i], warmup[i]) for i, row in enumerate(points)], topo)
+  if(len(results) != points.shape[0]):
+    print("Error, did not collect the right amount of data!")
+  harvested = []
+  if sweep:
+    for row, output in zip(points, results):
+      harvested += _harvest_sweep(name, algs, row, output[5])
+    results = [output[:4] for output in results]
+  results = np.asarray(results, dtype=float).reshape(-1, 4)
+  _observe_runs(name, points, results[:,0], results[:,2])
+  return results[:,0], results[:,1], results[:,2], results[:,3], np.ones(points.shape[0], dtype=bool), harvested
+
+# This function runs benchmark_function for every input tuple (name, algs, point or rows of a point, iterations,
+# warmup), in parallel if a topology is provided, and returns the outputs in order
+def _run_benchmarks(benchmark_function, inputs, topo=None):
+  num_results = len(inputs)
   i = 0
   results = []
   if topo is None:
-    for row in points:
-      results.append(collect_point_single(name, algs, row))
+    for benchmark_input in inputs:
+      results.append(benchmark_function(*with_nodefile(benchmark_input)))
 
   else:
     parallel_batch_inputs = []
     root_path = ConfigManager.get_instance().get_value('settings', 'acclaim_root')
     nodefile_dir_path = create_unique_directory(root_path)
     while i < num_results:
-      row = points[i,:]
-      n = 2 ** (row[0] - 1)
+      n = 2 ** (int(np.atleast_2d(inputs[i][2])[0,0]) - 1)
       print("Attempting to fit ", int(n))
       nodes = topo.fit_point(n)
       if(nodes):
         path = os.path.join(nodefile_dir_path, f"nodefile{i}")
         nodefile_path = topo.create_nodefile(nodes, path)
-        if nodefile_path:
-          parallel_batch_inputs.append((name, algs, row, nodefile_path))
-        else:
-          parallel_batch_inputs.append((name, algs, row))
+        parallel_batch_inputs.append(with_nodefile(inputs[i], nodefile_path))
         i += 1
         print("Fit passed: ", parallel_batch_inputs[-1])
       else:
         print("Fit failed, collecting ", len(parallel_batch_inputs), " points in parallel")
         print("Collecting points: ", parallel_batch_inputs)
         p = multiprocessing.Pool(processes=len(parallel_batch_inputs))
-        outputs = p.starmap(collect_point_single, parallel_batch_inputs)
+        outputs = p.starmap(benchmark_function, parallel_batch_inputs)
         p.close()
         p.join()
         for output in outputs:
@@ -168,7 +533,7 @@ def collect_point_batch(name, algs, points, topo=None):
       print("Collecting leftover points")
       print("Collecting ", len(parallel_batch_inputs), " points in parallel")
       with multiprocessing.Pool(processes=len(parallel_batch_inputs)) as pool:
-        outputs = pool.starmap(collect_point_single, parallel_batch_inputs)
+        outputs = pool.starmap(benchmark_function, parallel_batch_inputs)
       for output in outputs:
         results.append(output)
     topo.reset_fit()
@@ -176,6 +541,4 @@ def collect_point_batch(name, algs, points, topo=None):
     if os.path.isdir(nodefile_dir_path):
         shutil.rmtree(nodefile_dir_path)
 
-  if(len(results) != num_results):
-    print("Error, did not collect the right amount of data!")
-  return np.asarray(results)        
+  return results        
@@ -1,37 +1,119 @@
 # This file includes functions to initialize FACT
+#
+# initial_design = grid: evenly spaced indices over the feature space, skewed towards smaller message sizes (the default)
+# initial_design = lhs: a Latin hypercube over the log-scaled (n, ppn, msg_size) cube, every design point is
+#   snapped to the nearest point of the feature space. Of LHS_CANDIDATES random hypercubes, the one whose
+#   selected points are farthest apart is kept
+# initial_design = maximin: each point is the point farthest from the points selected so far, starting from the
+#   cheapest point
+#
+# With initial_budget > 0, the lhs and maximin designs only select points whose predicted cost (the prior cost
+# estimate of cost_model.py, in seconds for all algorithms) fits in the remaining budget.
 
 import numpy as np
 from src.user_config.config_manager import ConfigManager
+from src.active_learner.utils import FEATURE_DTYPE
+from src.active_learner.cost_model import prior_point_costs
 
+# Number of random Latin hypercubes the lhs design picks from
+LHS_CANDIDATES = 20
 
-# This function creates the input matrix (X) based on the maximum feature values
-def create_feature_space(n, ppn, msg_size, collective):  
-  shape_x = n*ppn*msg_size - msg_size #remove one message size to avoid n = 1, ppn = 1 cases
-  if "reduce" in collective: #If the collective is a reduction, we must avoid message sizes of 1 and 2, so we reduce the size of the space
-    shape_x -= n*ppn*2
-    shape_x += 2 #add two back in because we removed n = 1, ppn = 1, msg_size = 1/2 twice
-  to_return = np.zeros(shape=(shape_x,3))
-
-  i = 0
-  for cur_n in range(n):  
-    for cur_ppn in range(ppn):
-      if(cur_n == 0 and cur_ppn == 0):
-        continue
-      for cur_msg_size in range(msg_size):
-        if "reduce" in collective and cur_msg_size < 2:
-          continue
-        to_return[i] = [cur_n + 1, cur_ppn + 1, cur_msg_size + 1]
-        i+=1
-  
-  return to_return
 
+# This function creates the input matrix (X) based on the maximum feature values.
+# Rows are ordered by n, then ppn, then message size (the message size changes fastest).
+def create_feature_space(n, ppn, msg_size, collective):
+  #If the collective is a reduction, we must avoid message sizes of 1 and 2
+  min_msg_size = 2 if "reduce" in collective else 0
+  n_values, ppn_values, msg_size_values = np.meshgrid(np.arange(1, n + 1), np.arange(1, ppn + 1),
+                                                      np.arange(min_msg_size + 1, msg_size + 1), indexing='ij')
+  feature_space = np.column_stack((n_values.ravel(), ppn_values.ravel(), msg_size_values.ravel())).astype(FEATURE_DTYPE)
+
+  #remove the n = 1, ppn = 1 cases
+  return feature_space[(feature_space[:,0] > 1) | (feature_space[:,1] > 1)]
+
+
+# This function returns the initial design ("grid", "lhs" or "maximin")
+def get_initial_design():
+  return ConfigManager.get_instance().get_value('settings', 'initial_design', 'grid')
+
+# This function scales every feature to [0, 1], the features are already log2 scaled
+def unit_cube(X):
+  X = np.asarray(X, dtype=float)
+  low, high = np.min(X, axis=0), np.max(X, axis=0)
+  return (X - low) / np.where(high > low, high - low, 1)
+
+# This function snaps a random Latin hypercube design to the nearest affordable points of the unit cube.
+# The design points whose nearest point is cheapest are placed first, so an exhausted budget moves
+# the expensive design points to cheaper neighbors instead of dropping the cheap ones.
+def snap_latin_hypercube(cube, num_initial_points, costs, budget):
+  strata = np.column_stack([np.random.permutation(num_initial_points) for _ in range(cube.shape[1])])
+  design = (strata + np.random.random(strata.shape)) / num_initial_points
+  distances = np.linalg.norm(cube[np.newaxis,:,:] - design[:,np.newaxis,:], axis=2)
+  design_order = np.argsort(costs[np.argmin(distances, axis=1)], kind='stable')
+
+  selected = []
+  remaining = budget
+  for design_index in design_order:
+    affordable = costs <= remaining
+    affordable[selected] = False
+    if not np.any(affordable):
+      break
+    candidates = np.flatnonzero(affordable)
+    index = candidates[np.argmin(distances[design_index, candidates])]
+    selected.append(index)
+    remaining -= costs[index]
+  return selected
+
+# This function returns the smallest distance between two selected points
+def min_distance(cube, selected):
+  if len(selected) < 2:
+    return 0.0
+  distances = np.linalg.norm(cube[selected][np.newaxis,:,:] - cube[selected][:,np.newaxis,:], axis=2)
+  return np.min(distances[np.triu_indices(len(selected), k=1)])
+
+# This function selects points with the Latin hypercube that selects the most points, the farthest apart
+def lhs_points(X, num_initial_points, costs, budget):
+  cube = unit_cube(X)
+  candidates = [snap_latin_hypercube(cube, num_initial_points, costs, budget) for _ in range(LHS_CANDIDATES)]
+  return max(candidates, key=lambda selected: (len(selected), min_distance(cube, selected)))
+
+# This function selects points greedily, each point is the affordable point farthest from the selected points
+def maximin_points(X, num_initial_points, costs, budget):
+  cube = unit_cube(X)
+  distances = np.full(X.shape[0], np.inf)
+  selected = []
+  remaining = budget
+  for _ in range(num_initial_points):
+    affordable = costs <= remaining
+    affordable[selected] = False
+    if not np.any(affordable):
+      break
+    candidates = np.flatnonzero(affordable)
+    if len(selected) == 0:
+      index = candidates[np.argmin(costs[candidates])]
+    else:
+      index = candidates[np.argmax(distances[candidates])]
+    selected.append(index)
+    remaining -= costs[index]
+    distances = np.minimum(distances, np.linalg.norm(cube - cube[index], axis=1))
+  return selected
 
 # This function selects initial training points to begin the active learning process
-def get_initial_points(X):
+def get_initial_points(X, num_algs=1):
+  config = ConfigManager.get_instance()
   num_points = X.shape[0]
-  num_initial_points = int(ConfigManager.get_instance().get_value('settings', 'num_initial_points'))
+  num_initial_points = int(config.get_value('settings', 'num_initial_points'))
   if(num_points < num_initial_points):
     return X
+
+  initial_design = get_initial_design()
+  if initial_design in ['lhs', 'maximin']:
+    budget = float(config.get_value('settings', 'initial_budget', '0'))
+    costs = prior_point_costs(X, num_algs)
+    design_points = lhs_points if initial_design == 'lhs' else maximin_points
+    selected = design_points(X, num_initial_points, costs, budget if budget > 0 else np.inf)
+    print("Selected ", len(selected), " initial points with a predicted cost of ", np.sum(costs[selected]), " seconds")
+    return X[selected,:]
   
   # Select the points. We use +2 in the linspace and then remove the largest 2 indices later to
   # skew the select points towards smaller message sizes, which are quicker to collect.
@@ -0,0 +1,163 @@
+# This file records where the time of the tuning loop goes
+#
+# Every active learning iteration is split into phases (point selection, benchmark collection, model fit,
+# variance computation and convergence check). With the timing_file setting, one JSON line per iteration is
+# appended to that file. The wall time of every benchmark launch is split into the time OSU spends in the
+# measured (and warmup) iterations, estimated from the reported latency, and the launch overhead (job launch,
+# MPI initialization, teardown). Rows harvested from message-size sweeps (see msg_sweep.py) were measured within
+# other launches, the launch overhead they saved is estimated from the average overhead of a launch. The phase
+# totals are printed at the end of training.
+#
+# ACCLAIM_PROFILE=cprofile,tracemalloc (either or both) enables profiling hooks:
+#   cprofile: the tuning loop is profiled and the statistics are written to <prefix>.prof
+#   tracemalloc: the current and peak Python memory are added to every JSON line and the top allocation
+#     sites are printed at the end of training
+# where <prefix> is the timing file (or acclaim_root) followed by the collective and the problem size.
+
+import os
+import json
+import time
+import cProfile
+import threading
+import contextlib
+import tracemalloc
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+
+# OSU defaults for the number of measured and warmup iterations, which drop above a message size threshold
+OSU_ITERATIONS = 1000
+OSU_ITERATIONS_LARGE = 100
+OSU_WARMUP = 200
+OSU_WARMUP_LARGE = 10
+OSU_LARGE_MESSAGE_SIZE = 8192
+
+# Number of allocation sites printed with ACCLAIM_PROFILE=tracemalloc
+TRACEMALLOC_TOP_SITES = 10
+
+# Serializes writes of the learners of several collectives to the same timing file
+_timing_file_lock = threading.Lock()
+
+# This function returns the file the per-iteration timings are appended to, or None if they are not recorded
+def get_timing_file():
+  timing_file = ConfigManager.get_instance().get_value('settings', 'timing_file', '')
+  return timing_file if timing_file else None
+
+# This function returns the profiling hooks requested by the user (ACCLAIM_PROFILE=cprofile,tracemalloc)
+def profiling_requested():
+  return set(hook.strip() for hook in os.environ.get('ACCLAIM_PROFILE', '').split(',') if hook.strip())
+
+# This function returns the OSU default numbers of measured and warmup iterations for message sizes in
+# preprocessed form (log2 + 1)
+def osu_default_iterations(msg_sizes):
+  large = 2 ** (np.asarray(msg_sizes, dtype=float) - 1) > OSU_LARGE_MESSAGE_SIZE
+  return np.where(large, OSU_ITERATIONS_LARGE, OSU_ITERATIONS), np.where(large, OSU_WARMUP_LARGE, OSU_WARMUP)
+
+# This function estimates the seconds OSU spends in the measured and warmup iterations of a benchmark
+# from its latency (microseconds) and message size in preprocessed form (log2 + 1). Iteration counts that
+# are not given or NaN are the OSU defaults.
+def measured_seconds(latencies, msg_sizes, iterations=None, warmup=None):
+  default_iterations, default_warmup = osu_default_iterations(msg_sizes)
+  if iterations is not None:
+    default_iterations = np.where(np.isfinite(iterations), iterations, default_iterations)
+  if warmup is not None:
+    default_warmup = np.where(np.isfinite(warmup), warmup, default_warmup)
+  return np.asarray(latencies, dtype=float) * (default_iterations + default_warmup) * 1e-6
+
+class Instrumentation:
+  def __init__(self, collective, n, ppn, msg_size):
+    self.record = {'collective': collective, 'n': n, 'ppn': ppn, 'msg_size': msg_size}
+    self.timing_file = get_timing_file()
+    self.phases = {}
+    self.totals = {}
+    self.benchmarks = {'launches': 0, 'launch_seconds': 0.0, 'measured_seconds': 0.0, 'harvested': 0}
+    self.harvested = {'rows': 0, 'saved_seconds': 0.0}
+    prefix = self.timing_file if self.timing_file else os.path.join(
+      ConfigManager.get_instance().get_value('settings', 'acclaim_root', '.'), 'acclaim')
+    self.prefix = f"{prefix}.{collective}_{n}_{ppn}_{msg_size}"
+
+    hooks = profiling_requested()
+    self.profiler = cProfile.Profile() if 'cprofile' in hooks else None
+    self.tracemalloc = 'tracemalloc' in hooks
+    if self.profiler is not None:
+      try:
+        self.profiler.enable()
+      except ValueError:
+        # Another profiler is active, e.g., the one of a collective tuned concurrently on Python 3.12+
+        print("Warning: cProfile is already active, not profiling ", collective)
+        self.profiler = None
+    self.started_tracemalloc = self.tracemalloc and not tracemalloc.is_tracing()
+    if self.started_tracemalloc:
+      tracemalloc.start()
+
+  # Times a phase of the current iteration, a phase may be entered several times per iteration
+  @contextlib.contextmanager
+  def phase(self, name):
+    start_time = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start_time
+
+  # Adds the benchmark launches of the current iteration, rows without a runtime were not launched.
+  # iterations and warmup are the counts of every row (see result_iterations in data_collect.py).
+  def add_benchmarks(self, X, latencies, runtimes, iterations=None, warmup=None):
+    runtimes = np.asarray(runtimes, dtype=float).reshape(-1)
+    launched = np.isfinite(runtimes)
+    if not np.any(launched):
+      return
+    X = np.atleast_2d(X)
+    iterations = None if iterations is None else np.asarray(iterations, dtype=float).reshape(-1)[launched]
+    warmup = None if warmup is None else np.asarray(warmup, dtype=float).reshape(-1)[launched]
+    self.benchmarks['launches'] += int(np.count_nonzero(launched))
+    self.benchmarks['launch_seconds'] += float(np.sum(runtimes[launched]))
+    self.benchmarks['measured_seconds'] += float(np.sum(measured_seconds(np.asarray(latencies)[launched], X[launched,2],
+                                                                         iterations, warmup)))
+
+  # Adds the rows harvested from message-size sweeps in the current iteration, their iterations ran within the
+  # launches of the iteration
+  def add_harvested(self, X, latencies, iterations=None, warmup=None):
+    X = np.atleast_2d(X)
+    self.benchmarks['harvested'] += X.shape[0]
+    self.benchmarks['measured_seconds'] += float(np.sum(measured_seconds(latencies, X[:,2], iterations, warmup)))
+
+  # Writes the record of an iteration and starts the next one
+  def end_iteration(self, iteration, training_rows):
+    benchmarks = dict(self.benchmarks)
+    benchmarks['overhead_seconds'] = max(0.0, benchmarks['launch_seconds'] - benchmarks['measured_seconds'])
+    if benchmarks['launches'] > 0:
+      benchmarks['saved_overhead_seconds'] = benchmarks['harvested'] * benchmarks['overhead_seconds'] / benchmarks['launches']
+      self.harvested['saved_seconds'] += benchmarks['saved_overhead_seconds']
+    self.harvested['rows'] += benchmarks['harvested']
+    for name, seconds in self.phases.items():
+      self.totals[name] = self.totals.get(name, 0.0) + seconds
+    for name in ['launch_seconds', 'measured_seconds', 'overhead_seconds']:
+      self.totals['benchmark_' + name] = self.totals.get('benchmark_' + name, 0.0) + benchmarks[name]
+
+    if self.timing_file is not None:
+      record = dict(self.record, iteration=iteration, time=time.time(), training_rows=int(training_rows),
+                    phases=self.phases, benchmarks=benchmarks)
+      if self.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        record['memory'] = {'current_bytes': current, 'peak_bytes': peak}
+      with _timing_file_lock, open(self.timing_file, 'a') as timing_file:
+        timing_file.write(json.dumps(record) + "\n")
+
+    self.phases = {}
+    self.benchmarks = {'launches': 0, 'launch_seconds': 0.0, 'measured_seconds': 0.0, 'harvested': 0}
+
+  # Prints the phase totals and writes the profiles
+  def close(self):
+    print("Time per phase (seconds): ", {name: round(seconds, 3) for name, seconds in self.totals.items()})
+    if self.harvested['rows'] > 0:
+      print("Message-size sweeps harvested ", self.harvested['rows'], " rows, saving about ",
+            round(self.harvested['saved_seconds'], 3), " seconds of launch overhead")
+    if self.profiler is not None:
+      self.profiler.disable()
+      self.profiler.dump_stats(self.prefix + ".prof")
+      print("Wrote the profile to ", self.prefix + ".prof")
+    if self.tracemalloc:
+      print("Top allocation sites:")
+      for statistic in tracemalloc.take_snapshot().statistics('lineno')[:TRACEMALLOC_TOP_SITES]:
+        print("  ", statistic)
+    if self.started_tracemalloc:
+      tracemalloc.stop()
@@ -0,0 +1,104 @@
+# This file chooses the OSU iteration and warmup counts of every benchmark
+#
+# osu_iterations = default: OSU uses its default counts (1000 measured + 200 warmup iterations, 100 + 10 above
+#   8 KiB), as without this policy
+# osu_iterations = adaptive: the measured iterations of a benchmark are the fewest that reach a relative error of
+#   target_relative_error for its average latency, but the measured and warmup iterations may take at most
+#   benchmark_time_budget seconds:
+#     iterations = min((cv / target_relative_error)^2, benchmark_time_budget / (latency * (1 + warmup fraction)))
+#   clipped to [MIN_ITERATIONS, MAX_ITERATIONS], with the warmup in the ratio of the OSU defaults.
+#
+# The latency of a point (collective, n, ppn, message size) is the largest latency of its algorithms measured so
+# far. A point without a measurement falls back to the largest latency of its collective at its message size, and
+# to the OSU defaults if there is none either. cv is the relative standard deviation of a single iteration. It is
+# pooled per collective and message size from the spread of benchmarks that were measured more than once with known
+# counts: the log-latencies of two runs with i1 and i2 iterations differ with a variance of cv^2 (1/i1 + 1/i2).
+# Only the rounds of a race (see racing.py) measure a benchmark more than once, so without racing the spread is
+# never measured and CV_PRIOR is used throughout.
+#
+# The counts every result was measured with are recorded with the result (see data_collect.py).
+
+import threading
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.instrumentation import osu_default_iterations
+
+# Relative standard deviation of a single iteration before any spread was measured, the OSU defaults then
+# reach a relative error of about 1% for small messages
+CV_PRIOR = 0.3
+
+# Bounds of the measured iterations of a benchmark
+MIN_ITERATIONS = 10
+MAX_ITERATIONS = 10000
+
+class IterationPolicy:
+  def __init__(self, time_budget=0.5, target_error=0.02, cv_prior=CV_PRIOR):
+    self.time_budget = time_budget
+    self.target_error = target_error
+    self.cv_prior = cv_prior
+    self.lock = threading.Lock()
+    self.latencies = {}
+    self.msg_latencies = {}
+    self.spread = {}
+    self.last_runs = {}
+
+  # Records runs of benchmarks of a collective (rows of preprocessed features with the algorithm) with their
+  # latency in microseconds and measured iterations, failed runs must be left out
+  def observe(self, collective, X, latencies, iterations):
+    X = np.atleast_2d(X)
+    with self.lock:
+      for row, latency, count in zip(X, np.reshape(latencies, -1), np.reshape(iterations, -1)):
+        if not (np.isfinite(latency) and latency > 0 and np.isfinite(count) and count > 0):
+          continue
+        n, ppn, msg_size, alg = (int(value) for value in row[:4])
+        point = (collective, n, ppn, msg_size)
+        self.latencies[point] = max(self.latencies.get(point, 0.0), float(latency))
+        self.msg_latencies[(collective, msg_size)] = max(self.msg_latencies.get((collective, msg_size), 0.0), float(latency))
+        run = point + (alg,)
+        if run in self.last_runs:
+          previous_latency, previous_count = self.last_runs[run]
+          total, num_samples = self.spread.get((collective, msg_size), (0.0, 0))
+          sample = np.log(latency / previous_latency) ** 2 / (1 / previous_count + 1 / count)
+          self.spread[(collective, msg_size)] = (total + sample, num_samples + 1)
+        self.last_runs[run] = (float(latency), float(count))
+
+  # Returns the relative standard deviation of a single iteration of a collective at a message size
+  def cv(self, collective, msg_size):
+    total, num_samples = self.spread.get((collective, int(msg_size)), (0.0, 0))
+    return np.sqrt(total / num_samples) if num_samples > 0 else self.cv_prior
+
+  # Returns the measured and warmup iterations of every row of a collective
+  def choose(self, collective, X):
+    X = np.atleast_2d(X)
+    default_iterations, default_warmup = osu_default_iterations(X[:,2])
+    iterations, warmup = default_iterations.astype(int), default_warmup.astype(int)
+    with self.lock:
+      for i, (n, ppn, msg_size) in enumerate(X[:,:3].astype(int)):
+        latency = self.latencies.get((collective, n, ppn, msg_size), self.msg_latencies.get((collective, msg_size)))
+        if latency is None:
+          continue
+        warmup_fraction = default_warmup[i] / default_iterations[i]
+        error_iterations = (self.cv(collective, msg_size) / self.target_error) ** 2
+        budget_iterations = self.time_budget / (latency * 1e-6 * (1 + warmup_fraction))
+        iterations[i] = int(np.clip(np.ceil(min(error_iterations, budget_iterations)), MIN_ITERATIONS, MAX_ITERATIONS))
+        warmup[i] = max(1, int(np.ceil(iterations[i] * warmup_fraction)))
+    return iterations, warmup
+
+# Policy shared by all benchmarks of this process
+_iteration_policy = None
+
+# This function returns the iteration policy, or None if OSU chooses its default counts
+def get_iteration_policy():
+  global _iteration_policy
+  config = ConfigManager.get_instance()
+  if config.get_value('settings', 'osu_iterations', 'default') != 'adaptive':
+    return None
+  if _iteration_policy is None:
+    _iteration_policy = IterationPolicy(float(config.get_value('settings', 'benchmark_time_budget', '0.5')),
+                                        float(config.get_value('settings', 'target_relative_error', '0.02')))
+  return _iteration_policy
+
+# This function forgets the measurements of the iteration policy
+def reset_iteration_policy():
+  global _iteration_policy
+  _iteration_policy = None
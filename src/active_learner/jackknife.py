@@ -6,6 +6,21 @@
 #   Arguments:
 #   $1 = pre-trained random forest regressor
 #   $2 = test set X values
+#
+# Surrogates that are not forests (see surrogates.py) provide their own uncertainty, which is used instead.
+#
+# variance_estimator = jackknife: the trees are treated as jackknife replicates of the forest (the default)
+# variance_estimator = infinitesimal_jackknife: the infinitesimal jackknife of Wager, Hastie & Efron (2014),
+#   which uses the bootstrap in-bag counts of every tree (recorded by model_training.py) and needs far fewer
+#   trees for a stable estimate. Its values are on a different scale than the jackknife variances, so the
+#   convergence_threshold may need to be adjusted.
+#
+# variance_estimate = full: the convergence statistic is the average jackknife variance over the whole
+#   algorithm-expanded feature space (the default)
+# variance_estimate = subsample: the convergence statistic is estimated from a fixed stratified sample of
+#   variance_sample_size rows, with strata formed by splitting n, ppn and msg_size into variance_strata
+#   regions each. The estimate comes with a variance_confidence bound. The full-space variances are only
+#   computed when point selection needs them, and the full-space statistic is then compared to the estimate.
 
 import csv
 
@@ -15,38 +30,224 @@ from sklearn.ensemble import RandomForestRegressor
 
 import numpy as np
 import sys
+from statistics import NormalDist
+from concurrent.futures import ThreadPoolExecutor
+
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.model_training import get_model_workers, get_variance_estimator
+from src.active_learner.surrogates import is_forest
+
+# Number of test rows evaluated per pass, bounds the size of the (trees x rows) prediction matrix
+JACKKNIFE_CHUNK_SIZE = 16384
 
-def jackknife_variances(regressor, X_test):
+# Seed of the stratified sample, a resumed run draws the same sample so its convergence values stay comparable
+VARIANCE_SAMPLE_SEED = 0
+
+# This function returns the per-tree predictions (trees x rows) for a set of test points
+def tree_predictions(regressor, X_test):
+  # Convert once up front instead of letting every tree validate and copy X_test
+  X_test = np.ascontiguousarray(X_test, dtype=np.float32)
   trees = regressor.estimators_
   prediction_array = np.empty((len(trees), X_test.shape[0]))
-  
-  i = 0
-  for tree in trees:
-    predictions = tree.predict(X_test)
-    prediction_array[i,:] = predictions
-    i += 1
-
-  means = np.mean(prediction_array, axis=0)
-  variances = np.empty(means.shape)
-  
-  i = 0
-  for column in prediction_array.T:
-    mean = means[i]
-    n = column.shape[0]
-
-    resamples = np.empty((n,n-1))
-    for j in range(n):
-      resamples[j,:] = np.delete(column, j)
-    
-    resample_means = np.mean(resamples, axis=1)
-    variances[i] = np.sum(np.square(np.subtract(resample_means, mean)))/(n*(n-1))
-    i += 1
-  
+
+  for i, tree in enumerate(trees):
+    prediction_array[i,:] = tree.predict(X_test, check_input=False)
+
+  return prediction_array
+
+# This function computes the jackknife variance of every column of a prediction matrix in one pass.
+# Leaving tree j out gives the mean (n*mean - x_j)/(n-1), which differs from the full mean by
+# (mean - x_j)/(n-1), so the resample means never need to be materialized.
+def jackknife_variances_from_predictions(prediction_array):
+  n = prediction_array.shape[0]
+  deviations = prediction_array - np.mean(prediction_array, axis=0)
+  resample_sq_sum = np.sum(np.square(deviations), axis=0)/((n-1)**2)
+  return resample_sq_sum/(n*(n-1))
+
+# This class holds the Gram matrix (trees x trees) of the centered in-bag counts of a forest, it is computed once
+# per model and shared by all blocks of test rows. Trees kept by incremental training were fit to other rows than
+# the newest trees, the counts are aligned by the row identities recorded with them (rows a tree was not fit to
+# are out of bag for it).
+class InbagCovariance:
+  def __init__(self, regressor):
+    trees = regressor.estimators_
+    fits = list({id(tree.inbag_rows_): tree.inbag_rows_ for tree in trees}.values())
+    row_ids, columns = np.unique(np.vstack(fits), axis=0, return_inverse=True)
+    columns = columns.reshape(-1)
+    offsets = np.cumsum([0] + [fit.shape[0] for fit in fits])
+    fit_columns = {id(fit): columns[offsets[j]:offsets[j+1]] for j, fit in enumerate(fits)}
+    self.num_rows = row_ids.shape[0]
+    counts = np.zeros((len(trees), self.num_rows))
+    for i, tree in enumerate(trees):
+      counts[i, fit_columns[id(tree.inbag_rows_)]] = tree.inbag_counts_
+    centered = counts - np.mean(counts, axis=0)
+    self.gram = centered @ centered.T
+    self.count_variance = np.mean(np.square(centered))
+
+# This function returns the in-bag covariance for the infinitesimal jackknife, or None if the jackknife is used
+# (also for forests that were fit without recording their in-bag counts)
+def get_inbag_covariance(regressor):
+  if get_variance_estimator() != 'infinitesimal_jackknife' or not regressor.bootstrap:
+    return None
+  if not all(hasattr(tree, 'inbag_counts_') and hasattr(tree, 'inbag_rows_') for tree in regressor.estimators_):
+    return None
+  return InbagCovariance(regressor)
+
+# This function computes the bias-corrected infinitesimal jackknife variance of every column of a prediction matrix,
+# V(x) = sum_i Cov_b(N_bi, t_b(x))^2 - n Var(N) sum_b (t_b(x) - mean)^2 / B^2 for the in-bag counts N_bi.
+# The sum over the training rows equals d^T G d / B^2 for the centered tree predictions d and the Gram matrix G
+# of the centered in-bag counts, so its cost does not grow with the training set.
+def infinitesimal_jackknife_variances_from_predictions(prediction_array, inbag):
+  n = prediction_array.shape[0]
+  deviations = prediction_array - np.mean(prediction_array, axis=0)
+  variances = np.sum(deviations * (inbag.gram @ deviations), axis=0)/(n**2)
+  bias = inbag.num_rows * inbag.count_variance * np.sum(np.square(deviations), axis=0)/(n**2)
+  return np.maximum(variances - bias, 0)
+
+# This function computes the variance and the forest prediction (the mean over the trees) for a contiguous block
+# of test rows, with the infinitesimal jackknife if the in-bag covariance is given
+def _jackknife_variances_chunk(regressor, X_chunk, inbag=None):
+  prediction_array = tree_predictions(regressor, X_chunk)
+  if inbag is not None:
+    variances = infinitesimal_jackknife_variances_from_predictions(prediction_array, inbag)
+  else:
+    variances = jackknife_variances_from_predictions(prediction_array)
+  return variances, np.mean(prediction_array, axis=0)
+
+# The test rows are processed in chunks. With more than one worker the chunks are spread across a thread pool,
+# tree prediction and the NumPy reductions release the GIL, so the chunks run in parallel.
+# With return_predictions, the forest predictions computed from the same per-tree predictions are returned too.
+# Surrogates that are not forests return their own uncertainty (predict_uncertainty).
+def jackknife_variances(regressor, X_test, chunk_size=JACKKNIFE_CHUNK_SIZE, workers=None, return_predictions=False):
+  if not is_forest(regressor):
+    variances, predictions = regressor.predict_uncertainty(X_test)
+    return (variances, predictions) if return_predictions else variances
+
+  if workers is None:
+    workers = get_model_workers()
+  num_rows = X_test.shape[0]
+  variances = np.empty(num_rows)
+  predictions = np.empty(num_rows)
+  inbag = get_inbag_covariance(regressor)
+
+  # Make sure every worker gets at least one chunk
+  if workers > 1:
+    chunk_size = max(1, min(chunk_size, -(-num_rows // workers)))
+  bounds = [(start, min(start + chunk_size, num_rows)) for start in range(0, num_rows, chunk_size)]
+
+  if workers > 1 and len(bounds) > 1:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      results = pool.map(lambda bound: _jackknife_variances_chunk(regressor, X_test[bound[0]:bound[1]], inbag), bounds)
+      for (start, stop), (chunk_variances, chunk_predictions) in zip(bounds, results):
+        variances[start:stop] = chunk_variances
+        predictions[start:stop] = chunk_predictions
+  else:
+    for start, stop in bounds:
+      variances[start:stop], predictions[start:stop] = _jackknife_variances_chunk(regressor, X_test[start:stop], inbag)
+
+  if return_predictions:
+    return variances, predictions
   return variances
 
 
-def jackknife(regressor, X_test):
- 
-  variances = jackknife_variances(regressor, X_test)
+# Returns the average jackknife variance, reusing precomputed variances for the same model if given
+def jackknife(regressor, X_test, variances=None):
+  if variances is None:
+    variances = jackknife_variances(regressor, X_test)
 
   return np.average(variances)
+
+
+# This function returns how the convergence statistic is computed ("full" or "subsample")
+def get_variance_estimate():
+  return ConfigManager.get_instance().get_value('settings', 'variance_estimate', 'full')
+
+# This function returns the inner edges that split the range of n, ppn and msg_size of X into num_regions regions each
+def strata_edges(X, num_regions):
+  X = np.atleast_2d(X)
+  return [np.linspace(np.min(X[:,column]), np.max(X[:,column]), num=num_regions + 1)[1:-1] for column in range(3)]
+
+# This function assigns every row to a stratum by splitting the range of n, ppn and msg_size into num_regions regions each.
+# The edges of another feature space (from strata_edges) can be given to assign rows of a subset of it.
+def variance_strata(X, num_regions, edges=None):
+  X = np.atleast_2d(X)
+  if edges is None:
+    edges = strata_edges(X, num_regions)
+  strata = np.zeros(X.shape[0], dtype=int)
+  for column in range(3):
+    strata = strata * num_regions + np.searchsorted(edges[column], X[:,column].astype(float), side='right')
+  return strata
+
+class StratifiedSample:
+  def __init__(self, X, sample_size, num_regions=2, confidence=0.95, seed=VARIANCE_SAMPLE_SEED):
+    rng = np.random.default_rng(seed)
+    strata = variance_strata(X, num_regions)
+    self.num_rows = strata.size
+    self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    stratum_ids, population = np.unique(strata, return_counts=True)
+
+    # Allocate the sample proportionally to the size of each stratum, with at least two rows per stratum
+    # so every stratum contributes a spread
+    allocation = np.minimum(population, np.maximum(2, np.round(sample_size * population / self.num_rows).astype(int)))
+    indices = [np.sort(rng.choice(np.flatnonzero(strata == stratum_id), size=size, replace=False))
+               for stratum_id, size in zip(stratum_ids, allocation)]
+    self.indices = np.concatenate(indices)
+    self.sample_strata = np.repeat(np.arange(stratum_ids.size), allocation)
+    self.weights = population / self.num_rows
+    self.population = population
+    self.allocation = allocation
+    self.estimates = []
+    self.full_values = []
+
+  # Returns the stratified estimate of the average variance and the half width of its confidence interval
+  def estimate_from_variances(self, sample_variances):
+    stratum_means = np.bincount(self.sample_strata, weights=sample_variances) / self.allocation
+    deviations = sample_variances - stratum_means[self.sample_strata]
+    stratum_spreads = np.bincount(self.sample_strata, weights=np.square(deviations)) / np.maximum(1, self.allocation - 1)
+    # The finite population correction makes fully sampled strata exact
+    estimate_variance = np.sum(np.square(self.weights) * (1 - self.allocation / self.population) * stratum_spreads / self.allocation)
+    return np.sum(self.weights * stratum_means), self.z * np.sqrt(estimate_variance)
+
+  # Estimates the average jackknife variance of a model over the feature space X_test (the rows the sample was drawn from)
+  def estimate(self, regressor, X_test):
+    estimate, half_width = self.estimate_from_variances(jackknife_variances(regressor, X_test[self.indices]))
+    self.estimates.append((estimate, half_width))
+    print("Sampled convergence value: ", estimate, " +/- ", half_width, " (", self.indices.size, " of ", self.num_rows, " rows)")
+    return estimate
+
+  # Records the full-space value for the model of the latest estimate
+  def track_full(self, full_value):
+    estimate, half_width = self.estimates[-1]
+    self.full_values.append((full_value, abs(full_value - estimate) <= half_width))
+    print("Full-space convergence value: ", full_value, ", within the confidence bound: ", self.full_values[-1][1])
+
+  # Returns the fraction of tracked full-space values that were within the confidence bound of their estimate
+  def coverage(self):
+    if len(self.full_values) == 0:
+      return None
+    return np.mean([covered for _, covered in self.full_values])
+
+  # Reports how often the full-space value was computed and how often it was within the confidence bound
+  def report(self):
+    if len(self.full_values) > 0:
+      print("The full-space convergence value was computed in ", len(self.full_values), " of ", len(self.estimates),
+            " iterations and was within the confidence bound in ", 100 * self.coverage(), "% of them")
+
+# This function computes the variances over the whole feature space for a model whose convergence statistic was
+# estimated from a sample, and tracks the full-space statistic
+def full_variances(regressor, X_test, sample):
+  variances = jackknife_variances(regressor, X_test)
+  sample.track_full(np.average(variances))
+  return variances
+
+# This function creates the stratified sample used by variance_estimate = subsample, or returns None
+def get_variance_sample(X):
+  config = ConfigManager.get_instance()
+  if get_variance_estimate() != 'subsample':
+    return None
+  sample_size = int(config.get_value('settings', 'variance_sample_size', '2048'))
+  num_regions = int(config.get_value('settings', 'variance_strata', '2'))
+  confidence = float(config.get_value('settings', 'variance_confidence', '0.95'))
+  if sample_size >= X.shape[0]:
+    return None
+  return StratifiedSample(X, sample_size, num_regions, confidence)
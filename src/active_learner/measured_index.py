@@ -0,0 +1,29 @@
+# This file keeps a hashed index of the (n, ppn, msg_size) points that have already been benchmarked,
+# so acquisition does not spend a benchmark round on a point that is already in the training set
+
+import numpy as np
+from src.active_learner.utils import pack_points
+
+class MeasuredIndex:
+  def __init__(self, X=None):
+    self.keys = set()
+    if X is not None:
+      self.add(X)
+
+  # Packs the preprocessed (n, ppn, msg_size) columns of each row into one integer key
+  @staticmethod
+  def point_keys(X):
+    return pack_points(X)
+
+  # Adds the points of all rows of X to the index
+  def add(self, X):
+    self.keys.update(self.point_keys(X).tolist())
+
+  # Returns a boolean mask of the rows of X whose point has been measured
+  def contains(self, X):
+    if len(self.keys) == 0:
+      return np.zeros(np.atleast_2d(X).shape[0], dtype=bool)
+    return np.isin(self.point_keys(X), np.fromiter(self.keys, dtype=np.int64, count=len(self.keys)))
+
+  def __len__(self):
+    return len(self.keys)
@@ -0,0 +1,130 @@
+# This file implements a persistent measurement store that is shared across tuning runs
+#
+# Measurements are kept in a local SQLite database and keyed by a build signature made of the system type,
+# the MPICH installation, the process launcher, the OSU build, the benchmark driver and the topology scheduler.
+# Rebuilding MPICH or OSU changes the signature, so older measurements are never served for a different build. Measurements
+# older than store_max_age_days are stale: they are ignored and purged when the store is opened.
+#
+# The store is disabled unless the measurement_store setting points to a database file, and always for the
+# synthetic latencies of benchmark_driver = fake. Every measurement
+# records the OSU measured and warmup iterations it was collected with, if they are known. A lookup can require
+# a minimum number of measured iterations, measurements with fewer or unknown iterations are then not served.
+
+import os
+import time
+import sqlite3
+import hashlib
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.persistent_driver import get_benchmark_driver
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# This function returns a string that changes whenever the file at path is rebuilt
+def _file_signature(path):
+  try:
+    stat = os.stat(path)
+  except (OSError, TypeError):
+    return f"{path}:missing"
+  return f"{path}:{stat.st_size}:{int(stat.st_mtime)}"
+
+# This function computes the build signature of the current configuration
+def build_signature(topo=None):
+  config = ConfigManager.get_instance()
+  mpich_path = config.get_value('settings', 'mpich_path')
+  osu_path = config.get_value('settings', 'osu_path')
+  parts = [
+    config.get_value('settings', 'system'),
+    _file_signature(os.path.join(mpich_path, 'lib', 'libmpi.so')),
+    _file_signature(os.path.join(mpich_path, 'lib', 'libmpi.la')),
+    _file_signature(config.get_value('settings', 'launcher_path')),
+    _file_signature(os.path.join(osu_path, 'osu_allreduce')),
+    # The persistent driver times its own loop, so its latencies are not interchangeable with OSU runs
+    get_benchmark_driver(),
+    # Microbenchmarks are placed rack/chassis-locally by the scheduler, so the scheduler rather than the
+    # size of the allocation determines the conditions a point is measured under
+    type(topo).__module__ if topo is not None else "no_topology",
+  ]
+  return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+class MeasurementStore:
+  def __init__(self, path, signature, max_age_days=None):
+    self.path = path
+    self.signature = signature
+    self.max_age_seconds = max_age_days * SECONDS_PER_DAY if max_age_days else None
+    self.connection = sqlite3.connect(path, timeout=60)
+    self.connection.execute('''CREATE TABLE IF NOT EXISTS measurements (
+                                 signature TEXT, collective TEXT, alg TEXT,
+                                 n INTEGER, ppn INTEGER, msg_size INTEGER,
+                                 latency REAL, timestamp REAL, iterations INTEGER, warmup INTEGER,
+                                 PRIMARY KEY (signature, collective, alg, n, ppn, msg_size))''')
+    # Databases created before the iteration counts were recorded lack their columns
+    columns = [row[1] for row in self.connection.execute('PRAGMA table_info(measurements)')]
+    for column in ['iterations', 'warmup']:
+      if column not in columns:
+        self.connection.execute(f'ALTER TABLE measurements ADD COLUMN {column} INTEGER')
+    self.purge_stale()
+    self.connection.commit()
+
+  # Returns the oldest timestamp that is still considered fresh
+  def _min_timestamp(self):
+    if self.max_age_seconds is None:
+      return 0
+    return time.time() - self.max_age_seconds
+
+  # Deletes all stale measurements
+  def purge_stale(self):
+    if self.max_age_seconds is not None:
+      self.connection.execute('DELETE FROM measurements WHERE timestamp < ?', (self._min_timestamp(),))
+      self.connection.commit()
+
+  # Deletes all measurements of the current build signature
+  def invalidate(self):
+    self.connection.execute('DELETE FROM measurements WHERE signature = ?', (self.signature,))
+    self.connection.commit()
+
+  # Looks up measurements, keys are (collective, alg, n, ppn, msg_size) tuples. min_iterations is an optional
+  # dictionary of key -> measured iterations the measurement must have been collected with at least.
+  # Returns a dictionary of the keys found.
+  def lookup_many(self, keys, min_iterations=None):
+    found = {}
+    min_timestamp = self._min_timestamp()
+    for key in keys:
+      query = '''SELECT latency FROM measurements WHERE signature = ? AND collective = ? AND alg = ?
+                 AND n = ? AND ppn = ? AND msg_size = ? AND timestamp >= ?'''
+      parameters = (self.signature, *key, min_timestamp)
+      if min_iterations is not None and key in min_iterations:
+        query += ' AND iterations >= ?'
+        parameters += (int(min_iterations[key]),)
+      row = self.connection.execute(query, parameters).fetchone()
+      if row is not None:
+        found[key] = row[0]
+    return found
+
+  # Inserts or refreshes measurements, entries is a dictionary of key -> latency and counts an optional
+  # dictionary of key -> (measured iterations, warmup iterations)
+  def insert_many(self, entries, counts=None):
+    timestamp = time.time()
+    counts = {} if counts is None else counts
+    self.connection.executemany('''INSERT OR REPLACE INTO measurements (signature, collective, alg, n, ppn, msg_size,
+                                   latency, timestamp, iterations, warmup) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                [(self.signature, *key, latency, timestamp, *counts.get(key, (None, None)))
+                                 for key, latency in entries.items()])
+    self.connection.commit()
+
+  # Returns the (measured iterations, warmup iterations) of measurements, None for unknown counts
+  def lookup_iterations(self, key):
+    row = self.connection.execute('''SELECT iterations, warmup FROM measurements WHERE signature = ? AND collective = ?
+                                     AND alg = ? AND n = ? AND ppn = ? AND msg_size = ?''', (self.signature, *key)).fetchone()
+    return (None, None) if row is None else tuple(row)
+
+  def close(self):
+    self.connection.close()
+
+# This function opens the measurement store configured in config.ini, returns None if it is disabled
+def get_measurement_store(topo=None):
+  config = ConfigManager.get_instance()
+  path = config.get_value('settings', 'measurement_store', '')
+  if not path or get_benchmark_driver() == 'fake':
+    return None
+  max_age_days = float(config.get_value('settings', 'store_max_age_days', '30'))
+  return MeasurementStore(path, build_signature(topo), max_age_days)
@@ -0,0 +1,118 @@
+# This file fits the surrogate model used by the active learner (a random forest by default, see surrogates.py)
+#
+# training_mode = full: every iteration fits a fresh forest on all of the training data
+# training_mode = incremental: the forest from the previous iteration is reused. Each iteration fits
+#   incremental_trees new trees on the current training data and retires the same number of the oldest
+#   trees, so the fit cost no longer scales with the size of the whole forest. The forest is refit
+#   from scratch every refit_interval iterations to bound the age of the remaining trees.
+#
+# model_workers sets how many cores are used to fit the forest and to compute its predictions/variances
+#
+# Prior data from a related tuning run is fit together with the training data, weighted by prior_weight
+#
+# forest_size sets the number of trees. With variance_estimator = infinitesimal_jackknife, the bootstrap in-bag
+# counts of every tree are recorded after fitting (see jackknife.py), which keeps the variance estimate stable
+# with smaller forests.
+
+import os
+import time
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.surrogates import create_surrogate, get_surrogate, is_forest
+
+# Number of trees in the forest (the scikit-learn default)
+FOREST_SIZE = 100
+
+# This function returns the number of trees in the forest
+def get_forest_size():
+  return max(1, int(ConfigManager.get_instance().get_value('settings', 'forest_size', str(FOREST_SIZE))))
+
+# This function returns the estimator used for the uncertainty of the forest ("jackknife" or "infinitesimal_jackknife")
+def get_variance_estimator():
+  return ConfigManager.get_instance().get_value('settings', 'variance_estimator', 'jackknife')
+
+# This function returns the number of workers used for model fitting and prediction ("auto" = all cores)
+def get_model_workers():
+  model_workers = ConfigManager.get_instance().get_value('settings', 'model_workers', '1')
+  if model_workers == 'auto':
+    return os.cpu_count()
+  return max(1, int(model_workers))
+
+# This function creates a new surrogate model and fits it to all of the training data
+def fit_full(X_train, y_train, warm_start=False, workers=None, sample_weight=None):
+  if workers is None:
+    workers = get_model_workers()
+  rf = create_surrogate(n_estimators=get_forest_size(), warm_start=warm_start, workers=workers)
+  return rf.fit(X_train, y_train, sample_weight=sample_weight)
+
+# This function retires the oldest trees of a fitted forest and fits new trees to the training data
+def fit_incremental(rf, X_train, y_train, new_trees, sample_weight=None):
+  forest_size = get_forest_size()
+  new_trees = min(max(1, new_trees), forest_size)
+  num_kept = forest_size - new_trees
+  rf.estimators_ = rf.estimators_[len(rf.estimators_) - num_kept:] if num_kept > 0 else []
+  rf.set_params(n_estimators=len(rf.estimators_) + new_trees, warm_start=True, n_jobs=get_model_workers())
+  return rf.fit(X_train, y_train, sample_weight=sample_weight)
+
+# This function returns the identity of every row of the fit data: whether the row comes from the prior, how many
+# identical rows precede it and its features. It stays the same when rows are added to or left out of a later fit.
+def fit_row_ids(X_fit, num_prior=0):
+  num_rows = X_fit.shape[0]
+  origin = np.arange(num_rows) >= num_rows - num_prior
+  _, groups = np.unique(X_fit, axis=0, return_inverse=True)
+  groups = groups.reshape(-1)
+  order = np.argsort(groups, kind='stable')
+  occurrence = np.empty(num_rows)
+  occurrence[order] = np.arange(num_rows) - np.searchsorted(groups[order], groups[order])
+  return np.column_stack((origin, occurrence, X_fit))
+
+# This function stores how often each row of the fit data (the last num_prior rows come from the prior) was drawn
+# into the bootstrap sample of the trees that were just fit, together with the identities of the rows.
+# The bootstrap samples are regenerated from the state of the last fit, so trees kept by incremental training keep
+# the counts recorded when they were fit. The identities align them with the rows of later fits (see jackknife.py).
+def record_inbag_counts(rf, X_fit, num_prior=0):
+  new_trees = [i for i, tree in enumerate(rf.estimators_) if not hasattr(tree, 'inbag_counts_')]
+  if len(new_trees) == 0:
+    return
+  row_ids = fit_row_ids(X_fit, num_prior)
+  samples = rf.estimators_samples_
+  for i in new_trees:
+    rf.estimators_[i].inbag_counts_ = np.bincount(samples[i], minlength=X_fit.shape[0])
+    rf.estimators_[i].inbag_rows_ = row_ids
+
+# This function adds the prior data to the training data, returns (X, y, sample_weight)
+def add_prior(X_train, y_train, X_prior=None, y_prior=None):
+  if X_prior is None or X_prior.shape[0] == 0:
+    return X_train, y_train, None
+  prior_weight = float(ConfigManager.get_instance().get_value('settings', 'prior_weight', '0.5'))
+  X_fit = np.vstack([X_train, X_prior])
+  y_fit = np.concatenate([y_train, y_prior])
+  sample_weight = np.concatenate([np.ones(y_train.shape[0]), np.full(y_prior.shape[0], prior_weight)])
+  return X_fit, y_fit, sample_weight
+
+# This function fits the model for an active learning iteration and returns the model and the fit time in seconds
+def fit_model(rf, X_train, y_train, iteration, X_prior=None, y_prior=None):
+  config = ConfigManager.get_instance()
+  training_mode = config.get_value('settings', 'training_mode', 'full')
+  start_time = time.time()
+  #rows without a latency (algorithms pruned at a point, see pruning.py) are left out of the fit
+  benchmarked = np.isfinite(y_train)
+  if not np.all(benchmarked):
+    X_train, y_train = X_train[benchmarked], y_train[benchmarked]
+  num_train = X_train.shape[0]
+  X_train, y_train, sample_weight = add_prior(X_train, y_train, X_prior, y_prior)
+
+  #only forests can replace a part of their trees, other surrogates are always refit on all data
+  if training_mode == 'incremental' and get_surrogate() != 'quantile_gbm':
+    new_trees = int(config.get_value('settings', 'incremental_trees', '10'))
+    refit_interval = int(config.get_value('settings', 'refit_interval', '10'))
+    if rf is None or iteration % refit_interval == 0:
+      rf = fit_full(X_train, y_train, warm_start=True, sample_weight=sample_weight)
+    else:
+      rf = fit_incremental(rf, X_train, y_train, new_trees, sample_weight=sample_weight)
+  else:
+    rf = fit_full(X_train, y_train, sample_weight=sample_weight)
+
+  if get_variance_estimator() == 'infinitesimal_jackknife' and is_forest(rf) and rf.bootstrap:
+    record_inbag_counts(rf, X_train, X_train.shape[0] - num_train)
+  return rf, time.time() - start_time
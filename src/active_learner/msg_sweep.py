@@ -0,0 +1,36 @@
+# This file decides which message sizes are measured together with a benchmark
+#
+# msg_sweep = none: every benchmark launch measures the requested message size only (the default)
+# msg_sweep = range: every benchmark launch runs OSU over the power-of-two message sizes within msg_sweep_width
+#   doublings of the requested one (see sweep_point_timed() in data_collect.py). The launcher startup is paid once
+#   for all of them. The other message sizes are added to the result cache and the measurement store, and a point
+#   of the feature space whose algorithms were all measured this way is added to the training data without
+#   launching anything (see harvested_points() in data_collect.py).
+#
+# Larger message sizes take longer to measure, so the width trades the time spent in the iterations of a launch
+# against the number of launches. A sweep never leaves the message sizes of the feature space (e.g., the 1 and 2 byte
+# messages that reductions avoid).
+
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+
+# This function returns the number of message size doublings measured below and above the requested message size,
+# 0 if message sizes are not swept
+def get_sweep_width():
+  config = ConfigManager.get_instance()
+  if config.get_value('settings', 'msg_sweep', 'none') != 'range':
+    return 0
+  return int(config.get_value('settings', 'msg_sweep_width', '2'))
+
+# This function returns the smallest and largest message size of the sweep around a message size, clamped to the
+# smallest and largest message size of the feature space (msg_bounds) if they are given, all in preprocessed form
+# (log2 + 1)
+def sweep_sizes(msg_size, width, msg_bounds=None):
+  min_msg_size, max_msg_size = (1, None) if msg_bounds is None else msg_bounds
+  low = max(int(min_msg_size), int(msg_size) - width)
+  high = int(msg_size) + width if max_msg_size is None else min(int(max_msg_size), int(msg_size) + width)
+  return low, high
+
+# This function returns the smallest and largest message size of a feature space (preprocessed form)
+def feature_msg_bounds(feature_space):
+  return int(np.min(feature_space[:,2])), int(np.max(feature_space[:,2]))
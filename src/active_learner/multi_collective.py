@@ -0,0 +1,35 @@
+# This file tunes several collectives concurrently in one allocation
+#
+# Each collective runs its own active learner (train_model with the async pipeline) in a thread. All learners
+# share one BenchmarkScheduler, so the benchmarks of every collective are interleaved on the same topology:
+# while one collective waits for a large benchmark, the free racks/chassis run the points of the others.
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.active_learner.active_learner import train_model
+from src.active_learner.async_pipeline import BenchmarkScheduler, get_pipeline
+from src.user_config.config_manager import ConfigManager
+
+# This function returns whether gen_config_multiple/gen_config_all tune their collectives concurrently
+def concurrent_requested():
+  return get_pipeline() == 'async'
+
+# This function trains the models of all collectives concurrently, returns a dictionary of collective -> (feature_space, rf)
+def train_models(n, ppn, msg_size, collectives, min_reps=5, resume=False, prior_file=None):
+  print(f"train_models: n={n}, ppn={ppn}, msg_size={msg_size}, collectives={collectives}")
+
+  #initialize the topology shared by all collectives
+  num_processes=n*ConfigManager.get_instance().get_value('settings', 'max_ppn')
+  dummy_topo_instance = ConfigManager.get_instance().get_topology()
+  topo_file = dummy_topo_instance.gen_topology_file(num_processes)
+  topo = dummy_topo_instance.get_topology(topo_file)
+  scheduler = BenchmarkScheduler(topo, num_learners=len(collectives))
+
+  try:
+    with ThreadPoolExecutor(max_workers=len(collectives)) as executor:
+      futures = {collective: executor.submit(train_model, n, ppn, msg_size, collective, min_reps,
+                                             resume=resume, prior_file=prior_file, scheduler=scheduler)
+                 for collective in collectives}
+      return {collective: future.result() for collective, future in futures.items()}
+  finally:
+    scheduler.close()
@@ -67,14 +67,12 @@ def normalize_output(y, num_algs, norm_type="log"):
   y = y.astype(float)
   y_nf = copy.deepcopy(y)
   
-  #For algorithm normalization
+  #For algorithm normalization, each group of num_algs rows (one point) is divided by the row of algorithm 0.
+  #A trailing incomplete group is not normalized.
   if(norm_type == "alg"):
-    i = 0
-    while (i + num_algs - 1) < len(y):
-      normal = y[i]
-      for x in range(num_algs):
-        y[i+x] /= normal
-      i += num_algs
+    num_complete = len(y) - len(y) % num_algs
+    points = y[:num_complete].reshape(-1, num_algs)
+    y[:num_complete] = (points / points[:,:1]).reshape(-1)
     
     #Add log to alg
     y = np.log10(y) + 1
@@ -113,17 +111,26 @@ def undo_normalize_output(X, y_nf, X_set, y_set, num_algs, norm_type="log"):
     #Add log to alg
     y_set = 10 ** (y_set - 1)
     
-    i = 0
-    y_set_nf = []
-    for row_set in X_set:
-      j = 0
-      for row in X:
-        if np.all(row[0:3] == row_set[0:3]) and row[3] == 0:
-          y_set_nf.append(y_set[i]*y_nf[j])
-        j+=1
-      i+=1
-    
-    y_set_nf = np.asarray(y_set_nf)
+    #Index the (n, ppn, msg_size) triples of both sets, then look up the algorithm 0 (reference) rows of X
+    #for every row of X_set. Every matching reference row produces one output, in the order of X.
+    X = np.atleast_2d(X)
+    X_set = np.atleast_2d(X_set)
+    _, point_ids = np.unique(np.vstack([X[:,0:3], X_set[:,0:3]]), axis=0, return_inverse=True)
+    point_ids = point_ids.reshape(-1)
+    set_ids = point_ids[X.shape[0]:]
+
+    reference_rows = np.flatnonzero(X[:,3] == 0)
+    order = np.argsort(point_ids[reference_rows], kind='stable')
+    reference_ids = point_ids[reference_rows][order]
+    reference_rows = reference_rows[order]
+
+    starts = np.searchsorted(reference_ids, set_ids, side='left')
+    counts = np.searchsorted(reference_ids, set_ids, side='right') - starts
+    set_rows = np.repeat(np.arange(X_set.shape[0]), counts)
+    offsets = np.arange(set_rows.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    matches = reference_rows[np.repeat(starts, counts) + offsets]
+
+    y_set_nf = y_set[set_rows] * y_nf[matches]
     return y_set_nf
 
   #For log normalization
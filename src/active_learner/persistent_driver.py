@@ -0,0 +1,165 @@
+# This file runs benchmarks through a persistent benchmark driver instead of one OSU launch per benchmark
+#
+# benchmark_driver = runner: every benchmark launches the runner script, which selects the algorithm through
+#   MPIR_CVAR environment variables (the default)
+# benchmark_driver = persistent: the driver in src/mb_runner/persistent_driver is launched once per
+#   (n, ppn, nodefile) and kept running. For every benchmark it writes the algorithm (and k-value) control
+#   variables through MPI_T and runs a timed loop of the collective, like OSU.
+# benchmark_driver = fake: a stand-in driver with the same protocol (fake_driver.py) reports synthetic latencies
+#   without MPI, to test the tuning loop without a cluster
+#
+# Protocol, one line per message over the stdin and stdout of the driver (rank 0 of the MPI job):
+#   driver: READY <processes>, or ERROR <reason> if an algorithm control variable is missing
+#   ACCLAiM: <collective> <algorithm> <k-value control variable or -> <k-value> <message size> <iterations> <warmup>
+#     (0 iterations or warmup select the OSU defaults)
+#   driver: <message size> <latency in microseconds>, or ERROR <reason>
+#   ACCLAiM: quit (the end of stdin also stops the driver)
+#
+# Drivers of a job with a nodefile are closed when the job finishes, since the nodes are reused by other jobs.
+# Drivers without a nodefile are kept until the process exits. The ch4 collectives always use the ch4 runner.
+# An algorithm that the driver cannot select raises an AlgorithmSelectionError, which stops the tuning instead of
+# being recorded as a failed benchmark: the algorithm names do not match the MPICH build.
+# The driver benchmarks host buffers, so it is rejected on aurora_xpu, whose runners benchmark device buffers.
+
+import os
+import re
+import sys
+import atexit
+import threading
+import subprocess
+from src.user_config.config_manager import ConfigManager
+
+# Directory of the driver sources, the built driver and the stand-in driver
+DRIVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mb_runner', 'persistent_driver')
+
+# Seconds a driver may take to exit after it was asked to quit
+DRIVER_EXIT_SECONDS = 10
+
+# k-value control variables of the algorithms that take one, as set by generic_runner.sh
+KVAL_CVARS = {'recexch': 'RECEXCH_KVAL', 'recexch_doubling': 'RECEXCH_KVAL', 'recexch_halving': 'RECEXCH_KVAL',
+              'k_reduce_scatter_allgather': 'RECEXCH_KVAL', 'tree': 'TREE_KVAL',
+              'recursive_multiplying': 'RECURSIVE_MULTIPLYING_KVAL', 'k_brucks': 'BRUCKS_KVAL'}
+
+# Raised when the driver cannot select an algorithm through its control variable
+class AlgorithmSelectionError(RuntimeError):
+  pass
+
+# This function returns the benchmark driver ("runner", "persistent" or "fake")
+def get_benchmark_driver():
+  config = ConfigManager.get_instance()
+  driver = config.get_value('settings', 'benchmark_driver', 'runner')
+  if driver == 'persistent' and config.get_value('settings', 'system', '') == 'aurora_xpu':
+    raise ValueError("benchmark_driver = persistent benchmarks host buffers and cannot replace the aurora_xpu runners")
+  return driver
+
+# This function returns whether the benchmarks of a collective run through a persistent driver
+def uses_driver(name):
+  return get_benchmark_driver() != 'runner' and not name.endswith('_ch4')
+
+# This function splits an algorithm into the MPICH algorithm and its k-value (as split_string in generic_runner.sh)
+def split_alg(alg):
+  match = re.match(r'^(.*[^0-9])([0-9]+)$', alg)
+  return (match.group(1), match.group(2)) if match else (alg, '')
+
+# This function returns the protocol line of a benchmark
+def driver_command(name, alg, msg_size, iterations=None, warmup=None):
+  alg_name, alg_param = split_alg(alg)
+  kval_cvar = f"MPIR_CVAR_{name.upper()}_{KVAL_CVARS[alg_name]}" if alg_param and alg_name in KVAL_CVARS else '-'
+  return f"{name} {alg_name} {kval_cvar} {alg_param if alg_param else 0} {int(msg_size)} {int(iterations or 0)} {int(warmup or 0)}\n"
+
+# This function returns the command that launches a driver on n nodes with ppn processes per node
+def launch_command(n, ppn, nodefile=None):
+  config = ConfigManager.get_instance()
+  if get_benchmark_driver() == 'fake':
+    return [sys.executable, os.path.join(DRIVER_DIR, 'fake_driver.py'), str(n), str(ppn)]
+  mpich_path = config.get_value('settings', 'mpich_path')
+  command = [config.get_value('settings', 'launcher_path')]
+  if nodefile:
+    command += ['--hostfile', nodefile]
+  return command + ['-n', str(n * ppn), '-ppn', str(ppn), '-genv', 'MPIR_CVAR_DEVICE_COLLECTIVES=none',
+                    '-genv', f"LD_LIBRARY_PATH={mpich_path}/lib:{os.environ.get('LD_LIBRARY_PATH', '')}",
+                    config.get_value('settings', 'persistent_driver_path', os.path.join(DRIVER_DIR, 'persistent_driver'))]
+
+class PersistentDriver:
+  def __init__(self, command):
+    self.command = command
+    # Forked processes (e.g., pool workers) inherit the drivers of their parent but must not use them
+    self.owner = os.getpid()
+    self.lock = threading.Lock()
+    self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+    reply = self._read_reply()
+    if reply[0] != 'READY':
+      self.close()
+      raise RuntimeError(f"The benchmark driver did not start: {' '.join(reply)}")
+
+  # Returns the next reply of the driver, lines that are not part of the protocol (e.g., launcher output) are skipped
+  def _read_reply(self):
+    while True:
+      line = self.process.stdout.readline()
+      if not line:
+        raise RuntimeError(f"The benchmark driver exited: {' '.join(self.command)}")
+      parts = line.split()
+      if len(parts) > 0 and (parts[0] in ['READY', 'ERROR'] or parts[0].isdigit()):
+        return parts
+
+  def alive(self):
+    return self.process.poll() is None
+
+  # Returns the latency of a benchmark in microseconds. Raises an AlgorithmSelectionError if the driver cannot
+  # select the algorithm and a ValueError if it reports another error.
+  def measure(self, name, alg, msg_size, iterations=None, warmup=None):
+    with self.lock:
+      try:
+        self.process.stdin.write(driver_command(name, alg, msg_size, iterations, warmup))
+        self.process.stdin.flush()
+      except OSError:
+        raise RuntimeError(f"The benchmark driver exited: {' '.join(self.command)}")
+      reply = self._read_reply()
+    if reply[:3] == ['ERROR', 'cannot', 'select']:
+      raise AlgorithmSelectionError(f"The benchmark driver cannot select {name} {alg}: {' '.join(self.command)}")
+    if reply[0] != str(int(msg_size)) or len(reply) < 2:
+      print("Benchmark driver error: ", ' '.join(reply))
+      print("Parameters:", name, alg, msg_size, iterations, warmup)
+      raise ValueError
+    return float(reply[1])
+
+  def close(self):
+    try:
+      if self.alive():
+        self.process.stdin.write("quit\n")
+      self.process.stdin.close()
+    except OSError:
+      pass
+    try:
+      self.process.wait(timeout=DRIVER_EXIT_SECONDS)
+    except subprocess.TimeoutExpired:
+      self.process.kill()
+      self.process.wait()
+    self.process.stdout.close()
+
+# Drivers of this process keyed by (n, ppn, nodefile)
+_drivers = {}
+_drivers_lock = threading.Lock()
+
+# This function returns the driver of (n, ppn, nodefile), it is launched if it is not running
+def get_driver(n, ppn, nodefile=None):
+  key = (int(n), int(ppn), nodefile if nodefile else None)
+  with _drivers_lock:
+    driver = _drivers.get(key)
+    if driver is None or driver.owner != os.getpid() or not driver.alive():
+      if driver is not None and driver.owner == os.getpid():
+        _drivers.pop(key).close()
+      print("Launching the benchmark driver on ", key)
+      driver = _drivers[key] = PersistentDriver(launch_command(*key))
+  return driver
+
+# This function closes the drivers launched on a nodefile, or all drivers
+def close_drivers(nodefile=None):
+  with _drivers_lock:
+    keys = [key for key in _drivers if nodefile is None or key[2] == nodefile]
+    drivers = [_drivers.pop(key) for key in keys]
+  for driver in drivers:
+    if driver.owner == os.getpid():
+      driver.close()
+
+atexit.register(close_drivers)
@@ -5,8 +5,11 @@
 #   $2 = train set X values
 #   $3 = test set X values
 #   $4 = (for batch only) batch size
+#   variances = (optional) jackknife variances of the test set already computed for this regressor
+#   measured = (optional) MeasuredIndex of the points already benchmarked
 
 import csv
+import math
 import numpy as np
 import sys
 
@@ -15,23 +18,65 @@ from sklearn import neighbors
 from sklearn.ensemble import RandomForestRegressor
 
 from src.active_learner.jackknife import jackknife_variances
+from src.active_learner.utils import pack_points
+from src.user_config.config_manager import ConfigManager
 
-def point_selection_single(regressor, X_train, X_test):
+# This function determines how many points to select per active learning iteration.
+# With batch_size = auto, enough points are selected for their algorithm runs to fill every
+# concurrent slot of the topology (e.g., every rack on Polaris or chassis on Aurora)
+def get_batch_size(topo, num_algs):
+  batch_size = ConfigManager.get_instance().get_value('settings', 'batch_size', '1')
+  if batch_size == 'auto':
+    return max(1, math.ceil(topo.get_capacity() / num_algs))
+  return max(1, int(batch_size))
 
-  variances = jackknife_variances(regressor, X_test)
+# This function skips (measured_point_weight = 0, the default) or down-weights the rows of points that were
+# already benchmarked. If every point was measured, the variances are returned unchanged.
+def exclude_measured(variances, X_test, measured):
+  if measured is None or len(measured) == 0:
+    return variances
+  mask = measured.contains(X_test)
+  if np.all(mask):
+    return variances
+
+  weight = float(ConfigManager.get_instance().get_value('settings', 'measured_point_weight', '0'))
+  variances = np.array(variances, dtype=float)
+  if weight > 0:
+    variances[mask] *= weight
+  else:
+    variances[mask] = -np.inf
+  return variances
+
+def point_selection_single(regressor, X_train, X_test, variances=None, measured=None):
+
+  if variances is None:
+    variances = jackknife_variances(regressor, X_test)
+  variances = exclude_measured(variances, X_test, measured)
   new_point_index = np.argmax(variances)
   new_point = X_test[new_point_index,:]
-  
-  #if(np.any(np.all(np.isin(X_train, new_point), axis=1))):
-  #  print("Warning: selecting stale point")
 
   return new_point, new_point_index
 
-def point_selection_batch(regressor, X_train, X_test, batch_size):
+def point_selection_batch(regressor, X_train, X_test, batch_size, variances=None, measured=None):
 
-  variances = jackknife_variances(regressor, X_test)
-  new_point_indices = np.argpartition(variances, -batch_size)[-batch_size:]
+  if variances is None:
+    variances = jackknife_variances(regressor, X_test)
+  variances = exclude_measured(variances, X_test, measured)
+
+  # Rows of X_test that only differ by algorithm are the same point, so keep the most
+  # uncertain row of each point to guarantee the batch contains distinct points
+  _, point_ids = np.unique(pack_points(X_test), return_inverse=True)
+  point_ids = point_ids.reshape(-1)
+  order = np.argsort(-variances, kind='stable')
+  _, first = np.unique(point_ids[order], return_index=True)
+  candidate_indices = order[first]
+  if np.any(np.isfinite(variances[candidate_indices])):
+    candidate_indices = candidate_indices[np.isfinite(variances[candidate_indices])]
+
+  batch_size = min(batch_size, candidate_indices.size)
+  top = np.argpartition(variances[candidate_indices], -batch_size)[-batch_size:]
+  new_point_indices = candidate_indices[top]
+  new_point_indices = new_point_indices[np.argsort(-variances[new_point_indices], kind='stable')]
   new_points =  X_test[new_point_indices,:]
   
   return new_points, new_point_indices
-
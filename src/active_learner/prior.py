@@ -0,0 +1,59 @@
+# This file loads prior knowledge from a related tuning run (e.g., the same machine at a smaller node count
+# or an older MPICH build) to warm start active learning
+#
+# A prior is either a data file written by gen_data_single (preprocessed features + normalized latency)
+# or a pickled model trained by ACCLAiM, which is converted into pseudo-observations over the current
+# feature space. The prior data is added to the training set with a lower sample weight (prior_weight),
+# and prior rows are dropped as soon as the same point is benchmarked, so active learning corrects the prior.
+
+import os
+import pickle
+import numpy as np
+from src.active_learner.algs import add_algs
+from src.active_learner.utils import compact_features
+
+# Number of points sampled from a prior model to create pseudo-observations
+PRIOR_MODEL_POINTS = 64
+
+# This function returns the prior file requested by the user (make ... PRIOR_DATA=<file>), or None
+def prior_requested():
+  prior_file = os.environ.get('ACCLAIM_PRIOR_DATA', '')
+  return prior_file if prior_file else None
+
+# This function creates pseudo-observations for evenly spaced points of the feature space from a prior model
+def prior_from_model(model, feature_space, algs, num_points=PRIOR_MODEL_POINTS):
+  num_points = min(num_points, feature_space.shape[0])
+  indices = np.floor(np.linspace(0, feature_space.shape[0] - 1, num=num_points)).astype(int)
+  X_prior = add_algs(feature_space[np.unique(indices),:], algs)
+  return X_prior, model.predict(X_prior)
+
+# This function loads a prior for a collective, returns (X_prior, y_prior) or (None, None) if there is none.
+# "{collective}" in the file name is replaced by the collective so one template can serve several collectives.
+def load_prior(prior_file, collective, feature_space, algs):
+  if prior_file is None:
+    return None, None
+  prior_file = prior_file.replace('{collective}', collective)
+  if not os.path.exists(prior_file):
+    print(f"Warning: The prior file '{prior_file}' was not found, training without a prior.")
+    return None, None
+
+  if prior_file.endswith('.pkl'):
+    with open(prior_file, 'rb') as model_file:
+      model = pickle.load(model_file)
+    X_prior, y_prior = prior_from_model(model, feature_space, algs)
+  else:
+    data = np.loadtxt(prior_file, delimiter=',', ndmin=2)
+    X_prior = data[:,:-1]
+    y_prior = data[:,-1]
+
+  # Drop rows of algorithms that do not exist in the current algorithm list
+  keep = X_prior[:,-1] < len(algs.keys())
+  print("Loaded ", np.count_nonzero(keep), " prior data points from ", prior_file)
+  return compact_features(X_prior[keep]), y_prior[keep]
+
+# This function returns the prior rows whose point has not been benchmarked yet, measured data supersedes the prior
+def unmeasured_prior(X_prior, y_prior, measured):
+  if X_prior is None:
+    return None, None
+  keep = ~measured.contains(X_prior)
+  return X_prior[keep], y_prior[keep]
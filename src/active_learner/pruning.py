@@ -0,0 +1,84 @@
+# This file stops benchmarking algorithms that are clearly dominated in a region of the feature space
+#
+# algorithm_pruning = none: every point is benchmarked with all algorithms (the default)
+# algorithm_pruning = dominated: the feature space is split into regions (pruning_regions ranges of n, ppn and
+#   msg_size each, as for the variance strata in jackknife.py). After every fit, an algorithm is pruned in a
+#   region if the lower confidence bound of its prediction is above the upper confidence bound of the best
+#   algorithm at every point of the region (one-sided, pruning_confidence), and it was benchmarked at
+#   PRUNING_MIN_MEASURED points of the region.
+#
+# The rows of pruned algorithms are still added to the training data, with a NaN latency, so every point keeps
+# num_algs rows. They are not launched and are left out of the fit. Algorithm 0 is never pruned, the latency of
+# the other algorithms is normalized by it. Pruning is recomputed after every fit, an algorithm whose confidence
+# interval overlaps the best one again is benchmarked again.
+
+import numpy as np
+from statistics import NormalDist
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.jackknife import strata_edges, variance_strata
+
+# Number of benchmarks of an algorithm in a region before it may be pruned there
+PRUNING_MIN_MEASURED = 3
+
+class AlgorithmPruner:
+  # X is the feature space with all algorithms (see add_algs), num_algs rows per point
+  def __init__(self, X, num_algs, num_regions=2, confidence=0.99):
+    self.num_algs = num_algs
+    self.num_regions = num_regions
+    self.edges = strata_edges(X, num_regions)
+    self.point_regions = variance_strata(X[::num_algs], num_regions, self.edges)
+    self.z = NormalDist().inv_cdf(confidence)
+    self.measured = np.zeros((num_regions ** 3, num_algs), dtype=int)
+    self.pruned = np.zeros((num_regions ** 3, num_algs), dtype=bool)
+    self.saved = 0
+
+  # Returns the region of every row
+  def regions(self, X):
+    return variance_strata(X, self.num_regions, self.edges)
+
+  # Counts the benchmarks of every algorithm per region, rows without a latency are ignored
+  def add_measured(self, X, y):
+    X = np.atleast_2d(X)
+    benchmarked = np.isfinite(np.asarray(y, dtype=float).reshape(-1))
+    np.add.at(self.measured, (self.regions(X[benchmarked]), X[benchmarked,3].astype(int)), 1)
+
+  # Recomputes the pruned algorithms of every region from the normalized predictions and their variances
+  # over the feature space
+  def update(self, y_pred, variances):
+    y_pred = np.reshape(y_pred, (-1, self.num_algs))
+    spread = self.z * np.sqrt(np.maximum(np.reshape(variances, (-1, self.num_algs)), 0))
+    best_upper = np.min(y_pred + spread, axis=1)
+    dominated = (y_pred - spread) > best_upper[:,np.newaxis]
+
+    contended = np.zeros(self.pruned.shape, dtype=int)
+    np.add.at(contended, self.point_regions, ~dominated)
+    pruned = (contended == 0) & (self.measured >= PRUNING_MIN_MEASURED)
+    pruned[:,0] = False
+    if np.any(pruned != self.pruned):
+      print("Pruned algorithms per region: ", {int(region): np.flatnonzero(algs).tolist()
+                                               for region, algs in enumerate(pruned) if np.any(algs)})
+    self.pruned = pruned
+
+  # Returns which rows belong to an algorithm pruned in the region of their point
+  def prune(self, X):
+    X = np.atleast_2d(X)
+    return self.pruned[self.regions(X), X[:,3].astype(int)]
+
+  # Counts the pruned rows that would otherwise have been launched as saved launches, pruned rows with a cached
+  # or stored result did not save anything (see data_collect.cached_rows)
+  def add_saved(self, saved):
+    self.saved += int(np.count_nonzero(saved))
+
+  # Reports how many benchmark launches pruning saved
+  def report(self):
+    print("Algorithm pruning saved ", self.saved, " benchmark launches, ", int(np.count_nonzero(self.pruned)),
+          " (region, algorithm) pairs are pruned")
+
+# This function creates the algorithm pruner for a feature space with all algorithms, or returns None
+def get_algorithm_pruner(X, num_algs):
+  config = ConfigManager.get_instance()
+  if config.get_value('settings', 'algorithm_pruning', 'none') != 'dominated':
+    return None
+  num_regions = int(config.get_value('settings', 'pruning_regions', '2'))
+  confidence = float(config.get_value('settings', 'pruning_confidence', '0.99'))
+  return AlgorithmPruner(X, num_algs, num_regions, confidence)
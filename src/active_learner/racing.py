@@ -0,0 +1,49 @@
+# This file decides which algorithms of a point survive a round of racing
+#
+# racing = none: every algorithm of a point is benchmarked once with the OSU default iteration counts (the default)
+# racing = successive_halving: the algorithms of a point are raced on the nodes of the point (see race_point() in
+#   data_collect.py). All of them first run racing_iterations measured iterations. The slower half is dropped,
+#   except for the algorithms within racing_tolerance of the fastest, and the survivors rerun with twice the
+#   iterations. Once a single algorithm is left, it is measured with the OSU default iteration counts, which also
+#   ends the race if several algorithms are still within the tolerance at the default iteration counts.
+#
+# Every algorithm reports the latency of its longest run. The latencies of the algorithms dropped early come from
+# fewer iterations and are noisier, but still tell the model that these algorithms are slower. They are only used
+# for training: they are neither cached nor written to the measurement store, so no later request reuses them.
+
+import math
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+
+# Growth of the iteration count from one round to the next
+RACING_GROWTH = 2
+
+# This function returns the racing mode ("none" or "successive_halving")
+def get_racing():
+  return ConfigManager.get_instance().get_value('settings', 'racing', 'none')
+
+# This function returns the number of measured iterations of the first round and the relative tolerance within
+# which an algorithm is never dropped
+def get_racing_parameters():
+  config = ConfigManager.get_instance()
+  return int(config.get_value('settings', 'racing_iterations', '50')), float(config.get_value('settings', 'racing_tolerance', '0.05'))
+
+# This function returns the indices of the latencies that survive a round, sorted: the faster half (rounded up) and
+# every latency within the tolerance of the fastest
+def race_survivors(latencies, tolerance):
+  latencies = np.asarray(latencies, dtype=float)
+  ranks = np.argsort(np.argsort(latencies, kind='stable'), kind='stable')
+  survivors = (ranks < math.ceil(latencies.size / 2)) | (latencies <= np.min(latencies) * (1 + tolerance))
+  return np.flatnonzero(survivors)
+
+# This function returns which rows of a race were measured in its last round, given the measured iterations of
+# the longest run of every row (the rows dropped before ran fewer iterations)
+def last_round_rows(row_iterations):
+  row_iterations = np.asarray(row_iterations, dtype=float)
+  return row_iterations >= np.max(row_iterations)
+
+# This function returns the measured and warmup iterations of the next round, the warmup shrinks with the
+# iterations in the ratio of the OSU defaults
+def round_iterations(iterations, default_iterations, default_warmup):
+  iterations = min(iterations, default_iterations)
+  return iterations, max(1, default_warmup * iterations // default_iterations)
@@ -0,0 +1,67 @@
+# This file creates the surrogate model the active learner fits to the benchmark data
+#
+# Every surrogate exposes fit(X, y, sample_weight=None), predict(X) and a per-candidate uncertainty, which
+# jackknife_variances() computes for any surrogate (see jackknife.py):
+#
+# surrogate = random_forest: a random forest, the uncertainty is the variance between its trees (the default)
+# surrogate = extra_trees: extremely randomized trees, cheaper to fit than a random forest, the uncertainty
+#   is the variance between its trees
+# surrogate = quantile_gbm: gradient-boosted trees fit to the median and to a lower and an upper quantile of
+#   the latency, the uncertainty is derived from the width of the quantile interval
+#
+# Forest surrogates support training_mode = incremental, the quantile model is always refit on all data.
+
+import numpy as np
+from statistics import NormalDist
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, HistGradientBoostingRegressor # type: ignore
+from src.user_config.config_manager import ConfigManager
+
+SURROGATES = ['random_forest', 'extra_trees', 'quantile_gbm']
+
+# Quantiles fit by the quantile model, the interval between them covers 80% of the predicted latency
+QUANTILE_LOW = 0.1
+QUANTILE_HIGH = 0.9
+
+# This function returns the surrogate model used by the active learner
+def get_surrogate():
+  surrogate = ConfigManager.get_instance().get_value('settings', 'surrogate', 'random_forest')
+  if surrogate not in SURROGATES:
+    raise ValueError(f"Unknown surrogate '{surrogate}', expected one of {SURROGATES}")
+  return surrogate
+
+# This function returns whether a model is an ensemble of averaged trees, which supports incremental training
+# and the jackknife variance estimators
+def is_forest(model):
+  return isinstance(model, (RandomForestRegressor, ExtraTreesRegressor))
+
+class QuantileBoostingSurrogate:
+  def __init__(self, quantile_low=QUANTILE_LOW, quantile_high=QUANTILE_HIGH):
+    self.quantile_low = quantile_low
+    self.quantile_high = quantile_high
+    self.models = {quantile: HistGradientBoostingRegressor(loss='quantile', quantile=quantile)
+                   for quantile in [quantile_low, 0.5, quantile_high]}
+
+  def fit(self, X, y, sample_weight=None):
+    for model in self.models.values():
+      model.fit(X, y, sample_weight=sample_weight)
+    return self
+
+  # Predicts the median
+  def predict(self, X):
+    return self.models[0.5].predict(X)
+
+  # Returns the variance of a normal distribution with the same quantile interval and the median of every row
+  def predict_uncertainty(self, X):
+    width = self.models[self.quantile_high].predict(X) - self.models[self.quantile_low].predict(X)
+    z_width = NormalDist().inv_cdf(self.quantile_high) - NormalDist().inv_cdf(self.quantile_low)
+    return np.square(np.maximum(width, 0) / z_width), self.predict(X)
+
+# This function creates an unfitted surrogate model
+def create_surrogate(surrogate=None, n_estimators=100, warm_start=False, workers=1):
+  if surrogate is None:
+    surrogate = get_surrogate()
+  if surrogate == 'extra_trees':
+    return ExtraTreesRegressor(n_estimators=n_estimators, warm_start=warm_start, n_jobs=workers)
+  if surrogate == 'quantile_gbm':
+    return QuantileBoostingSurrogate()
+  return RandomForestRegressor(n_estimators=n_estimators, warm_start=warm_start, n_jobs=workers)
@@ -3,6 +3,24 @@
 
 import numpy as np
 
+# Features are small integers (log2 exponents of n, ppn and msg_size, plus the algorithm index),
+# so candidates and training points are stored compactly and converted to float only by the model
+FEATURE_DTYPE = np.uint8
+
+# This function returns a feature array in the compact representation if all of its values are integers,
+# otherwise (e.g., prior data with fractional features) it is returned as float
+def compact_features(X):
+  X = np.asarray(X)
+  if np.issubdtype(X.dtype, np.integer) or (X.size > 0 and np.all(np.mod(X, 1) == 0) and np.all(X >= 0) and np.all(X < 256)):
+    return X.astype(FEATURE_DTYPE)
+  return X.astype(float)
+
+# This function packs the (n, ppn, msg_size) columns of each row into one integer key per point.
+# The features are log2 exponents, so each one fits in a byte.
+def pack_points(X):
+  X = np.atleast_2d(np.asarray(X))[:,:3].astype(np.int64)
+  return (X[:,0] << 16) | (X[:,1] << 8) | X[:,2]
+
 def preprocess_features(n, ppn, msg_size, type="log"):
   if(type=="log"):
     new_n = np.log2(n) + 1
@@ -5,6 +5,9 @@ import sys
 import json
 
 from src.active_learner.active_learner import train_model
+from src.active_learner.checkpoint import resume_requested
+from src.active_learner.prior import prior_requested
+from src.active_learner.multi_collective import train_models, concurrent_requested
 from src.json_file.json_file import read_generic_json_file, update_collective
 
 def main():
@@ -15,9 +18,16 @@ def main():
   collectives = ['allgather','allreduce','alltoall','bcast','reduce','reduce_scatter']
   json_file_data = read_generic_json_file()
 
-  for collective in collectives:
-    feature_space, rf = train_model(n, ppn, msg_size, collective)
-    json_file_data = update_collective(json_file_data, collective, ppn, feature_space, rf)
+  # With the async pipeline, all collectives are tuned at the same time and share the allocation
+  if concurrent_requested():
+    models = train_models(n, ppn, msg_size, collectives, resume=resume_requested(), prior_file=prior_requested())
+    for collective in collectives:
+      feature_space, rf = models[collective]
+      json_file_data = update_collective(json_file_data, collective, ppn, feature_space, rf)
+  else:
+    for collective in collectives:
+      feature_space, rf = train_model(n, ppn, msg_size, collective, resume=resume_requested(), prior_file=prior_requested())
+      json_file_data = update_collective(json_file_data, collective, ppn, feature_space, rf)
 
   with open(save_file, 'w+') as f:
     json.dump(json_file_data, f, indent=2)
@@ -4,6 +4,8 @@ import sys
 import json
 
 from src.active_learner.active_learner import train_model
+from src.active_learner.checkpoint import resume_requested
+from src.active_learner.prior import prior_requested
 from src.json_file.json_file import read_generic_json_file, update_collective
 from src.user_config.config_manager import ConfigManager
 
@@ -26,7 +28,7 @@ def main():
       config_name = None
 
   json_file_data = read_generic_json_file()
-  feature_space, rf = train_model(n, ppn, msg_size, collective)
+  feature_space, rf = train_model(n, ppn, msg_size, collective, resume=resume_requested(), prior_file=prior_requested())
   json_file_data = update_collective(json_file_data, collective, ppn, feature_space, rf)
 
   with open(save_file, 'w+') as f:
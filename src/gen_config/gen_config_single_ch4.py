@@ -4,6 +4,8 @@ import sys
 import json
 
 from src.active_learner.active_learner import train_model
+from src.active_learner.checkpoint import resume_requested
+from src.active_learner.prior import prior_requested
 from src.json_file.json_file import read_generic_json_file, read_generic_json_file_ch4, update_collective
 from src.user_config.config_manager import ConfigManager
 
@@ -27,7 +29,7 @@ def main():
 
   collective_ch4 = collective + "_ch4"
   json_file_data_ch4 = read_generic_json_file_ch4()
-  feature_space_ch4, rf_ch4 = train_model(n, ppn, msg_size, collective_ch4)
+  feature_space_ch4, rf_ch4 = train_model(n, ppn, msg_size, collective_ch4, resume=resume_requested(), prior_file=prior_requested())
   json_file_data_ch4 = update_collective(json_file_data_ch4, collective_ch4, ppn, feature_space_ch4, rf_ch4)
 
   with open(save_file, 'w+') as f:
@@ -2,8 +2,11 @@
 
 import sys
 import json
+import pickle
 
 from src.active_learner.active_learner import train_model
+from src.active_learner.checkpoint import resume_requested
+from src.active_learner.prior import prior_requested
 from src.json_file.json_file import read_generic_json_file, update_collective
 from src.user_config.config_manager import ConfigManager
 
@@ -25,7 +28,11 @@ def main():
   else:
       config_name = None
 
-  train_model(n, ppn, msg_size, collective, dump_data=True, data_file=data_file)
+  feature_space, rf = train_model(n, ppn, msg_size, collective, dump_data=True, data_file=data_file, resume=resume_requested(), prior_file=prior_requested())
+
+  #save the model next to the data so it can warm start related tuning runs
+  with open(data_file + '.pkl', 'wb') as f:
+    pickle.dump(rf, f)
 
   
 if __name__ == '__main__':
@@ -4,7 +4,7 @@ import sys
 import json
 import numpy as np
 import math
-from src.active_learner.algs import read_algs, add_algs
+from src.active_learner.algs import read_algs, add_algs, add_algs_chunks
 from src.user_config.config_manager import ConfigManager
 from src.json_file.param_algs_to_json import split_param_alg, get_param_rules
 from collections import OrderedDict
@@ -95,7 +95,7 @@ def get_rules(feature_space, selections, algs, rf):
       
       # If the n and ppn are the same, test the midpoint and make rules
       if (n_prev == n_cur and ppn_prev == ppn_cur):
-        msg_size = np.log2((2**(msg_size_cur - 1) + 2 ** (msg_size_cur - 1))/2) + 1
+        msg_size = np.log2((2.0**(msg_size_cur - 1) + 2.0 ** (msg_size_cur - 1))/2) + 1
         X_test = add_algs(np.array([n_cur, ppn_cur, msg_size]), algs)
         y_test = rf.predict(X_test)
         fastest_alg = np.argmin(y_test)
@@ -262,7 +262,7 @@ def update_collective(json_file_data, collective, ppn, feature_space, rf, algs=N
     algs = read_algs(collective)
 
   # Unnormalize data
-  y_test = rf.predict(add_algs(feature_space, algs))
+  y_test = np.concatenate([rf.predict(X_chunk) for X_chunk in add_algs_chunks(feature_space, algs)])
   selections = get_selections(y_test, algs)
 
   # Get rules/break points
@@ -10,6 +10,8 @@
 # $7 = number of ppn
 # $8 = message size
 # $9 (optional) = nodefile
+# $10, $11 (optional) = number of measured and warmup iterations, the OSU defaults if not given
+# $12 (optional) = largest message size, all message sizes from $8 to $12 are measured in one launch
 
 split_string() {
     local input="$1"
@@ -43,12 +45,25 @@ else
   nodefile=""
 fi
 
+osu_iterations=""
+if [ ! -z "${10}" ]; then
+  osu_iterations="-i ${10}"
+fi
+if [ ! -z "${11}" ]; then
+  osu_iterations="$osu_iterations -x ${11}"
+fi
+
 let msg_size_plus=$msg_size+1
 
 if [[ $msg_size == 1 ]] ; then
   let msg_size_plus-=1
 fi
 
+msg_range="$msg_size:$msg_size_plus"
+if [ ! -z "${12}" ]; then
+  msg_range="$msg_size:${12}"
+fi
+
 processes=$(($n*$ppn))
 
 if [[ $processes -lt 2 ]] ; then
@@ -83,9 +98,9 @@ fi
 # echo ${launcher_path} -f $nodefile -n $processes -ppn $ppn -genv LD_LIBRARY_PATH=${mpich_path}/lib:$LD_LIBRARY_PATH ${osu_path}/${test_name} -m "$msg_size":"$msg_size_plus"
 
 if [ -z "$nodefile" ]; then
-    ${launcher_path} -n $processes -ppn $ppn -genv MPIR_CVAR_DEVICE_COLLECTIVES=all -genv LD_LIBRARY_PATH=${mpich_path}/lib:$LD_LIBRARY_PATH ${osu_path}/../../../../../c/get_local_rank ${osu_path}/${test_name} -d sycl -m "$msg_size":"$msg_size_plus"
+    ${launcher_path} -n $processes -ppn $ppn -genv MPIR_CVAR_DEVICE_COLLECTIVES=all -genv LD_LIBRARY_PATH=${mpich_path}/lib:$LD_LIBRARY_PATH ${osu_path}/../../../../../c/get_local_rank ${osu_path}/${test_name} -d sycl -m "$msg_range" $osu_iterations
 
 else
-    ${launcher_path} --hostfile $nodefile -n $processes -ppn $ppn -genv MPIR_CVAR_DEVICE_COLLECTIVES=all -genv LD_LIBRARY_PATH=${mpich_path}/lib:$LD_LIBRARY_PATH ${osu_path}/../../../../../c/get_local_rank ${osu_path}/${test_name} -d sycl -m "$msg_size":"$msg_size_plus"
+    ${launcher_path} --hostfile $nodefile -n $processes -ppn $ppn -genv MPIR_CVAR_DEVICE_COLLECTIVES=all -genv LD_LIBRARY_PATH=${mpich_path}/lib:$LD_LIBRARY_PATH ${osu_path}/../../../../../c/get_local_rank ${osu_path}/${test_name} -d sycl -m "$msg_range" $osu_iterations
 
 fi
\ No newline at end of file
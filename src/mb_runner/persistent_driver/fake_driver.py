@@ -0,0 +1,39 @@
+# This file is a stand-in for the persistent benchmark driver that needs no MPI (benchmark_driver = fake)
+#
+# It speaks the protocol of persistent_driver.c (see persistent_driver.py in src/active_learner) and reports
+# synthetic latencies: a startup term that grows with the number of processes and a bandwidth term, both scaled
+# per (collective, algorithm, k-value) so that different algorithms win at different message sizes.
+#
+#   Arguments:
+#   $1 = Number of nodes
+#   $2 = Number of processes per node
+
+import sys
+import math
+import zlib
+
+# This function returns the synthetic latency of a benchmark in microseconds
+def synthetic_latency(collective, alg, kval, processes, msg_size):
+  seed = zlib.crc32(f"{collective} {alg} {kval}".encode())
+  startup = 1.0 + (seed % 100) / 50.0
+  us_per_kib = 0.5 + (seed // 100 % 100) / 100.0
+  return startup * math.log2(processes + 1) + us_per_kib * msg_size / 1024.0
+
+def main():
+  processes = int(sys.argv[1]) * int(sys.argv[2])
+  print("READY", processes, flush=True)
+  for line in sys.stdin:
+    parts = line.split()
+    if len(parts) > 0 and parts[0] == "quit":
+      break
+    if len(parts) != 7 or not parts[4].isdigit():
+      print("ERROR malformed command", flush=True)
+    elif processes < 2:
+      print("ERROR", parts[0], "needs at least 2 processes", flush=True)
+    elif parts[1] == "smp":
+      print("ERROR cannot select", parts[0], parts[1], flush=True)
+    else:
+      print(parts[4], f"{synthetic_latency(parts[0], parts[1], parts[3], processes, int(parts[4])):.2f}", flush=True)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,284 @@
+/*
+ * Persistent benchmark driver
+ *
+ * Launched once per (n, ppn, nodefile) by src/active_learner/persistent_driver.py and kept running. Rank 0 reads
+ * one benchmark per line from stdin:
+ *   <collective> <algorithm> <k-value control variable or -> <k-value> <message size> <iterations> <warmup>
+ * Every rank sets MPIR_CVAR_<COLLECTIVE>_INTRA_ALGORITHM (and the k-value control variable) through MPI_T, then
+ * runs a timed loop of the collective like the OSU microbenchmarks. Rank 0 writes
+ * "<message size> <average latency in us>" (or "ERROR <reason>") to stdout. 0 iterations or warmup select the OSU
+ * defaults. "quit" or the end of stdin stops the driver.
+ *
+ * Before it prints "READY <processes>", every rank checks that the algorithm control variable of each supported
+ * collective exists and is an enum. Otherwise rank 0 prints "ERROR missing control variable <name>" and the driver
+ * exits, since no algorithm could be selected. An algorithm that is not an item of the enum is reported as
+ * "ERROR cannot select <collective> <algorithm>".
+ *
+ * Build with: make MPICC=/path/to/mpich/bin/mpicc
+ */
+
+#include <mpi.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <ctype.h>
+
+#define MAX_LINE 1024
+#define MAX_NAME 256
+
+/* OSU defaults for the number of measured and warmup iterations, which drop above a message size threshold */
+#define OSU_ITERATIONS 1000
+#define OSU_ITERATIONS_LARGE 100
+#define OSU_WARMUP 200
+#define OSU_WARMUP_LARGE 10
+#define OSU_LARGE_MESSAGE_SIZE 8192
+
+/* Collectives the driver runs (see run_collective) */
+static const char *COLLECTIVES[] = {"allreduce", "reduce", "bcast", "allgather", "alltoall", "reduce_scatter"};
+#define NUM_COLLECTIVES (sizeof(COLLECTIVES) / sizeof(COLLECTIVES[0]))
+
+struct command {
+  int quit;
+  int valid;
+  char collective[MAX_NAME];
+  char algorithm[MAX_NAME];
+  char kval_cvar[MAX_NAME];
+  char kval[MAX_NAME];
+  long msg_size;
+  int iterations;
+  int warmup;
+};
+
+/* Reads the next command on rank 0, a malformed line is returned as invalid */
+static void read_command(struct command *cmd) {
+  char line[MAX_LINE];
+  memset(cmd, 0, sizeof(*cmd));
+  if (fgets(line, sizeof(line), stdin) == NULL || strncmp(line, "quit", 4) == 0) {
+    cmd->quit = 1;
+    return;
+  }
+  cmd->valid = sscanf(line, "%255s %255s %255s %255s %ld %d %d", cmd->collective, cmd->algorithm, cmd->kval_cvar,
+                      cmd->kval, &cmd->msg_size, &cmd->iterations, &cmd->warmup) == 7 && cmd->msg_size > 0;
+}
+
+/* Looks up the value of an enum item by its name, returns 1 if it exists */
+static int enum_value(MPI_T_enum enumtype, const char *name, int *value) {
+  int num_items, name_len = MAX_NAME;
+  char enum_name[MAX_NAME];
+  if (MPI_T_enum_get_info(enumtype, &num_items, enum_name, &name_len) != MPI_SUCCESS)
+    return 0;
+  for (int i = 0; i < num_items; i++) {
+    char item_name[MAX_NAME];
+    int item_len = MAX_NAME;
+    if (MPI_T_enum_get_item(enumtype, i, value, item_name, &item_len) == MPI_SUCCESS && strcmp(item_name, name) == 0)
+      return 1;
+  }
+  return 0;
+}
+
+/* Writes a control variable by name, enum values are given by the name of their item. Returns 0 on success. */
+static int write_cvar(const char *name, const char *value) {
+  int index, count, verbosity, bind, scope, int_value, err;
+  int name_len = MAX_NAME, desc_len = 0;
+  char cvar_name[MAX_NAME];
+  char *end;
+  MPI_Datatype datatype;
+  MPI_T_enum enumtype;
+  MPI_T_cvar_handle handle;
+
+  if (MPI_T_cvar_get_index(name, &index) != MPI_SUCCESS)
+    return 1;
+  if (MPI_T_cvar_get_info(index, cvar_name, &name_len, &verbosity, &datatype, &enumtype, NULL, &desc_len, &bind,
+                          &scope) != MPI_SUCCESS)
+    return 1;
+  if (enumtype != MPI_T_ENUM_NULL) {
+    if (!enum_value(enumtype, value, &int_value))
+      return 1;
+  } else if (datatype == MPI_INT) {
+    int_value = (int) strtol(value, &end, 10);
+    if (*value == '\0' || *end != '\0')
+      return 1;
+  } else if (datatype != MPI_CHAR) {
+    return 1;
+  }
+
+  if (MPI_T_cvar_handle_alloc(index, NULL, &handle, &count) != MPI_SUCCESS)
+    return 1;
+  if (enumtype == MPI_T_ENUM_NULL && datatype == MPI_CHAR)
+    err = MPI_T_cvar_write(handle, value);
+  else
+    err = MPI_T_cvar_write(handle, &int_value);
+  MPI_T_cvar_handle_free(&handle);
+  return err != MPI_SUCCESS;
+}
+
+/* Writes the name of the algorithm control variable of a collective to name */
+static void algorithm_cvar(const char *collective, char *name, size_t size) {
+  snprintf(name, size, "MPIR_CVAR_%s_INTRA_ALGORITHM", collective);
+  for (char *c = name; *c; c++)
+    *c = toupper(*c);
+}
+
+/* Returns 0 if a control variable exists and its values are the items of an enum */
+static int check_enum_cvar(const char *name) {
+  int index, verbosity, bind, scope;
+  int name_len = MAX_NAME, desc_len = 0;
+  char cvar_name[MAX_NAME];
+  MPI_Datatype datatype;
+  MPI_T_enum enumtype;
+
+  if (MPI_T_cvar_get_index(name, &index) != MPI_SUCCESS)
+    return 1;
+  if (MPI_T_cvar_get_info(index, cvar_name, &name_len, &verbosity, &datatype, &enumtype, NULL, &desc_len, &bind,
+                          &scope) != MPI_SUCCESS)
+    return 1;
+  return enumtype == MPI_T_ENUM_NULL;
+}
+
+/* Selects the algorithm of a command, returns 0 on success */
+static int select_algorithm(const struct command *cmd) {
+  char name[2 * MAX_NAME];
+  algorithm_cvar(cmd->collective, name, sizeof(name));
+  if (write_cvar(name, cmd->algorithm))
+    return 1;
+  if (strcmp(cmd->kval_cvar, "-") != 0 && write_cvar(cmd->kval_cvar, cmd->kval))
+    return 1;
+  return 0;
+}
+
+/* Runs one call of a collective on buffers of at least (msg_size + sizeof(float)) * nprocs bytes */
+static int run_collective(const char *collective, void *sendbuf, void *recvbuf, int *recvcounts, long msg_size,
+                          int nprocs) {
+  int count = msg_size / sizeof(float) > 0 ? msg_size / sizeof(float) : 1;
+  if (strcmp(collective, "allreduce") == 0)
+    return MPI_Allreduce(sendbuf, recvbuf, count, MPI_FLOAT, MPI_SUM, MPI_COMM_WORLD);
+  if (strcmp(collective, "reduce") == 0)
+    return MPI_Reduce(sendbuf, recvbuf, count, MPI_FLOAT, MPI_SUM, 0, MPI_COMM_WORLD);
+  if (strcmp(collective, "bcast") == 0)
+    return MPI_Bcast(sendbuf, msg_size, MPI_CHAR, 0, MPI_COMM_WORLD);
+  if (strcmp(collective, "allgather") == 0)
+    return MPI_Allgather(sendbuf, msg_size, MPI_CHAR, recvbuf, msg_size, MPI_CHAR, MPI_COMM_WORLD);
+  if (strcmp(collective, "alltoall") == 0)
+    return MPI_Alltoall(sendbuf, msg_size, MPI_CHAR, recvbuf, msg_size, MPI_CHAR, MPI_COMM_WORLD);
+  if (strcmp(collective, "reduce_scatter") == 0) {
+    for (int i = 0; i < nprocs; i++)
+      recvcounts[i] = count / nprocs > 0 ? count / nprocs : 1;
+    return MPI_Reduce_scatter(sendbuf, recvbuf, recvcounts, MPI_FLOAT, MPI_SUM, MPI_COMM_WORLD);
+  }
+  return MPI_ERR_OTHER;
+}
+
+int main(int argc, char **argv) {
+  int rank, nprocs, provided, failed, any_failed;
+  size_t buffer_size = 0;
+  char *sendbuf = NULL, *recvbuf = NULL;
+  int *recvcounts;
+  struct command cmd;
+
+  MPI_Init(&argc, &argv);
+  MPI_T_init_thread(MPI_THREAD_SINGLE, &provided);
+  MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+  MPI_Comm_size(MPI_COMM_WORLD, &nprocs);
+  MPI_Comm_set_errhandler(MPI_COMM_WORLD, MPI_ERRORS_RETURN);
+  recvcounts = malloc(nprocs * sizeof(int));
+
+  /* The first algorithm control variable that is missing on any rank, or NUM_COLLECTIVES if all of them exist */
+  int missing = NUM_COLLECTIVES, first_missing;
+  for (size_t i = 0; i < NUM_COLLECTIVES && missing == NUM_COLLECTIVES; i++) {
+    char name[2 * MAX_NAME];
+    algorithm_cvar(COLLECTIVES[i], name, sizeof(name));
+    if (check_enum_cvar(name))
+      missing = i;
+  }
+  MPI_Allreduce(&missing, &first_missing, 1, MPI_INT, MPI_MIN, MPI_COMM_WORLD);
+  if (rank == 0) {
+    if (first_missing < (int) NUM_COLLECTIVES) {
+      char name[2 * MAX_NAME];
+      algorithm_cvar(COLLECTIVES[first_missing], name, sizeof(name));
+      printf("ERROR missing control variable %s\n", name);
+    } else {
+      printf("READY %d\n", nprocs);
+    }
+    fflush(stdout);
+  }
+  if (first_missing < (int) NUM_COLLECTIVES) {
+    free(recvcounts);
+    MPI_T_finalize();
+    MPI_Finalize();
+    return 1;
+  }
+
+  while (1) {
+    if (rank == 0)
+      read_command(&cmd);
+    MPI_Bcast(&cmd, sizeof(cmd), MPI_BYTE, 0, MPI_COMM_WORLD);
+    if (cmd.quit)
+      break;
+    if (!cmd.valid) {
+      if (rank == 0) {
+        printf("ERROR malformed command\n");
+        fflush(stdout);
+      }
+      continue;
+    }
+
+    /* OSU does not run with a single process (see generic_runner.sh) */
+    if (nprocs < 2) {
+      if (rank == 0) {
+        printf("ERROR %s needs at least 2 processes\n", cmd.collective);
+        fflush(stdout);
+      }
+      continue;
+    }
+    failed = select_algorithm(&cmd);
+    MPI_Allreduce(&failed, &any_failed, 1, MPI_INT, MPI_MAX, MPI_COMM_WORLD);
+    if (any_failed) {
+      if (rank == 0) {
+        printf("ERROR cannot select %s %s\n", cmd.collective, cmd.algorithm);
+        fflush(stdout);
+      }
+      continue;
+    }
+
+    size_t needed = (cmd.msg_size + sizeof(float)) * nprocs;
+    if (needed > buffer_size) {
+      free(sendbuf);
+      free(recvbuf);
+      buffer_size = needed;
+      sendbuf = calloc(buffer_size, 1);
+      recvbuf = calloc(buffer_size, 1);
+    }
+    int large = cmd.msg_size > OSU_LARGE_MESSAGE_SIZE;
+    int iterations = cmd.iterations > 0 ? cmd.iterations : (large ? OSU_ITERATIONS_LARGE : OSU_ITERATIONS);
+    int warmup = cmd.warmup > 0 ? cmd.warmup : (large ? OSU_WARMUP_LARGE : OSU_WARMUP);
+
+    /* Timed loop as in the OSU microbenchmarks, the latency is averaged over the ranks */
+    double timer = 0.0, latency, total_latency;
+    failed = 0;
+    MPI_Barrier(MPI_COMM_WORLD);
+    for (int i = 0; i < warmup + iterations; i++) {
+      double start = MPI_Wtime();
+      failed |= run_collective(cmd.collective, sendbuf, recvbuf, recvcounts, cmd.msg_size, nprocs) != MPI_SUCCESS;
+      if (i >= warmup)
+        timer += MPI_Wtime() - start;
+      MPI_Barrier(MPI_COMM_WORLD);
+    }
+    latency = timer * 1e6 / iterations;
+    MPI_Reduce(&latency, &total_latency, 1, MPI_DOUBLE, MPI_SUM, 0, MPI_COMM_WORLD);
+    MPI_Allreduce(&failed, &any_failed, 1, MPI_INT, MPI_MAX, MPI_COMM_WORLD);
+    if (rank == 0) {
+      if (any_failed)
+        printf("ERROR %s %s failed\n", cmd.collective, cmd.algorithm);
+      else
+        printf("%ld %.2f\n", cmd.msg_size, total_latency / nprocs);
+      fflush(stdout);
+    }
+  }
+
+  free(sendbuf);
+  free(recvbuf);
+  free(recvcounts);
+  MPI_T_finalize();
+  MPI_Finalize();
+  return 0;
+}
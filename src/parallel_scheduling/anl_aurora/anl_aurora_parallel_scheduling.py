@@ -104,6 +104,12 @@ class DragonflyGroup:
         for chassis in self.chassis:
             chassis.reset_fit()
 
+    # Sets whether the chassis containing the given nodes are assigned to a microbenchmark
+    def set_full(self, nodes, full):
+        for chassis in self.chassis:
+            if any(node in chassis.nodes for node in nodes):
+                chassis.full = full
+
         
 # This class defines the topology data structure for ANL Polaris
 class Topology(ITopology):
@@ -138,6 +144,26 @@ class Topology(ITopology):
         for group in self.dragonfly_groups:
             group.reset_fit()
 
+    # Frees the chassis of one finished fit, the chassis of a fit are not shared with other fits
+    def release_nodes(self, nodes):
+        for group in self.dragonfly_groups:
+            group.set_full(nodes, False)
+
+    # Marks the chassis of one fit as in use again
+    def reserve_nodes(self, nodes):
+        for group in self.dragonfly_groups:
+            group.set_full(nodes, True)
+
+    # Returns the number of microbenchmarks that can run concurrently,
+    # each fit occupies at least one chassis
+    def get_capacity(self):
+        capacity = 0
+        for group in self.dragonfly_groups:
+            for chassis in group.chassis:
+                if chassis.num_nodes() > 0:
+                    capacity += 1
+        return capacity
+
     # Generates the topology file for the current job/allocation
     # and returns a path to the file
     @staticmethod
@@ -101,6 +101,12 @@ class DragonflyGroup:
         for rack in self.racks:
             rack.reset_fit()
 
+    # Sets whether the racks containing the given nodes are assigned to a microbenchmark
+    def set_full(self, nodes, full):
+        for rack in self.racks:
+            if any(node in rack.nodes for node in nodes):
+                rack.full = full
+
         
 # This class defines the topology data structure for ANL Polaris
 class Topology(ITopology):
@@ -135,6 +141,26 @@ class Topology(ITopology):
         for group in self.dragonfly_groups:
             group.reset_fit()
 
+    # Frees the racks of one finished fit, the racks of a fit are not shared with other fits
+    def release_nodes(self, nodes):
+        for group in self.dragonfly_groups:
+            group.set_full(nodes, False)
+
+    # Marks the racks of one fit as in use again
+    def reserve_nodes(self, nodes):
+        for group in self.dragonfly_groups:
+            group.set_full(nodes, True)
+
+    # Returns the number of microbenchmarks that can run concurrently,
+    # each fit occupies at least one rack
+    def get_capacity(self):
+        capacity = 0
+        for group in self.dragonfly_groups:
+            for rack in group.racks:
+                if rack.num_nodes() > 0:
+                    capacity += 1
+        return capacity
+
     # Generates the topology file for the current job/allocation
     # and returns a path to the file
     @staticmethod
@@ -2,6 +2,8 @@
 # The local scheduler allows for INFINITE PARALLEL SCHEDULING
 # This implementation is provided FOR TESTING PURPOSES ONLY
 
+import os
+
 from src.parallel_scheduling.topology import ITopology
 
 class Topology(ITopology):
@@ -14,6 +16,19 @@ class Topology(ITopology):
     def reset_fit(self):
         return
 
+    # Frees the nodes of one finished fit
+    def release_nodes(self, nodes):
+        return
+
+    # Marks the nodes of one fit as in use again
+    def reserve_nodes(self, nodes):
+        return
+
+    # Returns the number of microbenchmarks that can run concurrently,
+    # the local scheduler has no limit so use the number of local cores
+    def get_capacity(self):
+        return os.cpu_count()
+
     # Generates the topology file for the current job/allocation
     # and returns a path to the file
     @staticmethod
@@ -19,6 +19,18 @@ class Topology(ITopology):
     def reset_fit(self):
         self.fit = False
 
+    # Frees the node of one finished fit
+    def release_nodes(self, nodes):
+        self.fit = False
+
+    # Marks the node of one fit as in use again
+    def reserve_nodes(self, nodes):
+        self.fit = True
+
+    # Returns the number of microbenchmarks that can run concurrently
+    def get_capacity(self):
+        return 1
+
     # Generates the topology file for the current job/allocation
     # and returns a path to the file
     @staticmethod
@@ -11,6 +11,21 @@ class ITopology(ABC):
         """ Empties topology from previous fit attempts. """
         pass
 
+    @abstractmethod
+    def release_nodes(self, nodes):
+        """ Frees the nodes of one finished fit so other points can be fit on them. """
+        pass
+
+    @abstractmethod
+    def reserve_nodes(self, nodes):
+        """ Marks the nodes of one fit as in use again (e.g., after reset_fit). """
+        pass
+
+    @abstractmethod
+    def get_capacity(self):
+        """ Returns the number of single-node microbenchmarks that can run concurrently. """
+        pass
+
     @staticmethod
     @abstractmethod
     def gen_topology_file(self, n):
@@ -0,0 +1,96 @@
+# This file benchmarks building the feature space and expanding it with algorithms against the previous
+# loop-based implementations
+#
+#   Arguments:
+#   $1 = (optional) maximum number of nodes, default 8192
+#   $2 = (optional) maximum ppn, default 128
+#   $3 = (optional) maximum message size, default 268435456
+#   $4 = (optional) number of repetitions, default 20
+
+import sys
+import time
+import numpy as np
+
+from src.active_learner.utils import preprocess_features
+from src.active_learner.initialization import create_feature_space
+from src.active_learner.algs import add_algs, add_algs_chunks, get_all_algs
+
+# Number of algorithms to expand the feature space with (allreduce in all_algs_param.csv)
+NUM_ALGS = 12
+
+# The loop-based feature space construction this benchmark compares against
+def loop_create_feature_space(n, ppn, msg_size, collective):
+  shape_x = n*ppn*msg_size - msg_size
+  if "reduce" in collective:
+    shape_x -= n*ppn*2
+    shape_x += 2
+  to_return = np.zeros(shape=(shape_x,3))
+  i = 0
+  for cur_n in range(n):
+    for cur_ppn in range(ppn):
+      if(cur_n == 0 and cur_ppn == 0):
+        continue
+      for cur_msg_size in range(msg_size):
+        if "reduce" in collective and cur_msg_size < 2:
+          continue
+        to_return[i] = [cur_n + 1, cur_ppn + 1, cur_msg_size + 1]
+        i+=1
+  return to_return
+
+# The loop-based algorithm expansion this benchmark compares against
+def loop_add_algs(feature_space, algs):
+  num_algs = len(list(algs.keys()))
+  alg_space = np.zeros((feature_space.shape[0]*num_algs, feature_space.shape[1]+1))
+  for i in range(feature_space.shape[0]):
+    for j in range(num_algs):
+      index = i*num_algs + j
+      alg_space[index,:-1] = feature_space[i,:]
+      alg_space[index,-1] = j
+  return alg_space
+
+# The loop-based expansion of a single point this benchmark compares against
+def loop_get_all_algs(x, algs):
+  new_points_x = np.zeros((len(list(algs.keys())), x.shape[0]))
+  i = 0
+  for key in algs.keys():
+    new_points_x[i,:-1] = x[:-1]
+    new_points_x[i,-1] = key
+    i+=1
+  return new_points_x
+
+# This function returns the average time of a function call over a number of repetitions and the last result
+def timed(repetitions, fn, *args):
+  start_time = time.time()
+  for _ in range(repetitions):
+    result = fn(*args)
+  return result, (time.time() - start_time) / repetitions
+
+def main():
+  n = int(sys.argv[1]) if len(sys.argv) > 1 else 8192
+  ppn = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+  msg_size = int(sys.argv[3]) if len(sys.argv) > 3 else 268435456
+  repetitions = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+
+  new_n, new_ppn, new_msg_size = preprocess_features(n, ppn, msg_size)
+  algs = dict(zip(range(NUM_ALGS), [f"alg{i}" for i in range(NUM_ALGS)]))
+  feature_space = create_feature_space(new_n, new_ppn, new_msg_size, "allreduce")
+  points = add_algs(feature_space, algs)
+
+  cases = [
+    ("create_feature_space", loop_create_feature_space, create_feature_space, (new_n, new_ppn, new_msg_size, "allreduce")),
+    ("add_algs", loop_add_algs, add_algs, (feature_space, algs)),
+    ("add_algs_chunks", loop_add_algs, lambda X, algs: np.vstack(list(add_algs_chunks(X, algs))), (feature_space, algs)),
+    ("get_all_algs (all points)", lambda X, algs: [loop_get_all_algs(x, algs) for x in X],
+                                  lambda X, algs: [get_all_algs(x, algs) for x in X], (points[::NUM_ALGS], algs)),
+  ]
+
+  print(f"Feature space: {feature_space.shape[0]} points, {points.shape[0]} rows with {NUM_ALGS} algorithms")
+  print(f"{'function':>26} {'loop (ms)':>10} {'vectorized (ms)':>16} {'speedup':>8}")
+  for name, loop_fn, vectorized_fn, args in cases:
+    loop_result, loop_time = timed(repetitions, loop_fn, *args)
+    vectorized_result, vectorized_time = timed(repetitions, vectorized_fn, *args)
+    assert np.array_equal(np.asarray(loop_result), np.asarray(vectorized_result))
+    print(f"{name:>26} {loop_time*1000:>10.3f} {vectorized_time*1000:>16.3f} {loop_time/vectorized_time:>8.1f}")
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,61 @@
+# This file benchmarks model fitting and jackknife variance computation with different numbers of model workers
+#
+#   Arguments:
+#   $1 = (optional) maximum number of nodes, default 8192
+#   $2 = (optional) maximum ppn, default 128
+#   $3 = (optional) maximum message size, default 268435456
+#   $4 = (optional) comma-separated list of worker counts, default 1 and all cores
+
+import os
+import sys
+import time
+import numpy as np
+
+from src.active_learner.utils import preprocess_features
+from src.active_learner.initialization import create_feature_space
+from src.active_learner.algs import add_algs
+from src.active_learner.model_training import fit_full
+from src.active_learner.jackknife import jackknife_variances
+
+# Number of algorithms to expand the feature space with (allreduce in all_algs_param.csv)
+NUM_ALGS = 12
+# Number of training points the forest is fit to, a typical size at the end of a tuning run
+NUM_TRAINING_POINTS = 2000
+
+# This function times a function call and returns (result, seconds)
+def timed(fn, *args, **kwargs):
+  start_time = time.time()
+  result = fn(*args, **kwargs)
+  return result, time.time() - start_time
+
+def main():
+  n = int(sys.argv[1]) if len(sys.argv) > 1 else 8192
+  ppn = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+  msg_size = int(sys.argv[3]) if len(sys.argv) > 3 else 268435456
+  if len(sys.argv) > 4:
+    worker_counts = [int(workers) for workers in sys.argv[4].split(',')]
+  else:
+    worker_counts = sorted(set([1, os.cpu_count()]))
+
+  new_n, new_ppn, new_msg_size = preprocess_features(n, ppn, msg_size)
+  algs = dict(zip(range(NUM_ALGS), [f"alg{i}" for i in range(NUM_ALGS)]))
+  X = add_algs(create_feature_space(new_n, new_ppn, new_msg_size, "allreduce"), algs)
+
+  # Synthetic latencies: a latency term growing with the process count plus a bandwidth term per algorithm
+  rng = np.random.default_rng(0)
+  X_train = X[rng.choice(X.shape[0], size=min(NUM_TRAINING_POINTS, X.shape[0]), replace=False)]
+  y_train = np.log10(X_train[:,0] + X_train[:,1] + 2 ** X_train[:,2] / (X_train[:,3] + 1)) + rng.normal(scale=0.05, size=X_train.shape[0])
+
+  print(f"Feature space: {X.shape[0]} rows, training set: {X_train.shape[0]} rows, cores: {os.cpu_count()}")
+  print(f"{'workers':>8} {'fit (s)':>10} {'variances (s)':>14} {'total (s)':>10} {'speedup':>8}")
+  baseline = None
+  for workers in worker_counts:
+    rf, fit_time = timed(fit_full, X_train, y_train, workers=workers)
+    _, variance_time = timed(jackknife_variances, rf, X, workers=workers)
+    total = fit_time + variance_time
+    if baseline is None:
+      baseline = total
+    print(f"{workers:>8} {fit_time:>10.3f} {variance_time:>14.3f} {total:>10.3f} {baseline/total:>8.2f}")
+
+if __name__ == '__main__':
+  main()
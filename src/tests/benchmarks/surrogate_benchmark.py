@@ -0,0 +1,94 @@
+# This file compares the surrogate models offline by replaying active learning on recorded datasets
+#
+# A recorded dataset is a data file written by gen_data_single (preprocessed features + normalized latency).
+# Each surrogate starts from the same random points and selects further points by its uncertainty, the
+# "benchmark" of a point is looked up in the dataset. A surrogate reaches the target once the best algorithm
+# it predicts for the points of the dataset is as accurate as target_fraction times the accuracy of a
+# random forest fit to the whole dataset. For every surrogate, the number of benchmarked points and the
+# model wall time (fitting + uncertainty) needed to reach the target are reported.
+#
+#   Arguments:
+#   $1 = comma-separated list of data files
+#   $2 = (optional) target fraction of the full-data random forest accuracy, default 0.95
+#   $3 = (optional) comma-separated list of surrogates, default all
+#   $4 = (optional) number of points selected per iteration, default 4
+#   $5 = (optional) number of repetitions with different initial points, default 3
+
+import sys
+import time
+import numpy as np
+
+from src.active_learner.utils import pack_points
+from src.active_learner.surrogates import SURROGATES, create_surrogate
+from src.active_learner.jackknife import jackknife_variances
+from src.active_learner.point_selection import point_selection_batch
+from src.active_learner.measured_index import MeasuredIndex
+
+# Number of randomly selected points every replay starts from
+NUM_INITIAL_POINTS = 8
+
+# This function loads a recorded dataset, keeps the points with a row for every algorithm and returns
+# (X, y, num_algs) with the rows of each point next to each other, ordered by algorithm
+def load_dataset(data_file):
+  data = np.loadtxt(data_file, delimiter=',', ndmin=2)
+  X, y = data[:,:-1], data[:,-1]
+  num_algs = int(np.max(X[:,-1])) + 1
+  keys = pack_points(X)
+  _, point_ids, counts = np.unique(keys, return_inverse=True, return_counts=True)
+  complete = counts[point_ids.reshape(-1)] == num_algs
+  order = np.lexsort((X[complete,-1], keys[complete]))
+  return X[complete][order], y[complete][order], num_algs
+
+# This function returns the fraction of points whose best algorithm is predicted correctly
+def selection_accuracy(model, X, y, num_algs):
+  predicted = np.argmin(model.predict(X).reshape(-1, num_algs), axis=1)
+  return np.mean(predicted == np.argmin(y.reshape(-1, num_algs), axis=1))
+
+# This function replays active learning with a surrogate until it reaches the target accuracy.
+# Returns (benchmarked points, model seconds, accuracy), the points are None if the target was not reached.
+def replay(surrogate, X, y, num_algs, target, batch_size, seed):
+  num_points = X.shape[0] // num_algs
+  point_index = {key: i for i, key in enumerate(pack_points(X[::num_algs]))}
+  rng = np.random.default_rng(seed)
+  measured_points = list(rng.choice(num_points, size=min(NUM_INITIAL_POINTS, num_points), replace=False))
+  model_time = 0
+
+  while True:
+    rows = np.concatenate([np.arange(point * num_algs, (point + 1) * num_algs) for point in measured_points])
+    start_time = time.time()
+    model = create_surrogate(surrogate).fit(X[rows], y[rows])
+    variances = jackknife_variances(model, X, workers=1)
+    model_time += time.time() - start_time
+
+    accuracy = selection_accuracy(model, X, y, num_algs)
+    if accuracy >= target:
+      return len(measured_points), model_time, accuracy
+    if len(measured_points) == num_points:
+      return None, model_time, accuracy
+
+    new_points, _ = point_selection_batch(model, X[rows], X, batch_size, variances, MeasuredIndex(X[rows]))
+    measured_points += [point_index[key] for key in pack_points(np.atleast_2d(new_points))]
+
+def main():
+  data_files = sys.argv[1].split(',')
+  target_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.95
+  surrogates = sys.argv[3].split(',') if len(sys.argv) > 3 else SURROGATES
+  batch_size = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+  repetitions = int(sys.argv[5]) if len(sys.argv) > 5 else 3
+
+  for data_file in data_files:
+    X, y, num_algs = load_dataset(data_file)
+    reference = selection_accuracy(create_surrogate('random_forest').fit(X, y), X, y, num_algs)
+    target = target_fraction * reference
+    print(f"{data_file}: {X.shape[0] // num_algs} points, {num_algs} algorithms, target accuracy {target:.3f}")
+    print(f"{'surrogate':>14} {'reached':>8} {'points':>8} {'model (s)':>10} {'accuracy':>9}")
+    for surrogate in surrogates:
+      results = [replay(surrogate, X, y, num_algs, target, batch_size, seed) for seed in range(repetitions)]
+      reached = [result for result in results if result[0] is not None]
+      points = np.median([result[0] for result in reached]) if reached else float('nan')
+      model_time = np.median([result[1] for result in reached]) if reached else float('nan')
+      accuracy = np.mean([result[2] for result in results])
+      print(f"{surrogate:>14} {len(reached):>5}/{repetitions:<2} {points:>8.1f} {model_time:>10.2f} {accuracy:>9.3f}")
+
+if __name__ == '__main__':
+  main()
@@ -4,9 +4,19 @@ import unittest
 import sys
 import numpy as np
 import os
-from src.active_learner.algs import read_algs, add_algs, get_all_algs
+from src.active_learner.algs import read_algs, add_algs, add_algs_chunks, get_all_algs
 from src.user_config.config_manager import ConfigManager
 
+# Reference implementation that expands the feature space row by row
+def loop_add_algs(feature_space, algs):
+  num_algs = len(list(algs.keys()))
+  alg_space = np.zeros((feature_space.shape[0]*num_algs, feature_space.shape[1]+1))
+  for i in range(feature_space.shape[0]):
+    for j in range(num_algs):
+      alg_space[i*num_algs + j,:-1] = feature_space[i,:]
+      alg_space[i*num_algs + j,-1] = j
+  return alg_space
+
 class TestAlgs(unittest.TestCase):
   def test_read_algs(self):
     result = read_algs('scatter')
@@ -104,5 +114,32 @@ class TestAlgs(unittest.TestCase):
     self.assertEqual(result.tolist(), correct.tolist())
 
 
+  def test_add_algs_matches_loop(self):
+    rng = np.random.default_rng(0)
+    feature_space = rng.integers(1, 30, size=(257,3)).astype(float)
+    algs = dict(zip(range(12), [f"alg{i}" for i in range(12)]))
+    result = add_algs(feature_space, algs)
+    self.assertEqual(result.tolist(), loop_add_algs(feature_space, algs).tolist())
+
+  def test_add_algs_keeps_compact_dtype(self):
+    feature_space = np.array([[14, 8, 29]], dtype=np.uint8)
+    algs = read_algs('bcast')
+    self.assertEqual(add_algs(feature_space, algs).dtype, np.uint8)
+    self.assertEqual(get_all_algs(add_algs(feature_space, algs)[0], algs).dtype, np.uint8)
+    self.assertEqual(add_algs(feature_space.astype(float), algs).dtype, np.float64)
+
+  def test_add_algs_chunks(self):
+    rng = np.random.default_rng(0)
+    feature_space = rng.integers(1, 30, size=(10,3)).astype(float)
+    algs = read_algs('bcast')
+    chunks = list(add_algs_chunks(feature_space, algs, chunk_size=4))
+    self.assertEqual([chunk.shape[0] for chunk in chunks], [12, 12, 6])
+    self.assertEqual(np.vstack(chunks).tolist(), add_algs(feature_space, algs).tolist())
+
+  def test_get_all_algs_keys(self):
+    x = np.array([3,2,5,0])
+    result = get_all_algs(x, {0: 'binomial', 2: 'scatter_ring_allgather'})
+    self.assertEqual(result.tolist(), [[3,2,5,0],[3,2,5,2]])
+
 if __name__ == '__main__':
   unittest.main()
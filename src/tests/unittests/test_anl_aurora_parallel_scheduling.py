@@ -170,6 +170,38 @@ class TestParallelScheduling(unittest.TestCase):
     topo.reset_fit()
     twelvth = topo.fit_point(33)
     self.assertEqual(False, twelvth)
- 
+
+  def test_get_capacity(self):
+    pwd = os.getcwd()
+    simple_topo_path = pwd + '/src/tests/unittests/aurora_topos/anl_aurora_topo_4.output'
+    topo = Topology.get_topology(simple_topo_path)
+    self.assertEqual(1, topo.get_capacity())
+
+    example_topo_path = pwd + '/src/tests/unittests/aurora_topos/anl_aurora_topo_32.output'
+    topo = Topology.get_topology(example_topo_path)
+    self.assertEqual(9, topo.get_capacity())
+
+
+  def test_release_nodes(self):
+    pwd = os.getcwd()
+    example_topo_path = pwd + '/src/tests/unittests/aurora_topos/anl_aurora_topo_32.output'
+    topo = Topology.get_topology(example_topo_path)
+    fits = [topo.fit_point(1) for _ in range(9)]
+    self.assertEqual(False, topo.fit_point(1))
+
+    # Releasing one fit makes exactly its nodes available again
+    topo.release_nodes(fits[1])
+    self.assertEqual(fits[1], topo.fit_point(1))
+    self.assertEqual(False, topo.fit_point(1))
+
+  def test_reserve_nodes(self):
+    pwd = os.getcwd()
+    example_topo_path = pwd + '/src/tests/unittests/aurora_topos/anl_aurora_topo_32.output'
+    topo = Topology.get_topology(example_topo_path)
+    first = topo.fit_point(1)
+    topo.reset_fit()
+    topo.reserve_nodes(first)
+    self.assertNotEqual(first, topo.fit_point(1))
+    self.assertEqual(9 - 2, len([fit for fit in [topo.fit_point(1) for _ in range(9)] if fit])) 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,229 @@
+# This file tests "async_pipeline.py" using unittest
+import unittest
+
+import os
+import sys
+import time
+import numpy as np
+from unittest.mock import patch
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.async_pipeline import AsyncCollector, BenchmarkScheduler, split_points
+from src.active_learner.data_collect import clear_result_cache, cached_rows
+from src.active_learner.persistent_driver import AlgorithmSelectionError
+from src.parallel_scheduling.serial.serial_parallel_scheduling import Topology as SerialTopology
+from src.parallel_scheduling.local.local_parallel_scheduling import Topology as LocalTopology
+from src.parallel_scheduling.anl_polaris.anl_polaris_parallel_scheduling import Topology as PolarisTopology
+
+# Pool that records the benchmarks it is given, the test decides when they finish
+class RecordingPool:
+  def __init__(self, processes):
+    self.jobs = []
+
+  def apply_async(self, func, args, callback, error_callback):
+    self.jobs.append((args, callback))
+
+  def close(self):
+    return
+
+  def join(self):
+    return
+
+class Owner:
+  def fail(self, error):
+    self.error = error
+
+# Benchmarks of larger messages take longer, so points finish out of order
+def fake_collect_point_single(name, algs, point, nodefile=None, iterations=None, warmup=None):
+  time.sleep(0.01 * point[2])
+  return 1.0 + point[3] + point[2]
+
+class TestAsyncPipeline(unittest.TestCase):
+  def setUp(self):
+    clear_result_cache()
+    self.algs = {0: 'binomial', 1: 'scatter_ring_allgather'}
+    self.points = np.array([[1, 1, 5, 0],
+                            [1, 1, 5, 1],
+                            [1, 1, 1, 0],
+                            [1, 1, 1, 1]], dtype=float)
+
+  def tearDown(self):
+    clear_result_cache()
+
+  def collect_all(self, collector):
+    X, y = [], []
+    while collector.num_pending() > 0 or not collector.completed.empty():
+      new_X, new_y, _ = collector.collect()
+      X.append(new_X)
+      y.append(new_y)
+    return np.vstack(X), np.concatenate(y)
+
+  def test_split_points(self):
+    points = np.array([[2, 1, 1, 0], [2, 1, 1, 1], [1, 1, 1, 0], [1, 1, 1, 1]])
+    self.assertEqual([rows.tolist() for rows in split_points(points)], [[0, 1], [2, 3]])
+
+  def test_collect_complete_points(self):
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=fake_collect_point_single):
+      collector = AsyncCollector("bcast", self.algs, LocalTopology())
+      collector.submit(self.points)
+      X, y = self.collect_all(collector)
+      collector.close()
+
+    # Every point is returned with all of its algorithms in order
+    self.assertEqual(X.shape, (4, 4))
+    for rows in split_points(X):
+      self.assertEqual(X[rows, 3].tolist(), [0, 1])
+    np.testing.assert_equal(y, 1.0 + X[:, 3] + X[:, 2])
+
+  def test_serial_topology_runs_one_benchmark_at_a_time(self):
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=fake_collect_point_single):
+      topo = SerialTopology()
+      collector = AsyncCollector("bcast", self.algs, topo)
+      collector.submit(self.points)
+      self.assertEqual(len(collector.scheduler.in_flight), 1)
+      X, y = self.collect_all(collector)
+      collector.close()
+    self.assertEqual(X.shape[0], 4)
+    self.assertFalse(topo.fit)
+
+  def test_cached_points_are_not_launched(self):
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=fake_collect_point_single):
+      collector = AsyncCollector("bcast", self.algs, LocalTopology())
+      collector.submit(self.points[:2])
+      self.collect_all(collector)
+      collector.submit(self.points[:2])
+      self.assertEqual(collector.num_pending(), 0)
+      X, y, runtimes = collector.collect()
+      collector.close()
+    self.assertEqual(X.shape[0], 2)
+    self.assertTrue(np.all(np.isnan(runtimes)))
+
+  def test_pruned_rows_are_not_launched(self):
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=fake_collect_point_single):
+      collector = AsyncCollector("bcast", self.algs, LocalTopology())
+      collector.submit(self.points[:2], pruned=[False, True])
+      X, y, runtimes = collector.collect()
+      collector.close()
+    self.assertEqual(X.shape[0], 2)
+    self.assertTrue(np.isfinite(y[0]))
+    self.assertTrue(np.isnan(y[1]))
+    self.assertTrue(np.isnan(runtimes[1]))
+
+  def test_racing_submits_one_job_per_point(self):
+    ConfigManager.get_instance()._set_value('settings', 'racing', 'successive_halving')
+    try:
+      with patch('src.active_learner.data_collect.collect_point_single', side_effect=fake_collect_point_single):
+        collector = AsyncCollector("bcast", self.algs, LocalTopology())
+        collector.submit(self.points)
+        self.assertEqual(collector.num_pending(), 4)
+        self.assertEqual(len(collector.scheduler.queued) + len(collector.scheduler.in_flight), 2)
+        X, y = self.collect_all(collector)
+        collector.close()
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'racing', 'none')
+    self.assertEqual(sorted(y.tolist()), [2.0, 3.0, 6.0, 7.0])
+    # The algorithm dropped in the first round of each race is not cached
+    np.testing.assert_equal(cached_rows("bcast", self.algs, self.points), [True, False, True, False])
+
+  def test_msg_sweep_harvests_neighbouring_sizes(self):
+    ConfigManager.get_instance()._set_value('settings', 'msg_sweep', 'range')
+    def sweep(name, alg, n, ppn, msg_size, min_msg_size, max_msg_size, nodefile_path=None, iterations=None, warmup=None):
+      return {size: float(size) for size in [min_msg_size, msg_size, max_msg_size]}
+    try:
+      with patch('src.active_learner.data_collect.collect_sweep_runner', side_effect=sweep):
+        collector = AsyncCollector("bcast", self.algs, LocalTopology())
+        collector.submit(self.points[:2])
+        X, y = self.collect_all(collector)
+        # The message sizes 4 doublings away were harvested, the point is not launched again
+        collector.submit(np.array([[1, 1, 7, 0], [1, 1, 7, 1]]))
+        self.assertEqual(collector.num_pending(), 0)
+        X, y, runtimes = collector.collect()
+        collector.close()
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'msg_sweep', 'none')
+    self.assertEqual(y.tolist(), [64.0, 64.0])
+    self.assertTrue(np.all(np.isnan(runtimes)))
+
+  def test_persistent_driver_submits_one_job_per_point(self):
+    ConfigManager.get_instance()._set_value('settings', 'benchmark_driver', 'fake')
+    points = np.array([[2, 2, 5, 0], [2, 2, 5, 1], [2, 2, 1, 0], [2, 2, 1, 1]], dtype=float)
+    try:
+      collector = AsyncCollector("bcast", self.algs, LocalTopology())
+      collector.submit(points)
+      self.assertEqual(collector.num_pending(), 4)
+      self.assertEqual(len(collector.scheduler.queued) + len(collector.scheduler.in_flight), 2)
+      X, y = self.collect_all(collector)
+      collector.close()
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'benchmark_driver', 'runner')
+    self.assertEqual(X.shape, (4, 4))
+    self.assertTrue(np.all(y > 0))
+
+  def test_selection_error_is_raised(self):
+    ConfigManager.get_instance()._set_value('settings', 'benchmark_driver', 'fake')
+    try:
+      collector = AsyncCollector("bcast", {0: 'binomial', 1: 'smp'}, LocalTopology())
+      collector.submit(np.array([[2, 2, 5, 0], [2, 2, 5, 1]], dtype=float))
+      with self.assertRaises(AlgorithmSelectionError):
+        self.collect_all(collector)
+      collector.close()
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'benchmark_driver', 'runner')
+
+  def test_scheduler_backfill(self):
+    pwd = os.getcwd()
+    topo = PolarisTopology.get_topology(pwd + '/src/tests/unittests/polaris_topos/anl_polaris_topo_complex.output')
+    with patch('src.active_learner.async_pipeline.multiprocessing.Pool', RecordingPool):
+      scheduler = BenchmarkScheduler(topo)
+    scheduler.backfill_limit = 1
+    owner = Owner()
+    finished = []
+    def submit(label, num_nodes):
+      scheduler.submit(owner, num_nodes, ("bcast", {}, label), lambda output: finished.append(label))
+    dispatched = lambda: [args[2] for args, _ in scheduler.pool.jobs]
+    finish = lambda label: [callback((1.0, 1.0)) for args, callback in scheduler.pool.jobs if args[2] == label]
+
+    submit('a', 1)
+    submit('b', 24)
+    # The small benchmark runs on the free racks while the large one waits
+    submit('c', 1)
+    self.assertEqual(dispatched(), ['a', 'c'])
+    # The backfill limit is reached, so later benchmarks wait behind the large one
+    submit('d', 1)
+    self.assertEqual(dispatched(), ['a', 'c'])
+    finish('a')
+    self.assertEqual(dispatched(), ['a', 'c'])
+    finish('c')
+    self.assertEqual(dispatched(), ['a', 'c', 'b'])
+    finish('b')
+    self.assertEqual(dispatched(), ['a', 'c', 'b', 'd'])
+    finish('d')
+    self.assertEqual(finished, ['a', 'c', 'b', 'd'])
+    self.assertEqual(scheduler.num_pending(owner), 0)
+    scheduler.close()
+
+  def test_shared_scheduler(self):
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=fake_collect_point_single):
+      scheduler = BenchmarkScheduler(LocalTopology(), num_learners=2)
+      bcast = AsyncCollector("bcast", self.algs, scheduler.topo, scheduler)
+      allreduce = AsyncCollector("allreduce", self.algs, scheduler.topo, scheduler)
+      bcast.submit(self.points)
+      allreduce.submit(self.points[:2])
+      X, y = self.collect_all(allreduce)
+      self.assertEqual(X.shape[0], 2)
+      # Closing a collector only waits for its own benchmarks, the scheduler keeps running
+      bcast.close()
+      self.assertEqual(scheduler.num_pending(bcast), 0)
+      scheduler.close()
+
+  def test_point_too_large_for_allocation(self):
+    pwd = os.getcwd()
+    topo = PolarisTopology.get_topology(pwd + '/src/tests/unittests/polaris_topos/anl_polaris_topo_simple.output')
+    collector = AsyncCollector("bcast", self.algs, topo)
+    collector.submit(np.array([[4, 1, 1, 0], [4, 1, 1, 1]]))
+    with self.assertRaises(RuntimeError):
+      collector.collect()
+    collector.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,71 @@
+# This file tests "checkpoint.py" using unittest
+import unittest
+
+import os
+import sys
+import tempfile
+import numpy as np
+from src.active_learner.checkpoint import append_journal, read_journal, save_checkpoint, load_checkpoint, restore_state, clear_checkpoint
+
+class TestCheckpoint(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.journal_path = os.path.join(self.tmp_dir.name, "bcast.journal.csv")
+    self.checkpoint_path = os.path.join(self.tmp_dir.name, "bcast.checkpoint.npz")
+    self.X = np.array([[1,2,1,0],
+                       [1,2,1,1],
+                       [1,2,2,0],
+                       [1,2,2,1]])
+    self.y_nf = np.array([10.0, 11.0, 20.0, 19.5])
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_journal_round_trip(self):
+    append_journal(self.journal_path, self.X[:2], self.y_nf[:2])
+    append_journal(self.journal_path, self.X[2:], self.y_nf[2:])
+    X, y_nf = read_journal(self.journal_path, 2)
+    self.assertEqual(X.tolist(), self.X.tolist())
+    self.assertEqual(y_nf.tolist(), self.y_nf.tolist())
+
+  def test_journal_drops_incomplete_point(self):
+    append_journal(self.journal_path, self.X[:3], self.y_nf[:3])
+    with open(self.journal_path, 'a') as journal_file:
+      journal_file.write("1.0,2.0,2")
+    X, y_nf = read_journal(self.journal_path, 2)
+    self.assertEqual(X.tolist(), self.X[:2].tolist())
+    self.assertEqual(y_nf.tolist(), self.y_nf[:2].tolist())
+
+  def test_missing_files(self):
+    self.assertEqual(read_journal(self.journal_path, 2), (None, None))
+    self.assertIsNone(load_checkpoint(self.checkpoint_path))
+    self.assertIsNone(restore_state(self.journal_path, self.checkpoint_path, 2))
+
+  def test_checkpoint_round_trip(self):
+    save_checkpoint(self.checkpoint_path, 3, [0.5, 0.25, 0.2], self.X, self.y_nf)
+    state = load_checkpoint(self.checkpoint_path)
+    self.assertEqual(state['iteration'], 3)
+    self.assertEqual(state['convergence_vals'], [0.5, 0.25, 0.2])
+    self.assertEqual(state['X_train'].tolist(), self.X.tolist())
+    self.assertEqual(state['y_train_nf'].tolist(), self.y_nf.tolist())
+    self.assertFalse(state['converged'])
+
+  def test_restore_state_prefers_newer_journal(self):
+    save_checkpoint(self.checkpoint_path, 1, [0.5], self.X[:2], self.y_nf[:2], converged=True)
+    append_journal(self.journal_path, self.X, self.y_nf)
+    state = restore_state(self.journal_path, self.checkpoint_path, 2)
+    self.assertEqual(state['iteration'], 1)
+    self.assertEqual(state['convergence_vals'], [0.5])
+    self.assertEqual(state['X_train'].tolist(), self.X.tolist())
+    self.assertFalse(state['converged'])
+
+  def test_clear_checkpoint(self):
+    append_journal(self.journal_path, self.X, self.y_nf)
+    save_checkpoint(self.checkpoint_path, 1, [0.5], self.X, self.y_nf)
+    clear_checkpoint(self.journal_path, self.checkpoint_path)
+    self.assertFalse(os.path.exists(self.journal_path))
+    self.assertFalse(os.path.exists(self.checkpoint_path))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,7 +3,11 @@ import unittest
 
 import sys
 import numpy as np
-from src.active_learner.convergence import convergence_criteria
+import io
+import contextlib
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.convergence import (convergence_criteria, SelectionStability, check_convergence,
+                                            report_convergence)
 
 class TestConvergence(unittest.TestCase):
   def test_convergence_criteria_simple(self):
@@ -28,6 +32,79 @@ class TestConvergence(unittest.TestCase):
     correct = False
     self.assertEqual(result, correct)
 
+class TestSelectionStability(unittest.TestCase):
+  def setUp(self):
+    config = ConfigManager.get_instance()
+    config._set_value('settings', 'stability_iterations', '2')
+    config._set_value('settings', 'stability_tolerance', '0')
+    config._set_value('settings', 'stability_weighting', 'none')
+    config._set_value('settings', 'convergence_mode', 'selection')
+
+  def tearDown(self):
+    config = ConfigManager.get_instance()
+    config._set_value('settings', 'stability_iterations', '5')
+    config._set_value('settings', 'stability_tolerance', '0.01')
+    config._set_value('settings', 'stability_weighting', 'gain')
+    config._set_value('settings', 'convergence_mode', 'variance')
+
+  def test_map_change_counts_points(self):
+    selection = SelectionStability(2)
+    self.assertIsNone(selection.update([1, 2, 1, 2, 1, 2, 1, 2]))
+    self.assertEqual(selection.update([1, 2, 1, 2, 1, 2, 1, 2]), 0)
+    self.assertEqual(selection.update([2, 1, 1, 2, 1, 2, 1, 2]), 0.25)
+
+  def test_gain_weighting_ignores_near_ties(self):
+    ConfigManager.get_instance()._set_value('settings', 'stability_weighting', 'gain')
+    selection = SelectionStability(2)
+    selection.update([1, 0.5, 1, 1.001])
+    # The second point flips between nearly identical algorithms
+    change = selection.update([1, 0.5, 1, 0.999])
+    self.assertLess(change, 0.01)
+    self.assertGreater(change, 0)
+    # The first point flips to an algorithm that is much slower than the previous choice
+    change = selection.update([1, 1.5, 1, 0.999])
+    self.assertGreater(change, 0.9)
+
+  def test_is_stable(self):
+    selection = SelectionStability(2)
+    y_pred = [1, 2, 2, 1]
+    selection.update(y_pred)
+    selection.update(y_pred)
+    self.assertFalse(selection.is_stable())
+    selection.update(y_pred)
+    self.assertTrue(selection.is_stable())
+    selection.update([2, 1, 2, 1])
+    self.assertFalse(selection.is_stable())
+
+  def test_check_convergence_tracks_both_criteria(self):
+    selection = SelectionStability(2)
+    launches_at = {'variance': None, 'selection': None}
+    with contextlib.redirect_stdout(io.StringIO()):
+      self.assertFalse(check_convergence([1, 2], 4, selection, [1, 2], launches_at, 10))
+      self.assertFalse(check_convergence([1, 2, 3], 4, selection, [1, 2], launches_at, 20))
+      self.assertTrue(check_convergence([1, 2, 3, 4], 4, selection, [1, 2], launches_at, 30))
+      ConfigManager.get_instance()._set_value('settings', 'convergence_mode', 'variance')
+      self.assertTrue(check_convergence([1, 1, 1, 1, 1], 4, selection, [1, 2], launches_at, 40))
+    self.assertEqual(launches_at, {'variance': 40, 'selection': 30})
+
+  def test_check_convergence_without_predictions(self):
+    selection = SelectionStability(2)
+    launches_at = {'variance': None}
+    ConfigManager.get_instance()._set_value('settings', 'convergence_mode', 'variance')
+    with contextlib.redirect_stdout(io.StringIO()):
+      self.assertTrue(check_convergence([1, 1, 1, 1], 4, selection, None, launches_at, 10))
+    self.assertEqual(launches_at, {'variance': 10})
+
+  def test_report_convergence(self):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      report_convergence({'variance': 40, 'selection': 20}, 40)
+    self.assertIn("saves  20  benchmark launches", output.getvalue())
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      report_convergence({'variance': None, 'selection': 20}, 20)
+    self.assertIn("variance  convergence criterion was not met within  20", output.getvalue())
+    self.assertNotIn("saves", output.getvalue())
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,67 @@
+# This file tests "cost_model.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from src.active_learner.cost_model import CostModel, acquisition_scores
+from src.user_config.config_manager import ConfigManager
+
+# Synthetic runtime: a fixed launch overhead plus a term that grows with message size and node count
+def synthetic_runtimes(X):
+  return 0.5 + np.exp2(X[:,2] + X[:,0] - 12)
+
+class TestCostModel(unittest.TestCase):
+  def setUp(self):
+    n, ppn, msg_size, alg = np.meshgrid(np.arange(1,6), np.arange(1,4), np.arange(1,16), np.arange(2), indexing='ij')
+    self.X = np.column_stack((n.ravel(), ppn.ravel(), msg_size.ravel(), alg.ravel())).astype(float)
+
+  def tearDown(self):
+    ConfigManager.get_instance()._set_value('settings', 'acquisition', 'variance')
+
+  def test_unfitted_model_has_uniform_cost(self):
+    cost_model = CostModel()
+    np.testing.assert_equal(cost_model.predict(self.X), np.ones(self.X.shape[0]))
+
+  def test_update_ignores_missing_runtimes(self):
+    cost_model = CostModel()
+    cost_model.update(self.X[:2], [np.nan, np.nan])
+    self.assertEqual(cost_model.count, 0)
+    cost_model.update(self.X[:2], [1.0, np.nan])
+    self.assertEqual(cost_model.count, 1)
+
+  def test_predicts_runtime_growth(self):
+    cost_model = CostModel()
+    rng = np.random.default_rng(0)
+    sample = rng.choice(self.X.shape[0], size=60, replace=False)
+    cost_model.update(self.X[sample], synthetic_runtimes(self.X[sample]))
+    predicted = cost_model.predict(self.X)
+    actual = synthetic_runtimes(self.X)
+    self.assertLess(np.median(np.abs(np.log2(predicted / actual))), 0.5)
+    self.assertGreater(predicted[np.argmax(actual)], 10 * predicted[np.argmin(actual)])
+
+  def test_point_costs_sum_algorithms(self):
+    cost_model = CostModel()
+    cost_model.update(self.X, synthetic_runtimes(self.X))
+    X = np.array([[1,1,1,0],[1,1,1,1],[5,3,15,0]])
+    costs = cost_model.point_costs(X)
+    predicted = cost_model.predict(X)
+    self.assertAlmostEqual(costs[0], predicted[0] + predicted[1])
+    self.assertAlmostEqual(costs[1], costs[0])
+    self.assertAlmostEqual(costs[2], predicted[2])
+
+  def test_acquisition_scores(self):
+    cost_model = CostModel()
+    cost_model.update(self.X, synthetic_runtimes(self.X))
+    X = np.array([[1,1,1,0],[5,3,15,0]])
+    variances = np.array([1.0, 2.0])
+    np.testing.assert_equal(acquisition_scores(variances, X, cost_model), variances)
+
+    # The expensive point is more uncertain, but the cheap point gives more variance per second
+    ConfigManager.get_instance()._set_value('settings', 'acquisition', 'cost_aware')
+    scores = acquisition_scores(variances, X, cost_model)
+    self.assertEqual(np.argmax(scores), 0)
+    self.assertEqual(acquisition_scores(np.array([-np.inf, 1.0]), X, cost_model)[0], -np.inf)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -8,7 +8,14 @@ import os
 import numpy as np
 import subprocess
 import shutil
-from src.active_learner.data_collect import run_mb_runner, parse_runner_output, collect_point_runner, collect_point_single, collect_point_batch, create_unique_directory
+import tempfile
+from src.active_learner.data_collect import run_mb_runner, parse_runner_output, parse_sweep_output, collect_point_runner, collect_point_single, collect_point_batch, create_unique_directory, clear_result_cache, result_iterations, harvested_points, cached_rows, FAILED_LATENCY
+from src.active_learner.measured_index import MeasuredIndex
+from src.active_learner.msg_sweep import sweep_sizes, feature_msg_bounds
+from src.active_learner.initialization import create_feature_space
+from src.active_learner.algs import add_algs
+from src.active_learner.iteration_policy import reset_iteration_policy
+from src.active_learner.measurement_store import MeasurementStore
 from src.user_config.config_manager import ConfigManager
 
 class TestDataCollect(unittest.TestCase):
@@ -231,5 +238,230 @@ class TestDataCollect(unittest.TestCase):
     self.assertGreater(result[2], 0)
     self.assertLess(result[2], 20)
 
+  def test_collect_point_batch_result_cache(self):
+    clear_result_cache()
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial', 2: 'scatter_ring_allgather'}
+    points = np.array([[1, 2, 1, 0],
+                       [1, 2, 1, 1],
+                       [1, 2, 1, 1]])
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=lambda name, algs, row: 1.0 + row[3]) as mock_single:
+      result = collect_point_batch("bcast", bcast_algs, points)
+      self.assertEqual(result.tolist(), [1.0, 2.0, 2.0])
+      self.assertEqual(mock_single.call_count, 2)
+
+      result = collect_point_batch("bcast", bcast_algs, np.array([[1, 2, 1, 1], [1, 2, 1, 2]]))
+      self.assertEqual(result.tolist(), [2.0, 3.0])
+      self.assertEqual(mock_single.call_count, 3)
+    clear_result_cache()
+
+  def test_run_mb_runner_iterations(self):
+    with patch('subprocess.run') as mock_run:
+      run_mb_runner("bcast", "binomial", 1, 2, 1024)
+      self.assertEqual(len(mock_run.call_args[0][0]), 10)
+      run_mb_runner("bcast", "binomial", 1, 2, 1024, None, 50, 10)
+      self.assertEqual(mock_run.call_args[0][0][-3:], ["", "50", "10"])
+      # The largest message size of a sweep is the 12th runner argument, with or without iteration counts
+      run_mb_runner("bcast", "binomial", 1, 2, 256, None, None, None, 4096)
+      self.assertEqual(mock_run.call_args[0][0][-5:], ["256", "", "", "", "4096"])
+      run_mb_runner("bcast", "binomial", 1, 2, 256, None, 50, 10, 4096)
+      self.assertEqual(mock_run.call_args[0][0][-3:], ["50", "10", "4096"])
+
+  def test_parse_sweep_output(self):
+    output = "# OSU MPI Broadcast Latency Test\n# Size       Avg Latency(us)\n256 1.5\n512 2.0\n1024 3.0\n1024 5.0\n"
+    self.assertEqual(parse_sweep_output(output), {256: 1.5, 512: 2.0, 1024: 4.0})
+
+  def test_collect_point_batch_msg_sweep(self):
+    clear_result_cache()
+    ConfigManager.get_instance()._set_value('settings', 'msg_sweep', 'range')
+    ConfigManager.get_instance()._set_value('settings', 'msg_sweep_width', '1')
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial'}
+    # Every launch measures the message sizes from half to twice the requested one
+    def sweep(name, alg, n, ppn, msg_size, min_msg_size, max_msg_size, nodefile_path=None, iterations=None, warmup=None):
+      self.assertEqual((min_msg_size, max_msg_size), (msg_size // 2, msg_size * 2))
+      return {size: float(size) + (alg == 'binomial') for size in [min_msg_size, msg_size, max_msg_size]}
+    try:
+      with patch('src.active_learner.data_collect.collect_sweep_runner', side_effect=sweep) as mock_sweep:
+        result, runtimes = collect_point_batch("bcast", bcast_algs, np.array([[1, 2, 11, 0], [1, 2, 11, 1]]), return_runtimes=True)
+        self.assertEqual(result.tolist(), [1024.0, 1025.0])
+        self.assertTrue(np.all(np.isfinite(runtimes)))
+        # The neighbouring message sizes were harvested and are not launched again
+        result = collect_point_batch("bcast", bcast_algs, np.array([[1, 2, 12, 0], [1, 2, 10, 1]]))
+        self.assertEqual(result.tolist(), [2048.0, 513.0])
+        self.assertEqual(mock_sweep.call_count, 2)
+      # OSU uses its default counts per message size
+      np.testing.assert_equal(result_iterations("bcast", bcast_algs, np.array([[1, 2, 12, 0]])), ([1000], [200]))
+
+      # The harvested points that were not measured are fed to the learner
+      X = add_algs(np.array([[1, 2, 10], [1, 2, 11], [1, 2, 12], [1, 2, 13]]), bcast_algs)
+      measured = MeasuredIndex(X[2:6])
+      harvested_x, harvested_y = harvested_points("bcast", bcast_algs, X, measured)
+      self.assertEqual(harvested_x.tolist(), [[1, 2, 10, 0], [1, 2, 10, 1]])
+      self.assertEqual(harvested_y.tolist(), [512.0, 513.0])
+      measured.add(harvested_x)
+      self.assertEqual(harvested_points("bcast", bcast_algs, X, measured), (None, None))
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'msg_sweep', 'none')
+      ConfigManager.get_instance()._set_value('settings', 'msg_sweep_width', '2')
+      clear_result_cache()
+
+  def test_msg_sweep_stays_in_feature_space(self):
+    clear_result_cache()
+    ConfigManager.get_instance()._set_value('settings', 'msg_sweep', 'range')
+    allreduce_algs = {0: 'recursive_doubling', 1: 'ring'}
+    # Reductions start at 4 byte messages (see create_feature_space), the feature space ends at 8 KiB
+    msg_bounds = feature_msg_bounds(create_feature_space(1, 2, 14, 'allreduce'))
+    self.assertEqual(msg_bounds, (3, 14))
+    self.assertEqual(sweep_sizes(4, 2, msg_bounds), (3, 6))
+    self.assertEqual(sweep_sizes(13, 2, msg_bounds), (11, 14))
+    self.assertEqual(sweep_sizes(13, 2), (11, 15))
+    ranges = []
+    def sweep(name, alg, n, ppn, msg_size, min_msg_size, max_msg_size, nodefile_path=None, iterations=None, warmup=None):
+      ranges.append((min_msg_size, max_msg_size))
+      return {size: 1.0 for size in [min_msg_size, msg_size, max_msg_size]}
+    try:
+      with patch('src.active_learner.data_collect.collect_sweep_runner', side_effect=sweep):
+        collect_point_batch("allreduce", allreduce_algs, np.array([[1, 2, 4, 0], [1, 2, 13, 0]]), msg_bounds=msg_bounds)
+      self.assertEqual(ranges, [(4, 32), (1024, 8192)])
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'msg_sweep', 'none')
+      clear_result_cache()
+
+  def test_collect_point_batch_pruned(self):
+    clear_result_cache()
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial', 2: 'scatter_ring_allgather'}
+    points = np.array([[1, 2, 1, 0],
+                       [1, 2, 1, 1],
+                       [1, 2, 1, 2]])
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=lambda name, algs, row: 1.0 + row[3]) as mock_single:
+      result, runtimes = collect_point_batch("bcast", bcast_algs, points, return_runtimes=True, pruned=[False, True, False])
+      self.assertEqual(mock_single.call_count, 2)
+    self.assertEqual(result[[0, 2]].tolist(), [1.0, 3.0])
+    self.assertTrue(np.isnan(result[1]))
+    self.assertTrue(np.isnan(runtimes[1]))
+    clear_result_cache()
+
+  def test_collect_point_batch_does_not_cache_failures(self):
+    clear_result_cache()
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather'}
+    points = np.array([[1, 2, 1, 0]])
+    with patch('src.active_learner.data_collect.collect_point_single', return_value=FAILED_LATENCY) as mock_single:
+      collect_point_batch("bcast", bcast_algs, points)
+      collect_point_batch("bcast", bcast_algs, points)
+      self.assertEqual(mock_single.call_count, 2)
+    clear_result_cache()
+
+  def test_collect_point_single_compact_features(self):
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial'}
+    point = np.array([11, 7, 29, 1], dtype=np.uint8)
+    with patch('src.active_learner.data_collect.collect_point_runner', return_value=3.0) as mock_runner:
+      collect_point_single("bcast", bcast_algs, point)
+    self.assertEqual(mock_runner.call_args[0][1:5], ('binomial', 1024, 64, 268435456))
+
+  def test_collect_point_batch_runtimes(self):
+    clear_result_cache()
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial'}
+    points = np.array([[1, 2, 1, 0],
+                       [1, 2, 1, 1]])
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=lambda name, algs, row: 1.0 + row[3]):
+      result, runtimes = collect_point_batch("bcast", bcast_algs, points, return_runtimes=True)
+      self.assertEqual(result.tolist(), [1.0, 2.0])
+      self.assertTrue(np.all(runtimes >= 0))
+
+      # Rows served from the result cache were not launched and have no runtime
+      result, runtimes = collect_point_batch("bcast", bcast_algs, points[:1], return_runtimes=True)
+      self.assertEqual(result.tolist(), [1.0])
+      self.assertTrue(np.isnan(runtimes[0]))
+    clear_result_cache()
+
+  def test_collect_point_batch_measurement_store(self):
+    clear_result_cache()
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial'}
+    points = np.array([[2, 2, 3, 0],
+                       [2, 2, 3, 1]])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      store_path = os.path.join(tmp_dir, "store.sqlite")
+      open_store = lambda topo=None: MeasurementStore(store_path, "signature", 30)
+      with patch('src.active_learner.data_collect.get_measurement_store', side_effect=open_store), \
+           patch('src.active_learner.data_collect.collect_point_single', side_effect=lambda name, algs, row: 5.0 + row[3]) as mock_single:
+        collect_point_batch("bcast", bcast_algs, points)
+        self.assertEqual(mock_single.call_count, 2)
+
+        # A new run starts with an empty result cache but finds the points in the store
+        clear_result_cache()
+        result = collect_point_batch("bcast", bcast_algs, points)
+        self.assertEqual(result.tolist(), [5.0, 6.0])
+        self.assertEqual(mock_single.call_count, 2)
+
+      store = MeasurementStore(store_path, "signature", 30)
+      self.assertEqual(store.lookup_many([("bcast", "binomial", 2, 2, 4)]), {("bcast", "binomial", 2, 2, 4): 6.0})
+      # The OSU default counts of a 4 byte message are recorded with the result
+      self.assertEqual(store.lookup_iterations(("bcast", "binomial", 2, 2, 4)), (1000, 200))
+      store.close()
+    clear_result_cache()
+
+  def test_collect_point_batch_store_iterations(self):
+    clear_result_cache()
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial'}
+    points = np.array([[2, 2, 3, 0],
+                       [2, 2, 3, 1]])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      store = MeasurementStore(os.path.join(tmp_dir, "store.sqlite"), "signature", 30)
+      # The first algorithm was measured with fewer iterations than OSU uses by default
+      store.insert_many({("bcast", "scatter_recursive_doubling_allgather", 2, 2, 4): 1.0, ("bcast", "binomial", 2, 2, 4): 2.0},
+                        {("bcast", "scatter_recursive_doubling_allgather", 2, 2, 4): (100, 10),
+                         ("bcast", "binomial", 2, 2, 4): (1000, 200)})
+      with patch('src.active_learner.data_collect.collect_point_single', side_effect=lambda name, algs, row: 5.0 + row[3]) as mock_single:
+        result = collect_point_batch("bcast", bcast_algs, points, store=store)
+      self.assertEqual(result.tolist(), [5.0, 2.0])
+      self.assertEqual(mock_single.call_count, 1)
+      # The given store is left open for the caller
+      self.assertEqual(store.lookup_iterations(("bcast", "scatter_recursive_doubling_allgather", 2, 2, 4)), (1000, 200))
+      store.close()
+    clear_result_cache()
+
+  def test_pruned_rows_are_looked_up(self):
+    clear_result_cache()
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial'}
+    points = np.array([[2, 2, 3, 0],
+                       [2, 2, 3, 1],
+                       [2, 2, 4, 1]])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      store = MeasurementStore(os.path.join(tmp_dir, "store.sqlite"), "signature", 30)
+      store.insert_many({("bcast", "binomial", 2, 2, 4): 2.0}, {("bcast", "binomial", 2, 2, 4): (1000, 200)})
+      with patch('src.active_learner.data_collect.collect_point_single', side_effect=lambda name, algs, row: 5.0) as mock_single:
+        result = collect_point_batch("bcast", bcast_algs, points, pruned=[False, True, True], store=store)
+      store.close()
+    np.testing.assert_equal(result, [5.0, np.nan, np.nan])
+    self.assertEqual(mock_single.call_count, 1)
+    # Only the pruned row without a stored result saved a launch
+    np.testing.assert_equal(cached_rows("bcast", bcast_algs, points), [True, True, False])
+    clear_result_cache()
+
+  def test_collect_point_batch_adaptive_iterations(self):
+    clear_result_cache()
+    reset_iteration_policy()
+    ConfigManager.get_instance()._set_value('settings', 'osu_iterations', 'adaptive')
+    ConfigManager.get_instance()._set_value('settings', 'benchmark_time_budget', '0.1')
+    bcast_algs = {0: 'scatter_recursive_doubling_allgather', 1: 'binomial'}
+    calls = []
+    def benchmark(name, algs, row, iterations=None, warmup=None):
+      calls.append((iterations, warmup))
+      return 1000.0
+    try:
+      with patch('src.active_learner.data_collect.collect_point_single', side_effect=benchmark):
+        # The first message size is measured with the OSU defaults
+        collect_point_batch("bcast", bcast_algs, np.array([[1, 2, 11, 0]]))
+        # 1 ms per iteration leaves 0.1 s / (1.2 ms) = 84 iterations at the same message size
+        collect_point_batch("bcast", bcast_algs, np.array([[2, 2, 11, 0]]))
+      self.assertEqual(calls, [(1000, 200), (84, 17)])
+      iterations, warmup = result_iterations("bcast", bcast_algs, np.array([[1, 2, 11, 0], [2, 2, 11, 0], [3, 2, 11, 0]]))
+      np.testing.assert_equal(iterations, [1000, 84, np.nan])
+      np.testing.assert_equal(warmup, [200, 17, np.nan])
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'osu_iterations', 'default')
+      ConfigManager.get_instance()._set_value('settings', 'benchmark_time_budget', '0.5')
+      reset_iteration_policy()
+      clear_result_cache()
+
 if __name__ == '__main__':
   unittest.main()
@@ -3,9 +3,24 @@ import unittest
 
 import sys
 import numpy as np
-from src.active_learner.initialization import create_feature_space, get_initial_points
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.initialization import create_feature_space, get_initial_points, lhs_points, maximin_points
+from src.active_learner.cost_model import prior_point_costs
 
 
+# Reference implementation that fills the feature space point by point
+def loop_create_feature_space(n, ppn, msg_size, collective):
+  rows = []
+  for cur_n in range(n):
+    for cur_ppn in range(ppn):
+      if(cur_n == 0 and cur_ppn == 0):
+        continue
+      for cur_msg_size in range(msg_size):
+        if "reduce" in collective and cur_msg_size < 2:
+          continue
+        rows.append([cur_n + 1, cur_ppn + 1, cur_msg_size + 1])
+  return np.array(rows)
+
 class TestInitialization(unittest.TestCase):
   def test_simple_feature_space(self):
     result = create_feature_space(2,2,2,"bcast")
@@ -24,6 +39,15 @@ class TestInitialization(unittest.TestCase):
                         [2,2,3]])
     self.assertEqual(result.tolist(), correct.tolist())
 
+  def test_feature_space_is_compact(self):
+    result = create_feature_space(14, 8, 29, "allreduce")
+    self.assertEqual(result.dtype, np.uint8)
+
+  def test_feature_space_matches_loop(self):
+    for collective in ["bcast", "allreduce", "reduce_scatter"]:
+      result = create_feature_space(14, 8, 29, collective)
+      self.assertEqual(result.tolist(), loop_create_feature_space(14, 8, 29, collective).tolist())
+
   def test_bigger_feature_space(self):
     result = create_feature_space(2,3,4,"bcast")
     correct = np.array([[1,2,1],
@@ -94,6 +118,48 @@ class TestInitialization(unittest.TestCase):
                         [1,2,2],
                         [1,3,4]])
     self.assertEqual(result.tolist(), correct.tolist())
+
+  def test_maximin_points_spread(self):
+    X = create_feature_space(5, 4, 12, "bcast")
+    costs = prior_point_costs(X, 2)
+    selected = maximin_points(X, 4, costs, np.inf)
+    self.assertEqual(len(set(selected)), 4)
+    # Starts from the cheapest point, the second point is the opposite corner of the cube
+    self.assertEqual(selected[0], np.argmin(costs))
+    self.assertEqual(X[selected[1]].tolist(), [5, 4, 12])
+
+  def test_lhs_points_cover_strata(self):
+    np.random.seed(0)
+    X = create_feature_space(5, 5, 20, "bcast")
+    selected = lhs_points(X, 5, prior_point_costs(X, 2), np.inf)
+    self.assertEqual(len(set(selected)), 5)
+    # Every node count is covered once
+    self.assertEqual(sorted(X[selected,0].tolist()), [1, 2, 3, 4, 5])
+
+  def test_initial_budget(self):
+    X = create_feature_space(5, 4, 20, "allreduce")
+    costs = prior_point_costs(X, 3)
+    budget = 4 * np.min(costs)
+    for design_points in [lhs_points, maximin_points]:
+      np.random.seed(0)
+      selected = design_points(X, 10, costs, budget)
+      self.assertGreater(len(selected), 0)
+      self.assertLessEqual(np.sum(costs[selected]), budget)
+
+  def test_get_initial_points_with_design(self):
+    config = ConfigManager.get_instance()
+    default_points = config.get_value('settings', 'num_initial_points')
+    X = create_feature_space(5, 4, 20, "allreduce")
+    try:
+      config._set_value('settings', 'num_initial_points', '6')
+      for design in ['lhs', 'maximin']:
+        config._set_value('settings', 'initial_design', design)
+        result = get_initial_points(X, 3)
+        self.assertEqual(result.shape, (6, 3))
+        self.assertEqual(len(np.unique(result, axis=0)), 6)
+    finally:
+      config._set_value('settings', 'initial_design', 'grid')
+      config._set_value('settings', 'num_initial_points', default_points)
     
 
 if __name__ == '__main__':
@@ -0,0 +1,108 @@
+# This file tests "instrumentation.py" using unittest
+import unittest
+
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import tempfile
+import contextlib
+import numpy as np
+from unittest.mock import patch
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.instrumentation import Instrumentation, measured_seconds, profiling_requested
+
+class TestInstrumentation(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.timing_file = os.path.join(self.tmp_dir.name, "timing.jsonl")
+    ConfigManager.get_instance()._set_value('settings', 'timing_file', self.timing_file)
+
+  def tearDown(self):
+    ConfigManager.get_instance()._set_value('settings', 'timing_file', '')
+    self.tmp_dir.cleanup()
+
+  def read_records(self):
+    with open(self.timing_file) as timing_file:
+      return [json.loads(line) for line in timing_file]
+
+  def test_measured_seconds(self):
+    # 1 KiB uses 1000 + 200 iterations, 1 MiB uses 100 + 10 iterations
+    np.testing.assert_almost_equal(measured_seconds([10.0, 1000.0], [11, 21]), [0.012, 0.11])
+    # Recorded counts replace the defaults, NaN counts are unknown
+    np.testing.assert_almost_equal(measured_seconds([10.0, 1000.0], [11, 21], [100, np.nan], [20, np.nan]), [0.0012, 0.11])
+
+  def test_profiling_requested(self):
+    with patch.dict(os.environ, {'ACCLAIM_PROFILE': 'cprofile, tracemalloc'}):
+      self.assertEqual(profiling_requested(), {'cprofile', 'tracemalloc'})
+    with patch.dict(os.environ, {'ACCLAIM_PROFILE': ''}):
+      self.assertEqual(profiling_requested(), set())
+
+  def test_iteration_records(self):
+    instrumentation = Instrumentation('bcast', 4, 8, 1024)
+    with instrumentation.phase('fit'):
+      time.sleep(0.01)
+    with instrumentation.phase('fit'):
+      pass
+    X = np.array([[3, 4, 11, 0], [3, 4, 11, 1], [3, 4, 12, 0]])
+    # The last row was served from a cache and was not launched
+    instrumentation.add_benchmarks(X, [10.0, 20.0, 30.0], [1.0, 2.0, np.nan])
+    instrumentation.end_iteration(1, 3)
+    with instrumentation.phase('convergence'):
+      pass
+    instrumentation.end_iteration(2, 3)
+
+    records = self.read_records()
+    self.assertEqual(len(records), 2)
+    self.assertEqual(records[0]['collective'], 'bcast')
+    self.assertEqual(records[0]['iteration'], 1)
+    self.assertGreaterEqual(records[0]['phases']['fit'], 0.01)
+    self.assertEqual(records[0]['benchmarks']['launches'], 2)
+    self.assertAlmostEqual(records[0]['benchmarks']['launch_seconds'], 3.0)
+    self.assertAlmostEqual(records[0]['benchmarks']['measured_seconds'], 0.036)
+    self.assertAlmostEqual(records[0]['benchmarks']['overhead_seconds'], 2.964)
+    self.assertNotIn('saved_overhead_seconds', records[1]['benchmarks'])
+    self.assertEqual(list(records[1]['phases'].keys()), ['convergence'])
+    self.assertEqual(records[1]['benchmarks']['launches'], 0)
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      instrumentation.close()
+    self.assertIn("'benchmark_launch_seconds': 3.0", output.getvalue())
+
+  def test_harvested_rows(self):
+    instrumentation = Instrumentation('bcast', 4, 8, 1024)
+    X = np.array([[3, 4, 11, 0], [3, 4, 11, 1]])
+    instrumentation.add_benchmarks(X, [10.0, 20.0], [1.0, 2.0])
+    # Two rows of a neighbouring message size were measured within the same launches
+    instrumentation.add_harvested(np.array([[3, 4, 12, 0], [3, 4, 12, 1]]), [10.0, 20.0])
+    instrumentation.end_iteration(1, 4)
+
+    benchmarks = self.read_records()[0]['benchmarks']
+    self.assertEqual(benchmarks['harvested'], 2)
+    self.assertAlmostEqual(benchmarks['measured_seconds'], 0.072)
+    self.assertAlmostEqual(benchmarks['saved_overhead_seconds'], 2.928)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      instrumentation.close()
+    self.assertIn("harvested  2  rows", output.getvalue())
+
+  def test_profiling_hooks(self):
+    with patch.dict(os.environ, {'ACCLAIM_PROFILE': 'cprofile,tracemalloc'}):
+      instrumentation = Instrumentation('bcast', 4, 8, 1024)
+    with instrumentation.phase('fit'):
+      sorted(range(1000))
+    instrumentation.end_iteration(1, 0)
+    with contextlib.redirect_stdout(io.StringIO()):
+      instrumentation.close()
+
+    self.assertIn('memory', self.read_records()[0])
+    profile_path = self.timing_file + ".bcast_4_8_1024.prof"
+    self.assertTrue(os.path.exists(profile_path))
+    self.assertGreater(pstats.Stats(profile_path).total_calls, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,88 @@
+# This file tests "iteration_policy.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.iteration_policy import (CV_PRIOR, MIN_ITERATIONS, MAX_ITERATIONS, IterationPolicy,
+                                                 get_iteration_policy, reset_iteration_policy)
+
+class TestIterationPolicy(unittest.TestCase):
+  def tearDown(self):
+    ConfigManager.get_instance()._set_value('settings', 'osu_iterations', 'default')
+    reset_iteration_policy()
+
+  def test_defaults_without_measurements(self):
+    iterations, warmup = IterationPolicy().choose('bcast', np.array([[1, 2, 4, 0], [1, 2, 21, 0]]))
+    self.assertEqual(iterations.tolist(), [1000, 100])
+    self.assertEqual(warmup.tolist(), [200, 10])
+
+  def test_error_target(self):
+    policy = IterationPolicy(time_budget=100.0, target_error=0.02)
+    policy.observe('bcast', np.array([[1, 2, 4, 0]]), [1.0], [1000])
+    # (0.3 / 0.02)^2 = 225 iterations reach the target with the prior noise
+    iterations, warmup = policy.choose('bcast', np.array([[3, 2, 4, 1]]))
+    self.assertEqual(iterations.tolist(), [225])
+    self.assertEqual(warmup.tolist(), [45])
+    self.assertEqual(policy.cv('bcast', 4), CV_PRIOR)
+
+  def test_time_budget(self):
+    policy = IterationPolicy(time_budget=0.1, target_error=0.001)
+    policy.observe('bcast', np.array([[1, 2, 21, 0], [1, 2, 21, 1]]), [1000.0, 5000.0], [100, 100])
+    # The slowest latency of the message size bounds the iterations: 0.1 s / (5 ms * 1.1) = 19
+    iterations, warmup = policy.choose('bcast', np.array([[1, 2, 21, 0]]))
+    self.assertEqual(iterations.tolist(), [19])
+    self.assertEqual(warmup.tolist(), [2])
+    # Very slow benchmarks are still measured a few times
+    policy.observe('bcast', np.array([[1, 2, 21, 0]]), [1e6], [100])
+    self.assertEqual(policy.choose('bcast', np.array([[1, 2, 21, 0]]))[0].tolist(), [MIN_ITERATIONS])
+
+  def test_spread_from_repeated_runs(self):
+    policy = IterationPolicy(time_budget=1e6, target_error=0.01)
+    quiet = np.array([[1, 2, 4, 0]])
+    for latency in [1.0, 1.001, 0.999, 1.0]:
+      policy.observe('bcast', quiet, [latency], [100])
+    self.assertLess(policy.cv('bcast', 4), 0.02)
+    self.assertEqual(policy.choose('bcast', quiet)[0].tolist(), [MIN_ITERATIONS])
+
+    noisy = np.array([[1, 2, 5, 0]])
+    for latency in [1.0, 2.0, 1.0, 2.0]:
+      policy.observe('bcast', noisy, [latency], [100])
+    self.assertGreater(policy.cv('bcast', 5), 1.0)
+    self.assertEqual(policy.choose('bcast', noisy)[0].tolist(), [MAX_ITERATIONS])
+
+  def test_latency_per_point(self):
+    policy = IterationPolicy(time_budget=0.1, target_error=0.001)
+    policy.observe('bcast', np.array([[1, 2, 21, 0], [4, 2, 21, 0]]), [1000.0, 5000.0], [100, 100])
+    # Every point is bounded by its own latency: 0.1 s / (1 ms * 1.1) = 91 and 0.1 s / (5 ms * 1.1) = 19
+    self.assertEqual(policy.choose('bcast', np.array([[1, 2, 21, 1], [4, 2, 21, 1]]))[0].tolist(), [91, 19])
+    # An unmeasured point falls back to the largest latency of the message size, other collectives do not share it
+    self.assertEqual(policy.choose('bcast', np.array([[2, 2, 21, 0]]))[0].tolist(), [19])
+    self.assertEqual(policy.choose('allreduce', np.array([[1, 2, 21, 0]]))[0].tolist(), [100])
+
+  def test_spread_per_collective(self):
+    policy = IterationPolicy()
+    policy.observe('bcast', np.array([[1, 2, 4, 0]]), [1.0], [100])
+    policy.observe('allreduce', np.array([[1, 2, 4, 0]]), [2.0], [100])
+    # The same row of another collective is not a repeated run
+    self.assertEqual(policy.spread, {})
+    policy.observe('bcast', np.array([[1, 2, 4, 0]]), [1.1], [100])
+    self.assertEqual(list(policy.spread.keys()), [('bcast', 4)])
+    self.assertEqual(policy.cv('allreduce', 4), CV_PRIOR)
+
+  def test_failed_runs_are_ignored(self):
+    policy = IterationPolicy()
+    policy.observe('bcast', np.array([[1, 2, 4, 0], [1, 2, 5, 0]]), [np.nan, 1.0], [1000, np.nan])
+    self.assertEqual(policy.latencies, {})
+
+  def test_get_iteration_policy(self):
+    self.assertIsNone(get_iteration_policy())
+    ConfigManager.get_instance()._set_value('settings', 'osu_iterations', 'adaptive')
+    policy = get_iteration_policy()
+    self.assertIsInstance(policy, IterationPolicy)
+    self.assertIs(get_iteration_policy(), policy)
+    self.assertEqual(policy.time_budget, 0.5)
+
+
+if __name__ == '__main__':
+  unittest.main()
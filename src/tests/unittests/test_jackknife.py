@@ -0,0 +1,202 @@
+# This file tests "jackknife.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+import io
+import contextlib
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.model_training import record_inbag_counts, fit_model
+from src.active_learner.jackknife import (tree_predictions, jackknife_variances_from_predictions, jackknife_variances, jackknife,
+                                          InbagCovariance, infinitesimal_jackknife_variances_from_predictions,
+                                          variance_strata, StratifiedSample, full_variances)
+from src.active_learner.initialization import create_feature_space
+from src.active_learner.algs import add_algs
+
+# Reference implementation that explicitly builds every leave-one-out resample
+def loop_jackknife_variances(prediction_array):
+  means = np.mean(prediction_array, axis=0)
+  variances = np.empty(means.shape)
+  for i, column in enumerate(prediction_array.T):
+    n = column.shape[0]
+    resamples = np.empty((n,n-1))
+    for j in range(n):
+      resamples[j,:] = np.delete(column, j)
+    resample_means = np.mean(resamples, axis=1)
+    variances[i] = np.sum(np.square(np.subtract(resample_means, means[i])))/(n*(n-1))
+  return variances
+
+def forest_data():
+  rng = np.random.default_rng(0)
+  X_train = rng.integers(1, 10, size=(60,4)).astype(float)
+  y_train = X_train[:,0] * X_train[:,2] + rng.normal(size=60)
+  X_test = rng.integers(1, 10, size=(50,4)).astype(float)
+  return X_train, y_train, X_test
+
+def make_forest():
+  X_train, y_train, X_test = forest_data()
+  rf = RandomForestRegressor(n_estimators=20, random_state=0).fit(X_train, y_train)
+  return rf, X_test
+
+class TestJackknife(unittest.TestCase):
+  def test_jackknife_variances_from_predictions_simple(self):
+    prediction_array = np.array([[1.0, 2.0, 5.0],
+                                 [2.0, 2.0, 1.0],
+                                 [3.0, 2.0, 0.0],
+                                 [6.0, 2.0, 2.0]])
+    result = jackknife_variances_from_predictions(prediction_array)
+    correct = loop_jackknife_variances(prediction_array)
+    np.testing.assert_almost_equal(result, correct)
+    self.assertEqual(result[1], 0)
+
+  def test_jackknife_variances_match_loop(self):
+    rf, X_test = make_forest()
+    result = jackknife_variances(rf, X_test, workers=1)
+    correct = loop_jackknife_variances(tree_predictions(rf, X_test))
+    np.testing.assert_almost_equal(result, correct)
+
+  def test_jackknife_variances_chunked(self):
+    rf, X_test = make_forest()
+    result = jackknife_variances(rf, X_test, chunk_size=7, workers=1)
+    correct = jackknife_variances(rf, X_test, workers=1)
+    np.testing.assert_almost_equal(result, correct)
+
+  def test_jackknife_variances_workers(self):
+    rf, X_test = make_forest()
+    result = jackknife_variances(rf, X_test, chunk_size=16, workers=3)
+    correct = jackknife_variances(rf, X_test, workers=1)
+    np.testing.assert_almost_equal(result, correct)
+
+  def test_jackknife_reuses_variances(self):
+    rf, X_test = make_forest()
+    variances = jackknife_variances(rf, X_test)
+    self.assertAlmostEqual(jackknife(rf, X_test), jackknife(rf, X_test, variances))
+    self.assertEqual(jackknife(rf, X_test, np.array([1.0, 3.0])), 2.0)
+
+  def test_jackknife_variances_return_predictions(self):
+    rf, X_test = make_forest()
+    variances, predictions = jackknife_variances(rf, X_test, chunk_size=7, workers=2, return_predictions=True)
+    np.testing.assert_almost_equal(variances, jackknife_variances(rf, X_test, workers=1))
+    np.testing.assert_almost_equal(predictions, rf.predict(X_test))
+
+# Reference implementation that computes the covariance of every training row with the tree predictions
+def loop_infinitesimal_jackknife_variances(prediction_array, inbag_counts):
+  num_trees, num_rows = inbag_counts.shape
+  variances = np.empty(prediction_array.shape[1])
+  for j, column in enumerate(prediction_array.T):
+    covariances = [np.mean((inbag_counts[:,i] - np.mean(inbag_counts[:,i])) * (column - np.mean(column))) for i in range(num_rows)]
+    count_variance = np.mean(np.var(inbag_counts, axis=0))
+    bias = num_rows * count_variance * np.var(column) / num_trees
+    variances[j] = max(np.sum(np.square(covariances)) - bias, 0)
+  return variances
+
+class TestInfinitesimalJackknife(unittest.TestCase):
+  def tearDown(self):
+    ConfigManager.get_instance()._set_value('settings', 'variance_estimator', 'jackknife')
+
+  def test_matches_loop(self):
+    rf, X_test = make_forest()
+    record_inbag_counts(rf, forest_data()[0])
+    prediction_array = tree_predictions(rf, X_test)
+    inbag_counts = np.array([tree.inbag_counts_ for tree in rf.estimators_])
+    result = infinitesimal_jackknife_variances_from_predictions(prediction_array, InbagCovariance(rf))
+    correct = loop_infinitesimal_jackknife_variances(prediction_array, inbag_counts)
+    np.testing.assert_almost_equal(result, correct)
+    self.assertTrue(np.any(result > 0))
+
+  def test_selected_by_setting(self):
+    rf, X_test = make_forest()
+    record_inbag_counts(rf, forest_data()[0])
+    ConfigManager.get_instance()._set_value('settings', 'variance_estimator', 'infinitesimal_jackknife')
+    result = jackknife_variances(rf, X_test, chunk_size=7, workers=2)
+    correct = infinitesimal_jackknife_variances_from_predictions(tree_predictions(rf, X_test), InbagCovariance(rf))
+    np.testing.assert_almost_equal(result, correct)
+
+  def test_incremental_with_prior_and_pruned_rows(self):
+    ConfigManager._instance = None
+    config = ConfigManager.get_instance()
+    config._set_value('settings', 'variance_estimator', 'infinitesimal_jackknife')
+    config._set_value('settings', 'training_mode', 'incremental')
+    config._set_value('settings', 'forest_size', '20')
+    config._set_value('settings', 'incremental_trees', '5')
+    X_train, y_train, X_test = forest_data()
+    y_train[::4] = np.nan
+    X_prior, y_prior = X_test[:10] + 10, np.ones(10)
+
+    # The second fit has more training rows and fewer prior rows, so rows move between the fits
+    rf, _ = fit_model(None, X_train[:30], y_train[:30], 0, X_prior, y_prior)
+    rf, _ = fit_model(rf, X_train, y_train, 1, X_prior[3:], y_prior[3:])
+    self.assertEqual(len({id(tree.inbag_rows_) for tree in rf.estimators_}), 2)
+
+    # Align the counts of every tree by the identity of its rows
+    columns = {}
+    for tree in rf.estimators_:
+      for row_id in map(tuple, tree.inbag_rows_):
+        columns.setdefault(row_id, len(columns))
+    inbag_counts = np.zeros((len(rf.estimators_), len(columns)))
+    for i, tree in enumerate(rf.estimators_):
+      for row_id, count in zip(map(tuple, tree.inbag_rows_), tree.inbag_counts_):
+        inbag_counts[i, columns[row_id]] = count
+    # 45 benchmarked training rows and 10 prior rows
+    self.assertEqual(len(columns), 55)
+
+    prediction_array = tree_predictions(rf, X_test)
+    result = infinitesimal_jackknife_variances_from_predictions(prediction_array, InbagCovariance(rf))
+    np.testing.assert_almost_equal(result, loop_infinitesimal_jackknife_variances(prediction_array, inbag_counts))
+    ConfigManager._instance = None
+
+  def test_falls_back_without_inbag_counts(self):
+    rf, X_test = make_forest()
+    ConfigManager.get_instance()._set_value('settings', 'variance_estimator', 'infinitesimal_jackknife')
+    result = jackknife_variances(rf, X_test, workers=1)
+    np.testing.assert_almost_equal(result, loop_jackknife_variances(tree_predictions(rf, X_test)))
+
+class TestStratifiedSample(unittest.TestCase):
+  def setUp(self):
+    feature_space = create_feature_space(6, 5, 20, 'allreduce')
+    self.X = add_algs(feature_space, {0: 'a', 1: 'b', 2: 'c'})
+
+  def test_variance_strata(self):
+    X = np.array([[1, 1, 0, 0], [1, 6, 20, 0], [7, 1, 0, 0], [7, 6, 20, 1]])
+    np.testing.assert_equal(variance_strata(X, 2), [0, 3, 4, 7])
+    np.testing.assert_equal(variance_strata(X, 1), [0, 0, 0, 0])
+
+  def test_sample_covers_every_stratum(self):
+    sample = StratifiedSample(self.X, 200, num_regions=2)
+    strata = variance_strata(self.X, 2)
+    self.assertEqual(np.unique(strata[sample.indices]).size, np.unique(strata).size)
+    self.assertEqual(np.unique(sample.indices).size, sample.indices.size)
+    np.testing.assert_equal(StratifiedSample(self.X, 200, num_regions=2).indices, sample.indices)
+
+  def test_estimate_within_bound(self):
+    rng = np.random.default_rng(1)
+    # Variances that differ strongly between regions, as they do between small and large messages
+    variances = rng.gamma(2.0, size=self.X.shape[0]) * (1 + self.X[:,2])
+    sample = StratifiedSample(self.X, 400, num_regions=2, confidence=0.99)
+    estimate, half_width = sample.estimate_from_variances(variances[sample.indices])
+    self.assertGreater(half_width, 0)
+    self.assertLessEqual(abs(estimate - np.mean(variances)), half_width)
+
+  def test_fully_sampled_estimate_is_exact(self):
+    variances = np.random.default_rng(2).random(self.X.shape[0])
+    sample = StratifiedSample(self.X, self.X.shape[0], num_regions=3)
+    estimate, half_width = sample.estimate_from_variances(variances[sample.indices])
+    self.assertAlmostEqual(estimate, np.mean(variances))
+    self.assertAlmostEqual(half_width, 0)
+
+  def test_full_variances_tracks_estimate(self):
+    rng = np.random.default_rng(0)
+    y_train = self.X[:,2] * 0.1 + self.X[:,3] + rng.normal(size=self.X.shape[0])
+    rf = RandomForestRegressor(n_estimators=20, random_state=0).fit(self.X, y_train)
+    sample = StratifiedSample(self.X, 300, num_regions=2, confidence=0.99)
+    with contextlib.redirect_stdout(io.StringIO()):
+      estimate = sample.estimate(rf, self.X)
+      variances = full_variances(rf, self.X, sample)
+    self.assertAlmostEqual(sample.full_values[-1][0], np.mean(variances))
+    self.assertLess(abs(estimate - np.mean(variances)), 0.5 * np.mean(variances))
+    self.assertIsNotNone(sample.coverage())
+
+
+if __name__ == '__main__':
+  unittest.main()
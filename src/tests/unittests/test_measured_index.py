@@ -0,0 +1,37 @@
+# This file tests "measured_index.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from src.active_learner.measured_index import MeasuredIndex
+
+class TestMeasuredIndex(unittest.TestCase):
+  def test_empty_index(self):
+    index = MeasuredIndex()
+    X = np.array([[1,2,3,0],
+                  [1,2,3,1]])
+    self.assertEqual(len(index), 0)
+    self.assertEqual(index.contains(X).tolist(), [False, False])
+
+  def test_algorithms_share_a_point(self):
+    index = MeasuredIndex(np.array([[1,2,3,0],
+                                    [1,2,3,1]]))
+    self.assertEqual(len(index), 1)
+    X = np.array([[1,2,3,2],
+                  [1,2,4,0],
+                  [2,2,3,0]])
+    self.assertEqual(index.contains(X).tolist(), [True, False, False])
+
+  def test_add(self):
+    index = MeasuredIndex()
+    index.add(np.array([14.0, 8.0, 29.0, 3.0]))
+    index.add(np.array([[1.0, 8.0, 29.0, 0.0]]))
+    X = np.array([[14,8,29,0],
+                  [1,8,29,11],
+                  [8,14,29,0]])
+    self.assertEqual(len(index), 2)
+    self.assertEqual(index.contains(X).tolist(), [True, True, False])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,132 @@
+# This file tests "measurement_store.py" using unittest
+import unittest
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import numpy as np
+from unittest.mock import patch
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.measurement_store import MeasurementStore, build_signature, get_measurement_store, SECONDS_PER_DAY
+from src.active_learner.data_collect import collect_point_batch, clear_result_cache
+from src.active_learner.persistent_driver import close_drivers
+
+class TestMeasurementStore(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.tmp_dir.name, "store.sqlite")
+    self.key = ("allreduce", "tree2", 4, 8, 1024)
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_insert_and_lookup(self):
+    store = MeasurementStore(self.path, "build_a", 30)
+    self.assertEqual(store.lookup_many([self.key]), {})
+    store.insert_many({self.key: 12.5})
+    store.close()
+
+    store = MeasurementStore(self.path, "build_a", 30)
+    self.assertEqual(store.lookup_many([self.key]), {self.key: 12.5})
+    store.close()
+
+  def test_iteration_counts(self):
+    store = MeasurementStore(self.path, "build_a", 30)
+    other_key = ("allreduce", "tree2", 4, 8, 2048)
+    store.insert_many({self.key: 12.5, other_key: 13.0}, {self.key: (400, 80)})
+    self.assertEqual(store.lookup_iterations(self.key), (400, 80))
+    self.assertEqual(store.lookup_iterations(other_key), (None, None))
+    store.close()
+
+  def test_minimum_iterations(self):
+    store = MeasurementStore(self.path, "build_a", 30)
+    other_key = ("allreduce", "tree2", 4, 8, 2048)
+    store.insert_many({self.key: 12.5, other_key: 13.0}, {self.key: (400, 80)})
+    self.assertEqual(store.lookup_many([self.key], {self.key: 400}), {self.key: 12.5})
+    self.assertEqual(store.lookup_many([self.key], {self.key: 1000}), {})
+    # Measurements with unknown counts are not served if a minimum is required
+    self.assertEqual(store.lookup_many([other_key], {other_key: 10}), {})
+    self.assertEqual(store.lookup_many([other_key]), {other_key: 13.0})
+    store.close()
+
+  def test_migrates_store_without_iteration_counts(self):
+    connection = sqlite3.connect(self.path)
+    connection.execute('''CREATE TABLE measurements (signature TEXT, collective TEXT, alg TEXT, n INTEGER, ppn INTEGER,
+                          msg_size INTEGER, latency REAL, timestamp REAL, PRIMARY KEY (signature, collective, alg, n, ppn, msg_size))''')
+    connection.execute('INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?, ?, ?)', ("build_a", *self.key, 12.5, time.time()))
+    connection.commit()
+    connection.close()
+
+    store = MeasurementStore(self.path, "build_a", 30)
+    self.assertEqual(store.lookup_many([self.key]), {self.key: 12.5})
+    self.assertEqual(store.lookup_iterations(self.key), (None, None))
+    store.insert_many({self.key: 11.0}, {self.key: (1000, 200)})
+    self.assertEqual(store.lookup_iterations(self.key), (1000, 200))
+    store.close()
+
+  def test_other_build_does_not_match(self):
+    store = MeasurementStore(self.path, "build_a", 30)
+    store.insert_many({self.key: 12.5})
+    store.close()
+    store = MeasurementStore(self.path, "build_b", 30)
+    self.assertEqual(store.lookup_many([self.key]), {})
+    store.close()
+
+  def test_stale_measurements(self):
+    store = MeasurementStore(self.path, "build_a", 1)
+    with patch('time.time', return_value=time.time() - 2 * SECONDS_PER_DAY):
+      store.insert_many({self.key: 12.5})
+    self.assertEqual(store.lookup_many([self.key]), {})
+    store.purge_stale()
+    count = store.connection.execute('SELECT COUNT(*) FROM measurements').fetchone()[0]
+    self.assertEqual(count, 0)
+    store.close()
+
+  def test_invalidate(self):
+    store = MeasurementStore(self.path, "build_a", 30)
+    store.insert_many({self.key: 12.5})
+    store.invalidate()
+    self.assertEqual(store.lookup_many([self.key]), {})
+    store.close()
+
+  def test_build_signature_changes_with_topology(self):
+    self.assertEqual(build_signature(), build_signature())
+    self.assertNotEqual(build_signature(), build_signature(object()))
+
+  def test_build_signature_changes_with_benchmark_driver(self):
+    config = ConfigManager.get_instance()
+    signature = build_signature()
+    config._set_value('settings', 'benchmark_driver', 'persistent')
+    try:
+      self.assertNotEqual(build_signature(), signature)
+    finally:
+      config._set_value('settings', 'benchmark_driver', 'runner')
+
+  def test_fake_driver_results_are_not_stored(self):
+    config = ConfigManager.get_instance()
+    store_path = config.get_value('settings', 'measurement_store', '')
+    algs = {0: 'binomial'}
+    point = np.array([[2, 3, 11, 0]])
+    config._set_value('settings', 'measurement_store', self.path)
+    config._set_value('settings', 'benchmark_driver', 'fake')
+    try:
+      self.assertIsNone(get_measurement_store())
+      clear_result_cache()
+      self.assertGreater(collect_point_batch('bcast', algs, point)[0], 0)
+      close_drivers()
+      # A later run with the runners finds nothing to reuse
+      config._set_value('settings', 'benchmark_driver', 'runner')
+      store = get_measurement_store()
+      self.assertEqual(store.lookup_many([("bcast", "binomial", 2, 4, 1024)]), {})
+      store.close()
+    finally:
+      close_drivers()
+      clear_result_cache()
+      config._set_value('settings', 'benchmark_driver', 'runner')
+      config._set_value('settings', 'measurement_store', store_path)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,115 @@
+# This file tests "model_training.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from sklearn.tree import DecisionTreeRegressor
+from src.active_learner.model_training import FOREST_SIZE, fit_full, fit_incremental, fit_model, record_inbag_counts, fit_row_ids
+
+def make_data(num_points, seed=0):
+  rng = np.random.default_rng(seed)
+  X_train = rng.integers(1, 10, size=(num_points,4)).astype(float)
+  y_train = X_train[:,0] + X_train[:,3] + rng.normal(size=num_points)
+  return X_train, y_train
+
+class TestModelTraining(unittest.TestCase):
+  def test_fit_full(self):
+    X_train, y_train = make_data(40)
+    rf = fit_full(X_train, y_train)
+    self.assertEqual(len(rf.estimators_), FOREST_SIZE)
+
+  def test_fit_incremental_replaces_oldest_trees(self):
+    X_train, y_train = make_data(40)
+    rf = fit_full(X_train, y_train, warm_start=True)
+    old_trees = list(rf.estimators_)
+
+    X_train, y_train = make_data(50)
+    rf = fit_incremental(rf, X_train, y_train, 10)
+    self.assertEqual(len(rf.estimators_), FOREST_SIZE)
+    for old_tree, new_tree in zip(old_trees[10:], rf.estimators_[:FOREST_SIZE - 10]):
+      self.assertIs(old_tree, new_tree)
+    for new_tree in rf.estimators_[FOREST_SIZE - 10:]:
+      self.assertNotIn(new_tree, old_trees)
+    self.assertEqual(rf.predict(X_train).shape, (50,))
+
+  def test_fit_model_incremental_schedule(self):
+    ConfigManager._instance = None
+    ConfigManager.get_instance()._set_value('settings', 'training_mode', 'incremental')
+    ConfigManager.get_instance()._set_value('settings', 'incremental_trees', '5')
+    ConfigManager.get_instance()._set_value('settings', 'refit_interval', '3')
+
+    X_train, y_train = make_data(30)
+    rf, fit_time = fit_model(None, X_train, y_train, 0)
+    self.assertGreaterEqual(fit_time, 0)
+    first_trees = list(rf.estimators_)
+
+    rf, _ = fit_model(rf, X_train, y_train, 1)
+    self.assertIs(rf.estimators_[0], first_trees[5])
+    self.assertEqual(len(rf.estimators_), FOREST_SIZE)
+
+    # Iteration 3 falls on the refit interval, so none of the previous trees survive
+    rf, _ = fit_model(rf, X_train, y_train, 3)
+    self.assertEqual(len(rf.estimators_), FOREST_SIZE)
+    for tree in rf.estimators_:
+      self.assertNotIn(tree, first_trees)
+    ConfigManager._instance = None
+
+  def test_record_inbag_counts(self):
+    X_train, y_train = make_data(40)
+    sample_weight = np.concatenate([np.ones(30), np.full(10, 0.5)])
+    rf = fit_full(X_train, y_train, warm_start=True, sample_weight=sample_weight)
+    record_inbag_counts(rf, X_train, 10)
+    tree = rf.estimators_[3]
+    self.assertEqual(tree.inbag_counts_.sum(), 40)
+    # A tree fit to its bootstrap sample reproduces the tree of the forest
+    refit = DecisionTreeRegressor(**tree.get_params()).fit(X_train, y_train, sample_weight=tree.inbag_counts_)
+    np.testing.assert_almost_equal(refit.predict(X_train), tree.predict(X_train))
+
+    # Trees kept by incremental training keep the counts of the data they were fit to
+    old_counts = rf.estimators_[-1].inbag_counts_
+    X_train, y_train = make_data(50)
+    rf = fit_incremental(rf, X_train, y_train, 10)
+    record_inbag_counts(rf, X_train)
+    self.assertIs(rf.estimators_[FOREST_SIZE - 11].inbag_counts_, old_counts)
+    self.assertEqual(rf.estimators_[-1].inbag_counts_.size, 50)
+    self.assertEqual(rf.estimators_[-1].inbag_rows_.shape, (50, 6))
+
+  def test_fit_row_ids(self):
+    X_train, _ = make_data(30)
+    X_train[1] = X_train[0]
+    X_prior = X_train[20:25] + 10
+    row_ids = fit_row_ids(np.vstack([X_train[:20], X_prior]), 5)
+    np.testing.assert_equal(row_ids[:,0], [0] * 20 + [1] * 5)
+    # Identical rows are told apart by their occurrence
+    np.testing.assert_equal(row_ids[:2,1], [0, 1])
+    self.assertEqual(np.unique(row_ids, axis=0).shape[0], 25)
+
+    # Rows keep their identity when rows are left out before them or added to the training data
+    later_ids = fit_row_ids(np.vstack([X_train[[0, 1] + list(range(3, 30))], X_prior[2:]]), 3)
+    np.testing.assert_equal(later_ids[3:19], row_ids[4:20])
+    np.testing.assert_equal(later_ids[-3:], row_ids[-3:])
+
+  def test_fit_model_forest_size(self):
+    ConfigManager._instance = None
+    ConfigManager.get_instance()._set_value('settings', 'forest_size', '12')
+    ConfigManager.get_instance()._set_value('settings', 'variance_estimator', 'infinitesimal_jackknife')
+    X_train, y_train = make_data(30)
+    rf, _ = fit_model(None, X_train, y_train, 0)
+    self.assertEqual(len(rf.estimators_), 12)
+    self.assertTrue(all(tree.inbag_counts_.size == 30 for tree in rf.estimators_))
+    X_prior, _ = make_data(5, seed=1)
+    rf, _ = fit_model(None, X_train, y_train, 0, X_prior + 10, np.ones(5))
+    np.testing.assert_equal(rf.estimators_[0].inbag_rows_[:,0], [0] * 30 + [1] * 5)
+    ConfigManager._instance = None
+
+  def test_fit_model_skips_rows_without_latency(self):
+    X_train, y_train = make_data(30)
+    y_train[::3] = np.nan
+    rf, _ = fit_model(None, X_train, y_train, 0)
+    self.assertEqual(rf.n_features_in_, 4)
+    self.assertTrue(np.all(np.isfinite(rf.predict(X_train))))
+
+
+if __name__ == '__main__':
+  unittest.main()
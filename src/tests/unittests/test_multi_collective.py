@@ -0,0 +1,47 @@
+# This file tests "multi_collective.py" using unittest
+import unittest
+
+import io
+import sys
+import tempfile
+import numpy as np
+from unittest.mock import patch
+from contextlib import redirect_stdout
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.multi_collective import train_models
+from src.active_learner.data_collect import clear_result_cache
+
+def fake_collect_point_single(name, algs, point, nodefile=None):
+  return 1.0 + point[3] * point[2] / 10
+
+class TestMultiCollective(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_train_models(self):
+    ConfigManager._instance = None
+    clear_result_cache()
+    ConfigManager.get_instance()._set_value('settings', 'checkpoint_dir', self.tmp_dir.name)
+    ConfigManager.get_instance()._set_value('settings', 'timeout', '0')
+    ConfigManager.get_instance()._set_value('settings', 'measurement_store', '')
+
+    collectives = ['bcast', 'allreduce']
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=fake_collect_point_single), \
+         io.StringIO() as buf, redirect_stdout(buf):
+      models = train_models(2, 8, 1024, collectives)
+      self.assertEqual(buf.getvalue().count("Timeout reached, exiting!"), 2)
+
+    self.assertEqual(sorted(models.keys()), sorted(collectives))
+    for collective in collectives:
+      feature_space, rf = models[collective]
+      self.assertGreater(feature_space.shape[0], 0)
+      self.assertIsNotNone(rf)
+    ConfigManager._instance = None
+    clear_result_cache()
+
+
+if __name__ == '__main__':
+  unittest.main()
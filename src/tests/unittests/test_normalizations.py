@@ -5,6 +5,27 @@ import sys
 import numpy as np
 from src.active_learner.normalizations import undo_preprocess_input, normalize_output, undo_normalize_output 
 
+# Reference implementation of the "alg" output normalization, one group of algorithms at a time
+def loop_normalize_output(y, num_algs):
+  y = np.asarray(y).astype(float)
+  i = 0
+  while (i + num_algs - 1) < len(y):
+    normal = y[i]
+    for x in range(num_algs):
+      y[i+x] /= normal
+    i += num_algs
+  return np.log10(y) + 1
+
+# Reference implementation of undoing the "alg" output normalization by scanning every pair of rows
+def loop_undo_normalize_output(X, y_nf, X_set, y_set):
+  y_set = 10 ** (np.asarray(y_set).astype(float) - 1)
+  y_set_nf = []
+  for i, row_set in enumerate(X_set):
+    for j, row in enumerate(X):
+      if np.all(row[0:3] == row_set[0:3]) and row[3] == 0:
+        y_set_nf.append(y_set[i]*y_nf[j])
+  return np.asarray(y_set_nf)
+
 class TestNormalizations(unittest.TestCase):
   def test_undo_preprocess_input_simple(self):
     X = np.array([[1,1,1,0],
@@ -74,5 +95,25 @@ class TestNormalizations(unittest.TestCase):
     np.testing.assert_almost_equal(result, y_set_nf)
   
 
+  def test_normalize_output_matches_loop(self):
+    rng = np.random.default_rng(0)
+    # The last group is incomplete and is not normalized
+    y = rng.uniform(1, 1000, size=3*50 + 2)
+    result, original = normalize_output(y, 3, norm_type="alg")
+    np.testing.assert_almost_equal(result, loop_normalize_output(y, 3))
+    self.assertEqual(original.tolist(), y.tolist())
+
+  def test_undo_normalize_output_matches_loop(self):
+    rng = np.random.default_rng(0)
+    points = rng.integers(1, 6, size=(40,3))
+    X = np.repeat(points, 3, axis=0)
+    X = np.column_stack((X, np.tile(np.arange(3), points.shape[0])))
+    y_nf = rng.uniform(1, 1000, size=X.shape[0])
+    # Duplicated points match several reference rows, unknown points match none
+    X_set = np.vstack([X[rng.choice(X.shape[0], size=30)], [[9,9,9,0],[9,9,9,1]]])
+    y_set = rng.uniform(0, 2, size=X_set.shape[0])
+    result = undo_normalize_output(X, y_nf, X_set, y_set, 3, norm_type="alg")
+    np.testing.assert_almost_equal(result, loop_undo_normalize_output(X, y_nf, X_set, y_set))
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,104 @@
+# This file tests "persistent_driver.py" with the stand-in driver using unittest
+import unittest
+
+import sys
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.persistent_driver import (PersistentDriver, split_alg, driver_command, launch_command, uses_driver,
+                                                  get_driver, close_drivers, _drivers, AlgorithmSelectionError)
+from src.active_learner.data_collect import collect_point_batch, drive_point, collect_point_timed, clear_result_cache, FAILED_LATENCY
+
+ALGS = {0: 'binomial', 1: 'tree4'}
+
+class TestPersistentDriver(unittest.TestCase):
+  def setUp(self):
+    ConfigManager.get_instance()._set_value('settings', 'benchmark_driver', 'fake')
+    clear_result_cache()
+
+  def tearDown(self):
+    close_drivers()
+    ConfigManager.get_instance()._set_value('settings', 'benchmark_driver', 'runner')
+    clear_result_cache()
+
+  def test_driver_command(self):
+    self.assertEqual(split_alg('recexch_doubling2'), ('recexch_doubling', '2'))
+    self.assertEqual(split_alg('binomial'), ('binomial', ''))
+    self.assertEqual(driver_command('bcast', 'binomial', 1024), "bcast binomial - 0 1024 0 0\n")
+    self.assertEqual(driver_command('allreduce', 'tree4', 8, 50, 10),
+                     "allreduce tree MPIR_CVAR_ALLREDUCE_TREE_KVAL 4 8 50 10\n")
+
+  def test_launch_command(self):
+    ConfigManager.get_instance()._set_value('settings', 'benchmark_driver', 'persistent')
+    command = launch_command(2, 4, "/tmp/nodefile0")
+    self.assertEqual(command[1:7], ['--hostfile', '/tmp/nodefile0', '-n', '8', '-ppn', '4'])
+    self.assertTrue(command[-1].endswith('persistent_driver'))
+    self.assertNotIn('--hostfile', launch_command(2, 4))
+    # The ch4 collectives keep using the ch4 runner
+    self.assertTrue(uses_driver('bcast'))
+    self.assertFalse(uses_driver('bcast_ch4'))
+
+  def test_rejected_on_aurora_xpu(self):
+    config = ConfigManager.get_instance()
+    system = config.get_value('settings', 'system', '')
+    config._set_value('settings', 'benchmark_driver', 'persistent')
+    config._set_value('settings', 'system', 'aurora_xpu')
+    try:
+      with self.assertRaises(ValueError):
+        uses_driver('bcast')
+      # The runners do not need the driver
+      config._set_value('settings', 'benchmark_driver', 'runner')
+      self.assertFalse(uses_driver('bcast'))
+    finally:
+      config._set_value('settings', 'system', system)
+
+  def test_measure(self):
+    driver = get_driver(2, 4)
+    latency = driver.measure('bcast', 'binomial', 1024)
+    self.assertGreater(latency, 0)
+    self.assertEqual(driver.measure('bcast', 'binomial', 1024), latency)
+    self.assertNotEqual(driver.measure('bcast', 'tree4', 1024), latency)
+    # The driver keeps running between benchmarks and is relaunched if it dies
+    self.assertIs(get_driver(2, 4), driver)
+    driver.process.kill()
+    driver.process.wait()
+    self.assertIsNot(get_driver(2, 4), driver)
+
+  def test_errors(self):
+    driver = get_driver(2, 4)
+    with self.assertRaises(AlgorithmSelectionError):
+      driver.measure('bcast', 'smp', 1024)
+    # The driver keeps working after an error
+    self.assertGreater(driver.measure('bcast', 'binomial', 1024), 0)
+    # A single process cannot run a collective, which is a failed benchmark
+    with self.assertRaises(ValueError):
+      get_driver(1, 1).measure('bcast', 'binomial', 1024)
+    with self.assertRaises(RuntimeError):
+      PersistentDriver([sys.executable, '-c', 'print("not a driver")'])
+    # A driver that is missing an algorithm control variable does not start
+    with self.assertRaises(RuntimeError):
+      PersistentDriver([sys.executable, '-c', 'print("ERROR missing control variable MPIR_CVAR_BCAST_INTRA_ALGORITHM")'])
+
+  def test_selection_error_stops_the_tuning(self):
+    algs = {0: 'binomial', 1: 'smp'}
+    with self.assertRaises(AlgorithmSelectionError):
+      collect_point_batch('bcast', algs, np.array([[2, 3, 11, 0], [2, 3, 11, 1]]))
+
+  def test_collect_point_batch(self):
+    points = np.array([[2, 3, 11, 0], [2, 3, 11, 1], [1, 1, 11, 0]])
+    result = collect_point_batch('bcast', ALGS, points)
+    self.assertTrue(np.all(result[:2] > 0))
+    # A single process cannot run a collective
+    self.assertEqual(result[2], FAILED_LATENCY)
+    # Both algorithms of the first point ran on one driver
+    self.assertIn((2, 4, None), _drivers)
+
+  def test_drive_point_closes_the_drivers_of_its_nodefile(self):
+    rows = np.array([[2, 3, 11, 0], [2, 3, 11, 1]])
+    outputs = drive_point('bcast', ALGS, rows, "/tmp/nodefile0", [None, None], [None, None], collect_point_timed)
+    self.assertEqual(len(outputs), 2)
+    self.assertEqual([output[2:] for output in outputs], [(1000, 200), (1000, 200)])
+    self.assertEqual(len(_drivers), 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,72 @@
+# This file tests "point_selection.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from unittest.mock import patch
+from src.active_learner.point_selection import point_selection_single, point_selection_batch, get_batch_size, exclude_measured
+from src.active_learner.measured_index import MeasuredIndex
+from src.parallel_scheduling.serial.serial_parallel_scheduling import Topology as SerialTopology
+
+class CapacityTopology(SerialTopology):
+  def get_capacity(self):
+    return 10
+
+class TestPointSelection(unittest.TestCase):
+  def setUp(self):
+    self.X = np.array([[1,1,1,0],
+                       [1,1,1,1],
+                       [1,1,2,0],
+                       [1,1,2,1],
+                       [1,2,1,0],
+                       [1,2,1,1]])
+
+  def test_point_selection_single(self):
+    variances = np.array([0.1, 0.2, 0.9, 0.3, 0.5, 0.4])
+    point, index = point_selection_single(None, None, self.X, variances)
+    self.assertEqual(index, 2)
+    self.assertEqual(point.tolist(), [1,1,2,0])
+
+  def test_point_selection_batch_distinct(self):
+    # The two most uncertain rows belong to the same point, so the batch must skip the second one
+    variances = np.array([0.1, 0.2, 0.9, 0.8, 0.5, 0.4])
+    points, indices = point_selection_batch(None, None, self.X, 2, variances)
+    self.assertEqual(indices.tolist(), [2, 4])
+    self.assertEqual(points[:,:-1].tolist(), [[1,1,2],[1,2,1]])
+
+  def test_point_selection_batch_larger_than_space(self):
+    variances = np.array([0.1, 0.2, 0.9, 0.8, 0.5, 0.4])
+    points, indices = point_selection_batch(None, None, self.X, 10, variances)
+    self.assertEqual(indices.tolist(), [2, 4, 1])
+
+  def test_point_selection_skips_measured(self):
+    variances = np.array([0.1, 0.2, 0.9, 0.8, 0.5, 0.4])
+    measured = MeasuredIndex(np.array([[1,1,2,0]]))
+    point, index = point_selection_single(None, None, self.X, variances, measured)
+    self.assertEqual(index, 4)
+    points, indices = point_selection_batch(None, None, self.X, 3, variances, measured)
+    self.assertEqual(indices.tolist(), [4, 1])
+
+  def test_exclude_measured_all_measured(self):
+    variances = np.array([0.1, 0.2, 0.9, 0.8, 0.5, 0.4])
+    measured = MeasuredIndex(self.X)
+    self.assertEqual(exclude_measured(variances, self.X, measured).tolist(), variances.tolist())
+
+  def test_exclude_measured_weight(self):
+    variances = np.array([0.1, 0.2, 0.9, 0.8, 0.5, 0.4])
+    measured = MeasuredIndex(np.array([[1,1,2,0]]))
+    with patch('src.user_config.config_manager.ConfigManager.get_value', return_value='0.5'):
+      result = exclude_measured(variances, self.X, measured)
+    np.testing.assert_almost_equal(result, [0.1, 0.2, 0.45, 0.4, 0.5, 0.4])
+
+  def test_get_batch_size(self):
+    with patch('src.user_config.config_manager.ConfigManager.get_value', return_value='auto'):
+      self.assertEqual(get_batch_size(CapacityTopology(), 3), 4)
+      self.assertEqual(get_batch_size(CapacityTopology(), 12), 1)
+      self.assertEqual(get_batch_size(SerialTopology(), 3), 1)
+    with patch('src.user_config.config_manager.ConfigManager.get_value', return_value='5'):
+      self.assertEqual(get_batch_size(CapacityTopology(), 3), 5)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,80 @@
+# This file tests "prior.py" using unittest
+import unittest
+
+import os
+import sys
+import pickle
+import tempfile
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from src.active_learner.prior import load_prior, prior_from_model, unmeasured_prior
+from src.active_learner.measured_index import MeasuredIndex
+from src.active_learner.model_training import add_prior
+
+class TestPrior(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.algs = {0: 'binomial', 1: 'scatter_ring_allgather'}
+    self.feature_space = np.array([[1,2,1],
+                                   [1,2,2],
+                                   [2,1,1],
+                                   [2,1,2]])
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_load_prior_data(self):
+    data = np.array([[1,2,1,0,1.0],
+                     [1,2,1,1,1.5],
+                     [1,2,1,2,0.5]])
+    prior_path = os.path.join(self.tmp_dir.name, "bcast.txt")
+    np.savetxt(prior_path, data, delimiter=',')
+    X_prior, y_prior = load_prior(os.path.join(self.tmp_dir.name, "{collective}.txt"), "bcast", self.feature_space, self.algs)
+    # The third row uses an algorithm that is not in the current algorithm list
+    self.assertEqual(X_prior.tolist(), [[1,2,1,0],[1,2,1,1]])
+    self.assertEqual(y_prior.tolist(), [1.0, 1.5])
+
+  def test_load_prior_missing(self):
+    X_prior, y_prior = load_prior(os.path.join(self.tmp_dir.name, "missing.txt"), "bcast", self.feature_space, self.algs)
+    self.assertIsNone(X_prior)
+    self.assertIsNone(y_prior)
+    self.assertEqual(load_prior(None, "bcast", self.feature_space, self.algs), (None, None))
+
+  def test_load_prior_model(self):
+    X = np.array([[1,2,1,0],[1,2,1,1],[2,1,2,0],[2,1,2,1]])
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, np.array([1.0, 2.0, 1.0, 2.0]))
+    prior_path = os.path.join(self.tmp_dir.name, "bcast.pkl")
+    with open(prior_path, 'wb') as f:
+      pickle.dump(model, f)
+    X_prior, y_prior = load_prior(prior_path, "bcast", self.feature_space, self.algs)
+    self.assertEqual(X_prior.shape, (8,4))
+    np.testing.assert_almost_equal(y_prior, model.predict(X_prior))
+
+  def test_prior_from_model_subsamples(self):
+    X = np.array([[1,2,1,0],[1,2,1,1]])
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, np.array([1.0, 2.0]))
+    X_prior, y_prior = prior_from_model(model, self.feature_space, self.algs, num_points=2)
+    self.assertEqual(X_prior.tolist(), [[1,2,1,0],[1,2,1,1],[2,1,2,0],[2,1,2,1]])
+
+  def test_unmeasured_prior(self):
+    X_prior = np.array([[1,2,1,0],[1,2,1,1],[2,1,2,0]])
+    y_prior = np.array([1.0, 2.0, 3.0])
+    measured = MeasuredIndex(np.array([[1,2,1,0]]))
+    X_active, y_active = unmeasured_prior(X_prior, y_prior, measured)
+    self.assertEqual(X_active.tolist(), [[2,1,2,0]])
+    self.assertEqual(y_active.tolist(), [3.0])
+    self.assertEqual(unmeasured_prior(None, None, measured), (None, None))
+
+  def test_add_prior_weights(self):
+    X_train = np.array([[1,2,1,0]])
+    y_train = np.array([1.0])
+    X_fit, y_fit, sample_weight = add_prior(X_train, y_train, np.array([[2,1,2,0]]), np.array([3.0]))
+    self.assertEqual(X_fit.tolist(), [[1,2,1,0],[2,1,2,0]])
+    self.assertEqual(y_fit.tolist(), [1.0, 3.0])
+    self.assertEqual(sample_weight[0], 1.0)
+    self.assertLess(sample_weight[1], 1.0)
+    self.assertEqual(add_prior(X_train, y_train), (X_train, y_train, None))
+
+
+if __name__ == '__main__':
+  unittest.main()
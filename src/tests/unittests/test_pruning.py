@@ -0,0 +1,73 @@
+# This file tests "pruning.py" using unittest
+import unittest
+
+import io
+import sys
+import contextlib
+import numpy as np
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.initialization import create_feature_space
+from src.active_learner.algs import add_algs
+from src.active_learner.pruning import PRUNING_MIN_MEASURED, AlgorithmPruner, get_algorithm_pruner
+
+ALGS = {0: 'binomial', 1: 'scatter_ring_allgather', 2: 'scatter_recursive_doubling_allgather'}
+
+class TestPruning(unittest.TestCase):
+  def setUp(self):
+    self.X = add_algs(create_feature_space(4, 4, 8, "bcast"), ALGS)
+    self.pruner = AlgorithmPruner(self.X, len(ALGS), num_regions=2)
+    # Algorithm 2 is slower everywhere, algorithm 1 only for the small message sizes
+    self.y_pred = np.where(self.X[:,3] == 2, 2.0, 1.0)
+    self.y_pred[(self.X[:,3] == 1) & (self.X[:,2] <= 4)] = 1.5
+    self.y_pred[(self.X[:,3] == 1) & (self.X[:,2] > 4)] = 0.9
+
+  def measure_everywhere(self, repetitions):
+    for _ in range(repetitions):
+      self.pruner.add_measured(self.X, np.ones(self.X.shape[0]))
+
+  def test_prunes_dominated_algorithms(self):
+    self.measure_everywhere(PRUNING_MIN_MEASURED)
+    with contextlib.redirect_stdout(io.StringIO()):
+      self.pruner.update(self.y_pred, np.full(self.X.shape[0], 0.01))
+    pruned = self.pruner.prune(self.X)
+    self.assertTrue(np.all(pruned[self.X[:,3] == 2]))
+    self.assertFalse(np.any(pruned[self.X[:,3] == 0]))
+    self.assertTrue(np.all(pruned[(self.X[:,3] == 1) & (self.X[:,2] <= 4)]))
+    self.assertFalse(np.any(pruned[(self.X[:,3] == 1) & (self.X[:,2] > 4)]))
+    # Only the pruned rows that would have been launched are saved launches
+    self.assertEqual(self.pruner.saved, 0)
+    self.pruner.add_saved(pruned & (self.X[:,2] > 2))
+    self.assertEqual(self.pruner.saved, np.count_nonzero(pruned & (self.X[:,2] > 2)))
+
+  def test_uncertain_or_unmeasured_algorithms_are_kept(self):
+    # Overlapping confidence intervals
+    self.measure_everywhere(PRUNING_MIN_MEASURED)
+    self.pruner.update(self.y_pred, np.full(self.X.shape[0], 1.0))
+    self.assertFalse(np.any(self.pruner.prune(self.X)))
+
+    # Rows without a latency were not benchmarked and do not count
+    pruner = AlgorithmPruner(self.X, len(ALGS), num_regions=2)
+    for _ in range(PRUNING_MIN_MEASURED):
+      pruner.add_measured(self.X, np.full(self.X.shape[0], np.nan))
+    pruner.update(self.y_pred, np.full(self.X.shape[0], 0.01))
+    self.assertFalse(np.any(pruner.prune(self.X)))
+
+  def test_pruning_is_recomputed(self):
+    self.measure_everywhere(PRUNING_MIN_MEASURED)
+    with contextlib.redirect_stdout(io.StringIO()):
+      self.pruner.update(self.y_pred, np.full(self.X.shape[0], 0.01))
+      self.assertTrue(np.any(self.pruner.prune(self.X)))
+      self.pruner.update(np.ones(self.X.shape[0]), np.full(self.X.shape[0], 0.01))
+    self.assertFalse(np.any(self.pruner.prune(self.X)))
+
+  def test_get_algorithm_pruner(self):
+    self.assertIsNone(get_algorithm_pruner(self.X, len(ALGS)))
+    ConfigManager.get_instance()._set_value('settings', 'algorithm_pruning', 'dominated')
+    try:
+      self.assertIsInstance(get_algorithm_pruner(self.X, len(ALGS)), AlgorithmPruner)
+    finally:
+      ConfigManager.get_instance()._set_value('settings', 'algorithm_pruning', 'none')
+
+
+if __name__ == '__main__':
+  unittest.main()
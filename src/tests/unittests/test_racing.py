@@ -0,0 +1,83 @@
+# This file tests "racing.py" and the races of "data_collect.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from unittest.mock import patch
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.racing import race_survivors, round_iterations, last_round_rows
+from src.active_learner.data_collect import race_point, collect_point_batch, clear_result_cache, cached_rows, result_iterations
+
+ALGS = {0: 'binomial', 1: 'scatter_ring_allgather', 2: 'scatter_recursive_doubling_allgather', 3: 'smp_like', 4: 'pipelined'}
+
+# Latency grows with the algorithm index, the runs of each row are recorded with their iteration counts
+class FakeBenchmark:
+  def __init__(self):
+    self.runs = []
+
+  def __call__(self, name, algs, point, nodefile=None, iterations=None, warmup=None):
+    self.runs.append((int(point[3]), iterations, warmup))
+    return 10.0 * (1 + point[3])
+
+class TestRacing(unittest.TestCase):
+  def tearDown(self):
+    ConfigManager.get_instance()._set_value('settings', 'racing', 'none')
+    clear_result_cache()
+
+  def test_race_survivors(self):
+    self.assertEqual(race_survivors([4.0, 1.0, 3.0, 2.0], 0.05).tolist(), [1, 3])
+    self.assertEqual(race_survivors([4.0, 1.0, 3.0], 0.05).tolist(), [1, 2])
+    # Latencies within the tolerance of the fastest are kept
+    self.assertEqual(race_survivors([1.0, 1.01, 1.02, 2.0], 0.05).tolist(), [0, 1, 2])
+
+  def test_round_iterations(self):
+    self.assertEqual(round_iterations(50, 1000, 200), (50, 10))
+    self.assertEqual(round_iterations(5000, 1000, 200), (1000, 200))
+    self.assertEqual(round_iterations(2, 100, 10), (2, 1))
+
+  def test_race_point(self):
+    benchmark = FakeBenchmark()
+    rows = np.array([[1, 2, 4, alg] for alg in ALGS])
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=benchmark):
+      latencies, runtimes, iterations, warmup, runs = race_point("bcast", ALGS, rows)
+
+    np.testing.assert_almost_equal(latencies, [10.0, 20.0, 30.0, 40.0, 50.0])
+    self.assertTrue(np.all(runtimes >= 0))
+    # 5 algorithms with 50 iterations, the fastest 3 with 100, the fastest 2 with 200, the winner with the default 1000
+    self.assertEqual([run[:2] for run in benchmark.runs],
+                     [(0, 50), (1, 50), (2, 50), (3, 50), (4, 50), (0, 100), (1, 100), (2, 100), (0, 200), (1, 200), (0, 1000)])
+    self.assertEqual(benchmark.runs[-1][2], 200)
+    # The counts of the longest run of every row and all runs of the race are returned
+    self.assertEqual(iterations.tolist(), [1000, 200, 100, 50, 50])
+    self.assertEqual(warmup.tolist(), [200, 40, 20, 10, 10])
+    self.assertEqual(runs.shape, (11, 3))
+    self.assertEqual(runs[-1].tolist(), [0, 10.0, 1000])
+    self.assertEqual(last_round_rows(iterations).tolist(), [True, False, False, False, False])
+
+  def test_race_point_final_iterations(self):
+    benchmark = FakeBenchmark()
+    rows = np.array([[1, 2, 4, alg] for alg in [0, 1]])
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=benchmark):
+      race_point("bcast", ALGS, rows, iterations=300, warmup=60)
+    self.assertEqual([run[:2] for run in benchmark.runs], [(0, 50), (1, 50), (0, 300)])
+    self.assertEqual(benchmark.runs[-1][2], 60)
+
+  def test_collect_point_batch_races_each_point(self):
+    ConfigManager.get_instance()._set_value('settings', 'racing', 'successive_halving')
+    benchmark = FakeBenchmark()
+    points = np.array([[1, 2, 4, 0], [1, 2, 4, 1], [1, 2, 5, 0], [1, 2, 5, 1]])
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=benchmark):
+      result = collect_point_batch("bcast", ALGS, points)
+    self.assertEqual(result.tolist(), [10.0, 20.0, 10.0, 20.0])
+    # Per point: both algorithms with 50 iterations, then the winner with the default 1000
+    self.assertEqual([run[:2] for run in benchmark.runs], [(0, 50), (1, 50), (0, 1000)] * 2)
+    # The latencies of the dropped algorithms are only used for training, but their counts are known
+    self.assertEqual(cached_rows("bcast", ALGS, points).tolist(), [True, False, True, False])
+    self.assertEqual(result_iterations("bcast", ALGS, points)[0].tolist(), [1000, 50, 1000, 50])
+    with patch('src.active_learner.data_collect.collect_point_single', side_effect=benchmark):
+      collect_point_batch("bcast", ALGS, points[1:2])
+    self.assertEqual(benchmark.runs[-1][:2], (1, 1000))
+
+
+if __name__ == '__main__':
+  unittest.main()
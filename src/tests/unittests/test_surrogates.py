@@ -0,0 +1,75 @@
+# This file tests "surrogates.py" using unittest
+import unittest
+
+import sys
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+from src.user_config.config_manager import ConfigManager
+from src.active_learner.surrogates import SURROGATES, QuantileBoostingSurrogate, create_surrogate, get_surrogate, is_forest
+from src.active_learner.model_training import fit_model
+from src.active_learner.jackknife import jackknife_variances
+
+# This function returns noisy points whose latency grows with the number of nodes and the algorithm index
+def make_data(num_points, seed=0):
+  rng = np.random.default_rng(seed)
+  X = rng.integers(1, 10, size=(num_points,4)).astype(float)
+  return X, X[:,0] + X[:,3] + rng.normal(size=num_points)
+
+class TestSurrogates(unittest.TestCase):
+  def tearDown(self):
+    ConfigManager.get_instance()._set_value('settings', 'surrogate', 'random_forest')
+    ConfigManager.get_instance()._set_value('settings', 'training_mode', 'full')
+
+  def test_create_surrogate(self):
+    self.assertIsInstance(create_surrogate('random_forest'), RandomForestRegressor)
+    self.assertIsInstance(create_surrogate('extra_trees', n_estimators=7), ExtraTreesRegressor)
+    self.assertEqual(create_surrogate('extra_trees', n_estimators=7).n_estimators, 7)
+    self.assertIsInstance(create_surrogate('quantile_gbm'), QuantileBoostingSurrogate)
+    self.assertFalse(is_forest(create_surrogate('quantile_gbm')))
+
+  def test_unknown_surrogate(self):
+    ConfigManager.get_instance()._set_value('settings', 'surrogate', 'neural_network')
+    with self.assertRaises(ValueError):
+      get_surrogate()
+
+  def test_every_surrogate_fits_predicts_and_has_uncertainty(self):
+    X_train, y_train = make_data(200)
+    X_test, _ = make_data(30, seed=1)
+    for surrogate in SURROGATES:
+      model = create_surrogate(surrogate).fit(X_train, y_train, sample_weight=np.ones(200))
+      variances, predictions = jackknife_variances(model, X_test, workers=1, return_predictions=True)
+      self.assertEqual(variances.shape, (30,))
+      self.assertTrue(np.all(variances >= 0))
+      np.testing.assert_almost_equal(predictions, model.predict(X_test))
+
+  def test_quantile_uncertainty_follows_noise(self):
+    rng = np.random.default_rng(0)
+    X_train = rng.integers(1, 10, size=(2000,4)).astype(float)
+    # The noise grows with the first feature
+    y_train = X_train[:,0] + X_train[:,3] + rng.normal(size=2000) * X_train[:,0] / 3
+    model = QuantileBoostingSurrogate().fit(X_train, y_train)
+    low_noise = np.array([[1, 5, 5, 5]] * 5, dtype=float)
+    high_noise = np.array([[9, 5, 5, 5]] * 5, dtype=float)
+    low_variances, _ = model.predict_uncertainty(low_noise)
+    high_variances, _ = model.predict_uncertainty(high_noise)
+    self.assertGreater(np.mean(high_variances), np.mean(low_variances))
+
+  def test_fit_model_with_surrogate(self):
+    ConfigManager.get_instance()._set_value('settings', 'training_mode', 'incremental')
+    X_train, y_train = make_data(40)
+    ConfigManager.get_instance()._set_value('settings', 'surrogate', 'extra_trees')
+    rf, _ = fit_model(None, X_train, y_train, 0)
+    self.assertIsInstance(rf, ExtraTreesRegressor)
+    rf, _ = fit_model(rf, X_train, y_train, 1)
+    self.assertIsInstance(rf, ExtraTreesRegressor)
+
+    # The quantile model is refit on all data, also with training_mode = incremental
+    ConfigManager.get_instance()._set_value('settings', 'surrogate', 'quantile_gbm')
+    model, _ = fit_model(None, X_train, y_train, 0)
+    refit, _ = fit_model(model, X_train, y_train, 1)
+    self.assertIsInstance(refit, QuantileBoostingSurrogate)
+    self.assertIsNot(refit, model)
+
+
+if __name__ == '__main__':
+  unittest.main()
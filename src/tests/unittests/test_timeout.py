@@ -4,14 +4,22 @@ import unittest
 import sys
 import pathlib
 import io
+import tempfile
 from contextlib import redirect_stdout
 from src.user_config.config_manager import ConfigManager
 from src.active_learner.active_learner import train_model
 
 class TestTimeout(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
   def test_timeout(self):
     ConfigManager._instance = None
     timeout = ConfigManager.get_instance().get_value('settings', 'timeout')
+    ConfigManager.get_instance()._set_value('settings', 'checkpoint_dir', self.tmp_dir.name)
     ConfigManager.get_instance()._set_value('settings', 'timeout', '0')
 
     n = 1
@@ -3,7 +3,7 @@ import unittest
 
 import sys
 import numpy as np
-from src.active_learner.utils import preprocess_features, unprocess_features
+from src.active_learner.utils import preprocess_features, unprocess_features, compact_features, pack_points, FEATURE_DTYPE
 
 
 class TestInitialization(unittest.TestCase):
@@ -43,5 +43,23 @@ class TestInitialization(unittest.TestCase):
     self.assertEqual(512,ppn)
     self.assertEqual(1048576,msg_size)
 
+  def test_compact_features(self):
+    X = np.array([[14.0, 8.0, 29.0, 11.0]])
+    result = compact_features(X)
+    self.assertEqual(result.dtype, FEATURE_DTYPE)
+    self.assertEqual(result.tolist(), [[14, 8, 29, 11]])
+    # Features that are not small integers stay in floating point
+    self.assertEqual(compact_features(np.array([[1.5, 2.0, 3.0, 0.0]])).dtype, np.float64)
+    self.assertEqual(compact_features(np.array([[300.0, 2.0, 3.0, 0.0]])).dtype, np.float64)
+
+  def test_pack_points(self):
+    X = np.array([[14, 8, 29, 0],
+                  [14, 8, 29, 5],
+                  [14, 8, 28, 0]], dtype=FEATURE_DTYPE)
+    keys = pack_points(X)
+    self.assertEqual(keys[0], keys[1])
+    self.assertNotEqual(keys[0], keys[2])
+    self.assertEqual(keys[0], (14 << 16) | (8 << 8) | 29)
+
 if __name__ == '__main__':
   unittest.main()
@@ -32,10 +32,13 @@ class ConfigManager:
         self.parser.read(config_path)
         return self.get_instance()
 
-    def get_value(self, section, key):
+    def get_value(self, section, key, default=None):
         if self.parser is None:
            self.get_instance()
 
+        # Settings added after a config.ini was generated fall back to the provided default
+        if default is not None and not self.parser.has_option(section, key):
+            return default
         return self.parser[section][key]
     
     def _set_value(self, section, key, value):